@@ -89,7 +89,8 @@ export const getAdvancedHotelKPI = async (req, res) => {
       const analyticsResponse = await axios.get('http://localhost:8001/revenue-analytics', {
         params: {
           start_date: startDate,
-          end_date: endDate
+          end_date: endDate,
+          hotel_id: hotelId
         }
       });
       pricingAnalytics = analyticsResponse.data.analytics;
@@ -222,25 +223,28 @@ export const updateMultiplierDependencies = async (req, res) => {
           rate_type: room.rateType,
           year_start: roomRate.yearStart.toISOString(),
           custom_multipliers: multipliers,
-          use_historical_fallback: true
+          use_historical_fallback: true,
+          hotel_id: hotelId
         });
 
         if (dependencyResponse.data.success) {
           const predictions = dependencyResponse.data.predictions;
           
-          // Update occupancy data based on predictions
-          for (const prediction of predictions) {
-            if (prediction.occupancy_data && prediction.occupancy_data.source !== 'default') {
-              try {
-                await axios.post('http://localhost:8001/occupancy-data', {
-                  date: prediction.date,
-                  actual_occupancy: prediction.occupancy_data.occupancy_percentage,
-                  total_rooms: prediction.occupancy_data.total_rooms,
-                  occupied_rooms: prediction.occupancy_data.occupied_rooms
-                });
-              } catch (occError) {
-                console.warn(`Failed to update occupancy for ${prediction.date}:`, occError.message);
-              }
+          // Update occupancy data based on predictions in one bulk call
+          const occupancyRecords = predictions
+            .filter(prediction => prediction.occupancy_data && prediction.occupancy_data.source !== 'default')
+            .map(prediction => ({
+              date: prediction.date,
+              actual_occupancy: prediction.occupancy_data.occupancy_percentage,
+              total_rooms: prediction.occupancy_data.total_rooms,
+              occupied_rooms: prediction.occupancy_data.occupied_rooms
+            }));
+
+          if (occupancyRecords.length > 0) {
+            try {
+              await axios.post('http://localhost:8001/occupancy-data/bulk', { hotel_id: hotelId, records: occupancyRecords });
+            } catch (occError) {
+              console.warn(`Failed to update occupancy for ${room.name}:`, occError.message);
             }
           }
 
@@ -335,20 +339,32 @@ export const getOccupancyAnalysis = async (req, res) => {
 
     // Get predicted occupancy from Python service
     const dailyOccupancy = [];
+    const occupancyUpdates = [];
     const currentDate = new Date(from);
+
+    // Fetch the whole window's predictions in one range request
+    const predictedByDate = {};
+    try {
+      const predictionResponse = await axios.get('http://localhost:8001/occupancy-data', {
+        params: {
+          start: from.toISOString().split('T')[0],
+          end: to.toISOString().split('T')[0],
+          hotel_id: hotelId
+        }
+      });
+      for (const entry of predictionResponse.data.occupancy_data || []) {
+        predictedByDate[entry.date] = entry.occupancy_data;
+      }
+    } catch (error) {
+      console.warn('Could not get occupancy predictions:', error.message);
+    }
     
     while (currentDate <= to) {
       const dateKey = currentDate.toISOString().split('T')[0];
       const actualOccupied = dailyOccupancyMap[dateKey] || 0;
       const actualOccupancyPercentage = (actualOccupied / totalRoomUnits) * 100;
       
-      let predictedData = null;
-      try {
-        const predictionResponse = await axios.get(`http://localhost:8001/occupancy-data/${dateKey}`);
-        predictedData = predictionResponse.data.occupancy_data;
-      } catch (error) {
-        console.warn(`Could not get prediction for ${dateKey}:`, error.message);
-      }
+      const predictedData = predictedByDate[dateKey] || null;
 
       dailyOccupancy.push({
         date: dateKey,
@@ -361,23 +377,28 @@ export const getOccupancyAnalysis = async (req, res) => {
           parseFloat((actualOccupancyPercentage - predictedData.occupancy_percentage).toFixed(2)) : null
       });
 
-      // Update Python service with actual data
+      // Collect actual data for the Python service
       if (actualOccupied > 0) {
-        try {
-          await axios.post('http://localhost:8001/occupancy-data', {
-            date: dateKey,
-            actual_occupancy: actualOccupancyPercentage,
-            total_rooms: totalRoomUnits,
-            occupied_rooms: actualOccupied
-          });
-        } catch (updateError) {
-          console.warn(`Failed to update occupancy data for ${dateKey}:`, updateError.message);
-        }
+        occupancyUpdates.push({
+          date: dateKey,
+          actual_occupancy: actualOccupancyPercentage,
+          total_rooms: totalRoomUnits,
+          occupied_rooms: actualOccupied
+        });
       }
 
       currentDate.setDate(currentDate.getDate() + 1);
     }
 
+    // Update Python service with actual data in one bulk call
+    if (occupancyUpdates.length > 0) {
+      try {
+        await axios.post('http://localhost:8001/occupancy-data/bulk', { hotel_id: hotelId, records: occupancyUpdates });
+      } catch (updateError) {
+        console.warn('Failed to update occupancy data:', updateError.message);
+      }
+    }
+
     // Calculate summary statistics
     const actualOccupancies = dailyOccupancy.map(d => d.actualOccupancyPercentage);
     const averageOccupancy = actualOccupancies.reduce((a, b) => a + b, 0) / actualOccupancies.length;
@@ -478,7 +499,9 @@ export const getRevenueForecast = async (req, res) => {
           room_type: room.name,
           rate_type: room.rateType,
           year_start: roomRate.yearStart.toISOString(),
-          use_historical_fallback: true
+          use_historical_fallback: true,
+          hotel_id: hotelId,
+          persist: false
         });
 
         if (forecastResponse.data.success) {
@@ -6,6 +6,27 @@ import axios from "axios";
 
 const prisma = new PrismaClient();
 
+// Price the saved base rates and record the resulting dynamic rates in the
+// pricing service's multiplier history, which feeds revenue analytics and
+// model retraining. Display paths only preview rates, so this is where the
+// published rates are stored. Returns the number of rates committed.
+const commitDynamicRates = async (hotelId, jobs) => {
+  const response = await axios.post("http://localhost:8001/predict-daily-rates/batch", { hotel_id: hotelId, jobs, persist: false }, {
+    timeout: 30000
+  });
+
+  // Days without a base rate (empty cells) are not published
+  const rates = (response.data.results || [])
+    .filter(result => result.success)
+    .flatMap(result => result.predictions)
+    .filter(prediction => prediction.base_rate > 0);
+  if (rates.length === 0) return 0;
+
+  const commit = await axios.post("http://localhost:8001/commit-daily-rates", { hotel_id: hotelId, rates }, {
+    timeout: 30000
+  });
+  return commit.data.rates_committed;
+};
 
 export const generateRateTemplate = async (req, res) => {
   try {
@@ -131,6 +152,7 @@ export const uploadRates = async (req, res) => {
     });
 
     const yearStart = new Date(`${year}-04-01T00:00:00.000Z`);
+    const jobs = [];
 
     // Upsert each room’s daily rates
     for (let header of Object.keys(roomMap)) {
@@ -158,9 +180,35 @@ export const uploadRates = async (req, res) => {
           prices: { set: prices },
         },
       });
+
+      jobs.push({
+        base_rates: prices.map(p => p.toNumber()),
+        room_type: roomName,
+        rate_type: rateType,
+        year_start: yearStart.toISOString(),
+        use_historical_fallback: true
+      });
     }
 
-    res.json({ message: "Rates uploaded/updated successfully" });
+    // The base rates are saved either way; a pricing service failure only
+    // leaves this upload's dynamic rates out of the multiplier history
+    let ratesCommitted = 0;
+    try {
+      ratesCommitted = await commitDynamicRates(hotelId, jobs);
+    } catch (err) {
+      console.error("❌ Failed to commit dynamic rates:", err.message);
+      if (err.response) {
+        console.error('Response status:', err.response.status);
+        console.error('Response data:', err.response.data);
+      }
+      return res.json({
+        message: "Rates uploaded/updated successfully",
+        ratesCommitted,
+        warning: "Dynamic rates could not be recorded in pricing history"
+      });
+    }
+
+    res.json({ message: "Rates uploaded/updated successfully", ratesCommitted });
   } catch (error) {
     console.error("Error uploading rates:", error);
     res.status(500).json({ error: error.message || "Failed to upload rates" });
@@ -201,101 +249,97 @@ export const getRates = async (req, res) => {
     
     console.log('🔄 Starting dynamic pricing calculations for', rates.length, 'room types');
     
-    // Process rates with retry logic and reduced data size
+    // Price every room/rate combination in a single batch round trip
+    const jobs = rates.map(rate => ({
+      base_rates: rate.prices.map(p => p.toNumber()),
+      room_type: rate.roomType,
+      rate_type: rate.rateType,
+      year_start: rate.yearStart.toISOString(),
+      use_historical_fallback: true,
+      custom_multipliers: null
+    }));
+    
+    let batchResults = [];
+    try {
+      console.log('🚀 Calling Python batch service with', jobs.length, 'jobs');
+      
+      // Display only: preview the rates without writing them to multiplier history
+      const response = await axios.post("http://localhost:8001/predict-daily-rates/batch", { hotel_id: hotelId, jobs, persist: false }, {
+        timeout: 30000 // 30 second timeout
+      });
+      
+      batchResults = response.data.results || [];
+      console.log('✅ Python service responded for', batchResults.length, 'jobs');
+    } catch (err) {
+      console.error("❌ Python batch service error:", err.message);
+      if (err.response) {
+        console.error('Response status:', err.response.status);
+        console.error('Response data:', err.response.data);
+      }
+    }
+    
     for (let i = 0; i < rates.length; i++) {
       const rate = rates[i];
+      const basePrices = jobs[i].base_rates;
+      const result = batchResults[i];
       
-      // Add delay between requests to prevent overloading Python service
-      if (i > 0) {
-        await new Promise(resolve => setTimeout(resolve, 1000)); // 1 second delay
-      }
-      try {
-        console.log('💰 Processing rate for room:', rate.roomType, 'with', rate.prices?.length || 0, 'prices');
-        
-        // Limit to first 30 days for initial display to prevent overload
-        const limitedPrices = rate.prices.slice(0, 30).map(p => p.toNumber());
-        
-        const requestData = {
-          base_rates: limitedPrices,
-          room_type: rate.roomType,
-          rate_type: rate.rateType,
-          year_start: rate.yearStart.toISOString(),
-          use_historical_fallback: true,
-          custom_multipliers: null
-        };
-        
-        console.log('🚀 Calling Python service with limited data:', {
-          room_type: requestData.room_type,
-          rate_type: requestData.rate_type,
-          base_rates_count: requestData.base_rates.length,
-          limited: true
-        });
-        
-        // Add timeout and retry logic
-        const response = await axios.post("http://localhost:8001/predict-daily-rates", requestData, {
-          timeout: 30000, // 30 second timeout
-          retry: 2
-        });
-        
-        console.log('✅ Python service responded for', rate.roomType, '- predictions:', response.data.predictions?.length || 0);
-
+      if (result && result.success) {
         ratesWithDynamicPricing.push({
           id: rate.id,
           roomId: rate.roomId,
           roomType: rate.roomType,
           rateType: rate.rateType,
           yearStart: rate.yearStart,
-          basePrices: limitedPrices, // Use limited prices
-          dynamicPrices: response.data.predictions,
+          basePrices: basePrices,
+          dynamicPrices: result.predictions,
           room: rate.room,
-          multiplierSource: response.data.predictions?.[0]?.multiplier_source || 'unknown',
-          dependenciesApplied: response.data.summary?.dependencies_applied || false,
-          averageMultiplier: response.data.summary?.average_multiplier || 1.0,
-          revenueImpact: response.data.summary?.revenue_increase_percent || 0,
-          isLimitedData: true, // Flag to indicate this is limited data
+          multiplierSource: result.predictions?.[0]?.multiplier_source || 'unknown',
+          dependenciesApplied: result.summary?.dependencies_applied || false,
+          averageMultiplier: result.summary?.average_multiplier || 1.0,
+          revenueImpact: result.summary?.revenue_increase_percent || 0,
+          isLimitedData: false,
           totalDaysAvailable: rate.prices.length
         });
-      } catch (err) {
-        console.error("❌ Python service error for room", rate.roomType, ':', err.message);
-        if (err.response) {
-          console.error('Response status:', err.response.status);
-          console.error('Response data:', err.response.data);
-        }
+        continue;
+      }
+      
+      if (result?.error) {
+        console.error("❌ Python service error for room", rate.roomType, ':', result.error);
+      }
+      
+      // Fallback: use base rates as dynamic rates (limited to 30 days)
+      const yearStartDate = new Date(rate.yearStart);
+      const fallbackPredictions = rate.prices.slice(0, 30).map((price, index) => {
+        const currentDate = new Date(yearStartDate);
+        currentDate.setDate(currentDate.getDate() + index);
         
-        // Fallback: use base rates as dynamic rates (limited to 30 days)
-        const yearStartDate = new Date(rate.yearStart);
-        const fallbackPredictions = rate.prices.slice(0, 30).map((price, index) => {
-          const currentDate = new Date(yearStartDate);
-          currentDate.setDate(currentDate.getDate() + index);
-          
-          return {
-            date: currentDate.toISOString().split('T')[0],
-            base_rate: price.toNumber(),
-            dynamic_rate: price.toNumber(),
-            multiplier: 1.0,
-            occupancy_factor: 1.0,
-            demand_factor: 1.0,
-            occasions: [],
-            room_type: rate.roomType,
-            rate_type: rate.rateType,
-            error: 'Service unavailable, using base rate'
-          };
-        });
+        return {
+          date: currentDate.toISOString().split('T')[0],
+          base_rate: price.toNumber(),
+          dynamic_rate: price.toNumber(),
+          multiplier: 1.0,
+          occupancy_factor: 1.0,
+          demand_factor: 1.0,
+          occasions: [],
+          room_type: rate.roomType,
+          rate_type: rate.rateType,
+          error: 'Service unavailable, using base rate'
+        };
+      });
 
-        ratesWithDynamicPricing.push({
-          id: rate.id,
-          roomId: rate.roomId,
-          roomType: rate.roomType,
-          rateType: rate.rateType,
-          yearStart: rate.yearStart,
-          basePrices: rate.prices.slice(0, 30).map(p => p.toNumber()),
-          dynamicPrices: fallbackPredictions,
-          room: rate.room,
-          isLimitedData: true,
-          totalDaysAvailable: rate.prices.length,
-          error: 'Python service unavailable'
-        });
-      }
+      ratesWithDynamicPricing.push({
+        id: rate.id,
+        roomId: rate.roomId,
+        roomType: rate.roomType,
+        rateType: rate.rateType,
+        yearStart: rate.yearStart,
+        basePrices: rate.prices.slice(0, 30).map(p => p.toNumber()),
+        dynamicPrices: fallbackPredictions,
+        room: rate.room,
+        isLimitedData: true,
+        totalDaysAvailable: rate.prices.length,
+        error: 'Python service unavailable'
+      });
     }
 
     // 3. Send rates with dynamic pricing
@@ -426,7 +470,9 @@ export const getRatesByRoomAndDate = async (req, res) => {
         base_rates: basePrices,
         room_type: rate.roomType,
         rate_type: rate.rateType,
-        year_start: rate.yearStart.toISOString()
+        year_start: rate.yearStart.toISOString(),
+        hotel_id: hotelId,
+        persist: false
       });
       dynamicPredictions = response.data.predictions;
     } catch (err) {
@@ -9,73 +9,121 @@ const __dirname = path.dirname(__filename);
 
 const router = express.Router();
 
+const QUOTE_TIMEOUT_MS = 30000; // 30 seconds timeout
+
+// Long-lived predict.py worker: the model is loaded once and every quote is a
+// newline-delimited JSON request/response over stdin/stdout.
+let worker = null;
+let nextRequestId = 1;
+const pendingQuotes = new Map();
+
+const failPendingQuotes = (error) => {
+  for (const { reject, timer } of pendingQuotes.values()) {
+    clearTimeout(timer);
+    reject(error);
+  }
+  pendingQuotes.clear();
+};
+
+const getWorker = () => {
+  if (worker) return worker;
+
+  worker = new PythonShell('predict.py', {
+    mode: 'json',
+    pythonPath: 'python3', // Changed from 'python' to 'python3' for better compatibility
+    scriptPath: path.join(__dirname, '../../../pricing-model'),
+    pythonOptions: ['-u'], // Unbuffered output
+    args: ['--worker']
+  });
+
+  worker.on('message', (message) => {
+    if (message.ready) return;
+
+    const pending = pendingQuotes.get(message.id);
+    if (!pending) return;
+
+    pendingQuotes.delete(message.id);
+    clearTimeout(pending.timer);
+    delete message.id;
+    pending.resolve(message);
+  });
+
+  worker.on('stderr', (line) => {
+    console.error('Pricing worker:', line);
+  });
+
+  const handleExit = (err) => {
+    console.error('Pricing worker exited:', err?.message || 'closed');
+    worker = null;
+    failPendingQuotes(new Error('Pricing worker exited'));
+  };
+  worker.on('pythonError', handleExit);
+  worker.on('error', handleExit);
+  worker.on('close', () => handleExit());
+
+  return worker;
+};
+
+const requestQuote = (input) => new Promise((resolve, reject) => {
+  const id = nextRequestId++;
+  const timer = setTimeout(() => {
+    pendingQuotes.delete(id);
+    reject(new Error('Pricing worker timed out'));
+  }, QUOTE_TIMEOUT_MS);
+
+  pendingQuotes.set(id, { resolve, reject, timer });
+  getWorker().send({ id, ...input });
+});
+
 router.post('/pricing/predict', async (req, res) => {
   try {
     const { hotelId, roomTypeId, checkinDate, checkoutDate, numRooms } = req.body;
-    
+
     // Validate input
     if (!checkinDate || !checkoutDate || !roomTypeId || !numRooms) {
       return res.status(400).json({ error: 'Missing required parameters' });
     }
 
-    const options = {
-      mode: 'json',
-      pythonPath: 'python3', // Changed from 'python' to 'python3' for better compatibility
-      scriptPath: path.join(__dirname, '../../../pricing-model'),
-      pythonOptions: ['-u'], // Unbuffered output
-      args: [
-        JSON.stringify({
-          checkin_date: checkinDate,
-          checkout_date: checkoutDate,
-          room_type: roomTypeId,
-          num_rooms: numRooms
-        })
-      ],
-      timeout: 30000 // 30 seconds timeout
-    };
-
-    // Improved error handling
-    PythonShell.run('predict.py', options, (err, results) => {
-      if (err) {
-        console.error('Python error:', err);
-        return res.status(500).json({ 
-          error: 'Price calculation failed',
-          details: err.message || 'Unknown Python error'
-        });
-      }
-      
-      if (!results || results.length === 0) {
-        return res.status(500).json({ 
-          error: 'No response from Python script',
-          details: 'The Python script did not return any data'
-        });
-      }
-      
-      try {
-        // Handle both array and single result cases
-        const prediction = Array.isArray(results) ? results[0] : results;
-        
-        // Additional validation of the prediction result
-        if (!prediction || typeof prediction !== 'object') {
-          throw new Error('Invalid prediction format');
-        }
-        
-        res.json(prediction);
-      } catch (parseError) {
-        console.error('Result parsing error:', parseError);
-        res.status(500).json({ 
-          error: 'Failed to parse prediction result',
-          details: parseError.message 
-        });
-      }
-    });
+    let prediction;
+    try {
+      prediction = await requestQuote({
+        checkin_date: checkinDate,
+        checkout_date: checkoutDate,
+        room_type: roomTypeId,
+        num_rooms: numRooms,
+        hotel_id: hotelId
+      });
+    } catch (err) {
+      console.error('Python error:', err);
+      return res.status(500).json({
+        error: 'Price calculation failed',
+        details: err.message || 'Unknown Python error'
+      });
+    }
+
+    // Additional validation of the prediction result
+    if (!prediction || typeof prediction !== 'object') {
+      return res.status(500).json({
+        error: 'Failed to parse prediction result',
+        details: 'Invalid prediction format'
+      });
+    }
+
+    if (prediction.error) {
+      return res.status(400).json({
+        error: 'Price calculation failed',
+        details: prediction.error
+      });
+    }
+
+    res.json(prediction);
   } catch (error) {
     console.error('Pricing endpoint error:', error);
-    res.status(500).json({ 
+    res.status(500).json({
       error: 'Internal server error',
-      details: error.message 
+      details: error.message
     });
   }
 });
 
-export default router;
\ No newline at end of file
+export default router;
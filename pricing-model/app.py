@@ -1,702 +1,307 @@
-import pandas as pd
-import numpy as np
+# Flask API for integration
+from flask import Flask, Response, g, request, jsonify
+from flask_cors import CORS
 from datetime import datetime, timedelta
-import holidays
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import joblib
-import warnings
-from decimal import Decimal
-import json
-import sqlite3
 import os
-from collections import defaultdict
-warnings.filterwarnings('ignore')
+import sys
+import gzip
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-class HotelDynamicPricingModel:
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
-        self.room_type_encoder = LabelEncoder()
-        self.db_path = os.path.join(os.path.dirname(__file__), 'pricing_data.db')
-        self.init_database()
-        
-        # Base multipliers for different rate types
-        self.rate_type_multipliers = {
-            'EP': 1.0,  # Room Only
-            'CP': 1.2,  # Breakfast
-            'MAP': 1.4, # Breakfast + One Meal
-            'AP': 1.6,  # Full Board
-            'AI': 2.0   # All Inclusive
-        }
-        
-        self.occasion_multipliers = {
-            'New Year': 2.5,
-            'Christmas': 2.2,
-            'Valentine\'s Day': 1.8,
-            'Easter': 1.6,
-            'Independence Day': 1.7,
-            'Thanksgiving': 1.9,
-            'Labor Day': 1.5,
-            'Memorial Day': 1.6,
-            'Mother\'s Day': 1.4,
-            'Father\'s Day': 1.3,
-            'Halloween': 1.3,
-            'Diwali': 1.8,
-            'Eid': 1.7,
-            'Chinese New Year': 1.9,
-            'Weekend': 1.3,
-            'Summer Peak': 1.4,
-            'Winter Holiday': 1.6,
-            'Spring Break': 1.7,
-            'Conference Season': 1.5,
-            'Wedding Season': 1.6,
-            'Festival': 1.4,
-            'Concert/Event': 1.8,
-            'Sports Event': 1.9,
-            'Convention': 1.6
-        }
-        
-        # Initialize historical multipliers cache
-        self.historical_multipliers = {}
-        self.occupancy_data = {}
-        
-    def init_database(self):
-        """Initialize SQLite database for storing multipliers and occupancy data"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create tables for multipliers and occupancy tracking
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS multiplier_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    room_type TEXT NOT NULL,
-                    rate_type TEXT NOT NULL,
-                    multiplier REAL NOT NULL,
-                    base_rate REAL NOT NULL,
-                    dynamic_rate REAL NOT NULL,
-                    occupancy_factor REAL NOT NULL,
-                    demand_factor REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(date, room_type, rate_type)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS occupancy_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    actual_occupancy REAL,
-                    predicted_occupancy REAL,
-                    total_rooms INTEGER,
-                    occupied_rooms INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(date)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pricing_dependencies (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    room_type TEXT NOT NULL,
-                    rate_type TEXT NOT NULL,
-                    dependency_type TEXT NOT NULL,
-                    dependency_config TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Database initialization error: {e}")
-    
-    def get_holidays_and_occasions(self, date):
-        """Get all holidays and special occasions for a given date"""
-        occasions = []
-        
-        # US Holidays
-        us_holidays = holidays.US(years=date.year)
-        
-        if date in us_holidays:
-            holiday_name = us_holidays[date]
-            occasions.append(holiday_name)
-        
-        # Weekend
-        month = date.month
-        day = date.day
-        weekday = date.weekday()
-        
-        if weekday >= 5:  # Saturday=5, Sunday=6
-            occasions.append('Weekend')
-        
-        # Seasonal occasions
-        if month in [6, 7, 8]:
-            occasions.append('Summer Peak')
-        elif month in [12, 1]:
-            occasions.append('Winter Holiday')
-        elif month in [3, 4]:
-            occasions.append('Spring Break')
-        
-        # Wedding season 
-        if month >= 4 and month <= 10:
-            occasions.append('Wedding Season')
-        
-        # Festival season 
-        if month >= 10 or month <= 3:
-            occasions.append('Festival')
-        
-        # Valentine's Day
-        if month == 2 and day == 14:
-            occasions.append('Valentine\'s Day')
-        
-        return occasions
-    
-    def get_historical_multiplier(self, date, room_type, rate_type):
-        """Get historical multiplier for a specific date/room/rate combination"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Try to get exact date match first
-            cursor.execute('''
-                SELECT multiplier FROM multiplier_history 
-                WHERE date = ? AND room_type = ? AND rate_type = ?
-                ORDER BY created_at DESC LIMIT 1
-            ''', (date.strftime('%Y-%m-%d'), room_type, rate_type))
-            
-            result = cursor.fetchone()
-            if result:
-                conn.close()
-                return float(result[0])
-            
-            # If no exact match, try same day of week from previous weeks
-            for weeks_back in [1, 2, 3, 4]:
-                lookup_date = date - timedelta(weeks=weeks_back)
-                cursor.execute('''
-                    SELECT multiplier FROM multiplier_history 
-                    WHERE date = ? AND room_type = ? AND rate_type = ?
-                    ORDER BY created_at DESC LIMIT 1
-                ''', (lookup_date.strftime('%Y-%m-%d'), room_type, rate_type))
-                
-                result = cursor.fetchone()
-                if result:
-                    conn.close()
-                    return float(result[0])
-            
-            conn.close()
-            return 1.0  # Default multiplier
-            
-        except Exception as e:
-            print(f"Error getting historical multiplier: {e}")
-            return 1.0
-    
-    def save_multiplier(self, date, room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor):
-        """Save multiplier data to database"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO multiplier_history 
-                (date, room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (date.strftime('%Y-%m-%d'), room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error saving multiplier: {e}")
-    
-    def calculate_occupancy_percentage(self, date, hotel_id=None):
-        """Calculate actual occupancy percentage for a given date"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Try to get actual occupancy data
-            cursor.execute('''
-                SELECT actual_occupancy, occupied_rooms, total_rooms 
-                FROM occupancy_data 
-                WHERE date = ?
-                ORDER BY created_at DESC LIMIT 1
-            ''', (date.strftime('%Y-%m-%d'),))
-            
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                conn.close()
-                return {
-                    'occupancy_percentage': float(result[0]),
-                    'occupied_rooms': int(result[1]) if result[1] else 0,
-                    'total_rooms': int(result[2]) if result[2] else 100,
-                    'source': 'actual'
-                }
-            
-            conn.close()
-            
-            # If no actual data, calculate based on patterns and occasions
-            base_occupancy = 0.65  # Base 65% occupancy
-            
-            # Adjust for day of week
-            weekday = date.weekday()
-            if weekday >= 5:  # Weekend
-                base_occupancy += 0.15
-            elif weekday >= 3:  # Thu-Fri
-                base_occupancy += 0.05
-            
-            # Adjust for occasions
-            occasions = self.get_holidays_and_occasions(date)
-            if occasions:
-                max_occasion_boost = max([self.occasion_multipliers.get(occ, 1.0) - 1.0 for occ in occasions])
-                base_occupancy += max_occasion_boost * 0.2
-            
-            # Seasonal adjustments
-            month = date.month
-            if month in [6, 7, 8]:  # Summer
-                base_occupancy += 0.1
-            elif month in [12, 1]:  # Winter holidays
-                base_occupancy += 0.15
-            elif month in [3, 4]:  # Spring
-                base_occupancy += 0.05
-            
-            # Ensure reasonable bounds
-            occupancy_percentage = min(95.0, max(20.0, base_occupancy * 100))
-            
-            return {
-                'occupancy_percentage': occupancy_percentage,
-                'occupied_rooms': int(occupancy_percentage * 100 / 100),  # Assume 100 rooms
-                'total_rooms': 100,
-                'source': 'predicted',
-                'factors': {
-                    'base': 0.65,
-                    'day_of_week': weekday,
-                    'occasions': occasions,
-                    'season': month
-                }
-            }
-            
-        except Exception as e:
-            print(f"Error calculating occupancy: {e}")
-            return {
-                'occupancy_percentage': 65.0,
-                'occupied_rooms': 65,
-                'total_rooms': 100,
-                'source': 'default'
-            }
-    
-    def update_occupancy_data(self, date, actual_occupancy=None, total_rooms=None, occupied_rooms=None):
-        """Update actual occupancy data"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if actual_occupancy is None and occupied_rooms is not None and total_rooms is not None:
-                actual_occupancy = (occupied_rooms / total_rooms) * 100
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO occupancy_data 
-                (date, actual_occupancy, total_rooms, occupied_rooms)
-                VALUES (?, ?, ?, ?)
-            ''', (date.strftime('%Y-%m-%d'), actual_occupancy, total_rooms, occupied_rooms))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error updating occupancy data: {e}")
+# Re-exported so existing "from app import ..." callers keep working
+from pricing_engine import (
+    FEATURE_COLUMNS,
+    HotelDatabaseRouter,
+    HotelDynamicPricingModel,
+    MultiplierWriter,
+    OccasionCalendar,
+    PricingDatabase,
+    model_artifact_path,
+    preferred_model_path,
+    read_training_status,
+    training_status_path,
+    write_training_status,
+)
+import instrumentation
+from response_format import BINARY_MIMETYPE, NDJSON_MIMETYPE, RESPONSE_FORMATS, encode_binary, to_columnar
+
+app = Flask(__name__)
+CORS(app)  # Enable CORS for all routes
+
+@app.before_request
+def enable_metrics():
+    """Request, pipeline stage, SQLite and cache metrics, served on /metrics
     
-    def calculate_occupancy_factor(self, date, base_occupancy=0.7, use_actual_data=True):
-        """Calculate pricing factor based on expected occupancy with actual data integration"""
-        if use_actual_data:
-            occupancy_data = self.calculate_occupancy_percentage(date)
-            occupancy_percentage = occupancy_data['occupancy_percentage'] / 100.0
-        else:
-            occasions = self.get_holidays_and_occasions(date)
-            
-            if occasions:
-                base_occupancy += 0.2
-            
-            weekday = date.weekday()
-            if weekday >= 5: 
-                base_occupancy += 0.1
-            
-            occupancy_percentage = min(0.95, max(0.3, base_occupancy))
-        
-        # Higher occupancy = higher prices with more granular scaling
-        if occupancy_percentage >= 0.9:
-            return 1.6
-        elif occupancy_percentage >= 0.85:
-            return 1.4
-        elif occupancy_percentage >= 0.8:
-            return 1.3
-        elif occupancy_percentage >= 0.75:
-            return 1.2
-        elif occupancy_percentage >= 0.7:
-            return 1.1
-        elif occupancy_percentage >= 0.6:
-            return 1.0
-        elif occupancy_percentage >= 0.5:
-            return 0.95
+    Enabled by the first request rather than at import, so tools importing
+    this module never load prometheus_client (gunicorn.conf.py enables them
+    in the master before the model is loaded).
+    """
+    instrumentation.enable()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Count the request and record its latency; streamed bodies are timed to their first byte"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observation = (route, request.method, response.status_code)
+        if response.is_streamed:
+            # The body has not run yet: after_request is called before it is iterated
+            response.response = timed_first_chunk(response.response, observation, start)
         else:
-            return 0.9
-    
-    def calculate_demand_factor(self, date, historical_demand=1.0):
-        """Calculate demand factor based on date and historical data"""
-        occasions = self.get_holidays_and_occasions(date)
-        
-        demand_factor = historical_demand
-        
-        # Apply occasion multipliers
-        if occasions:
-            max_multiplier = 1.0
-            for occasion in occasions:
-                if occasion in self.occasion_multipliers:
-                    max_multiplier = max(max_multiplier, self.occasion_multipliers[occasion])
-            demand_factor *= max_multiplier
-        
-        # Weekend premium
-        if date.weekday() >= 5:
-            demand_factor *= 1.2
-        
-        return min(3.0, max(0.5, demand_factor))  # Cap between 0.5x and 3.0x
-    
-    def generate_training_data(self, num_samples=10000):
-        """Generate synthetic training data focusing on daily rates"""
-        np.random.seed(42)
-        
-        data = []
-        start_date = datetime.now()
-        
-        room_types = ['Standard', 'Deluxe', 'Suite', 'Premium', 'Executive']
-        rate_types = ['EP', 'CP', 'MAP', 'AP', 'AI']
-        
-        for _ in range(num_samples):
-            # Random date within next 365 days
-            current_date = start_date + timedelta(days=int(np.random.randint(1, 365)))
-            
-            room_type = np.random.choice(room_types)
-            rate_type = np.random.choice(rate_types)
-            
-            # Base price based on room type and rate type
-            base_room_prices = {'Standard': 100, 'Deluxe': 150, 'Suite': 250, 'Premium': 350, 'Executive': 450}
-            base_price = base_room_prices[room_type] * self.rate_type_multipliers[rate_type]
-            
-            # Get occasions and factors
-            occasions = self.get_holidays_and_occasions(current_date)
-            occupancy_factor = self.calculate_occupancy_factor(current_date)
-            demand_factor = self.calculate_demand_factor(current_date)
-            
-            # Market variability
-            market_factor = np.random.normal(1.0, 0.1)
-            market_factor = max(0.8, min(1.3, market_factor))
-            
-            # Calculate final price
-            final_price = base_price * occupancy_factor * demand_factor * market_factor
-            final_price *= np.random.normal(1.0, 0.05)  # Small random variation
-            
-            data.append({
-                'date': current_date,
-                'room_type': room_type,
-                'rate_type': rate_type,
-                'weekday': current_date.weekday(),
-                'month': current_date.month,
-                'day_of_month': current_date.day,
-                'is_weekend': 1 if current_date.weekday() >= 5 else 0,
-                'is_holiday': 1 if occasions else 0,
-                'num_occasions': len(occasions),
-                'base_price': base_price,
-                'final_price': final_price,
-                'occupancy_factor': occupancy_factor,
-                'demand_factor': demand_factor
-            })
-        
-        return pd.DataFrame(data)
-    
-    def prepare_features(self, df):
-        """Prepare features for training"""
-        # Encode room type and rate type
-        df['room_type_encoded'] = self.room_type_encoder.fit_transform(df['room_type'])
-        df['rate_type_encoded'] = LabelEncoder().fit_transform(df['rate_type'])
-        
-        feature_columns = [
-            'weekday', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
-            'num_occasions', 'base_price', 'room_type_encoded', 'rate_type_encoded'
-        ]
-        
-        return df[feature_columns]
-    
-    def train_model(self):
-        """Train the dynamic pricing model"""
-        print("Generating training data...")
-        df = self.generate_training_data()
-        
-        print("Preparing features...")
-        X = self.prepare_features(df)
-        y = df['final_price']
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
-        print("Training model...")
-        
-        self.model = GradientBoostingRegressor(
-            n_estimators=200,
-            learning_rate=0.1,
-            max_depth=6,
-            random_state=42
-        )
-        
-        self.model.fit(X_train_scaled, y_train)
-        
-        # Evaluate model
-        y_pred = self.model.predict(X_test_scaled)
-        mae = mean_absolute_error(y_test, y_pred)
-        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-        
-        print(f"Model Performance:")
-        print(f"Mean Absolute Error: ${mae:.2f}")
-        print(f"Root Mean Square Error: ${rmse:.2f}")
-        
-        return self.model
-    
-    def predict_daily_rates(self, base_rates, room_type, rate_type, year_start, custom_multipliers=None, use_historical_fallback=True):
-        """Predict dynamic prices for each day's base rate with enhanced multiplier management"""
-        try:
-            if not base_rates or len(base_rates) == 0:
-                return []
-            
-            predictions = []
-            year_start_date = datetime.strptime(str(year_start)[:10], '%Y-%m-%d')
-            
-            for i, base_rate in enumerate(base_rates):
-                try:
-                    # Calculate date for this rate
-                    current_date = year_start_date + timedelta(days=i)
-                    
-                    # Skip if we've gone beyond the rate year
-                    if current_date.year > year_start_date.year + 1 and current_date.month > 3:
-                        break
-                    
-                    # Convert Decimal to float if needed
-                    base_price = float(base_rate)
-                    
-                    # Determine multiplier to use
-                    multiplier_to_use = 1.0
-                    multiplier_source = 'default'
-                    
-                    # 1. Check if custom multipliers are provided
-                    if custom_multipliers and len(custom_multipliers) > i:
-                        multiplier_to_use = float(custom_multipliers[i])
-                        multiplier_source = 'custom'
-                    
-                    # 2. If no custom multiplier, try historical data
-                    elif use_historical_fallback:
-                        historical_multiplier = self.get_historical_multiplier(current_date, room_type, rate_type)
-                        if historical_multiplier != 1.0:
-                            multiplier_to_use = historical_multiplier
-                            multiplier_source = 'historical'
-                    
-                    # Get occasions and factors for calculation or display
-                    occasions = self.get_holidays_and_occasions(current_date)
-                    occupancy_data = self.calculate_occupancy_percentage(current_date)
-                    occupancy_factor = self.calculate_occupancy_factor(current_date, use_actual_data=True)
-                    demand_factor = self.calculate_demand_factor(current_date)
-                    
-                    # Calculate dynamic rate
-                    if multiplier_source in ['custom', 'historical']:
-                        # Use provided or historical multiplier
-                        dynamic_rate = base_price * multiplier_to_use
-                    else:
-                        # Use ML prediction
-                        if self.model is not None:
-                            try:
-                                # Prepare features for prediction
-                                features = {
-                                    'weekday': current_date.weekday(),
-                                    'month': current_date.month,
-                                    'day_of_month': current_date.day,
-                                    'is_weekend': 1 if current_date.weekday() >= 5 else 0,
-                                    'is_holiday': 1 if occasions else 0,
-                                    'num_occasions': len(occasions),
-                                    'base_price': base_price,
-                                    'room_type_encoded': self.room_type_encoder.transform([room_type])[0],
-                                    'rate_type_encoded': LabelEncoder().fit_transform([rate_type])[0]
-                                }
-                                
-                                # Convert to array and scale
-                                feature_array = np.array([[features[col] for col in [
-                                    'weekday', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
-                                    'num_occasions', 'base_price', 'room_type_encoded', 'rate_type_encoded'
-                                ]]])
-                                
-                                feature_array_scaled = self.scaler.transform(feature_array)
-                                dynamic_rate = float(self.model.predict(feature_array_scaled)[0])
-                                multiplier_source = 'ml_prediction'
-                            except Exception as ml_error:
-                                # Fallback to factor-based calculation
-                                dynamic_rate = base_price * occupancy_factor * demand_factor
-                                multiplier_source = 'factor_calculation'
-                        else:
-                            # Model not available, use factor-based calculation
-                            dynamic_rate = base_price * occupancy_factor * demand_factor
-                            multiplier_source = 'factor_calculation'
-                        
-                        multiplier_to_use = dynamic_rate / base_price
-                    
-                    # Ensure reasonable bounds
-                    min_price = base_price * 0.4  # Minimum 40% of base
-                    max_price = base_price * 4.0  # Maximum 400% of base
-                    dynamic_rate = max(min_price, min(max_price, dynamic_rate))
-                    final_multiplier = dynamic_rate / base_price
-                    
-                    # Save multiplier to history for future use
-                    self.save_multiplier(current_date, room_type, rate_type, final_multiplier, 
-                                       base_price, dynamic_rate, occupancy_factor, demand_factor)
-                    
-                    prediction_result = {
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'base_rate': base_price,
-                        'dynamic_rate': round(dynamic_rate, 2),
-                        'multiplier': round(final_multiplier, 2),
-                        'multiplier_source': multiplier_source,
-                        'occupancy_factor': occupancy_factor,
-                        'demand_factor': demand_factor,
-                        'occupancy_data': occupancy_data,
-                        'occasions': occasions,
-                        'room_type': room_type,
-                        'rate_type': rate_type,
-                        'dependencies_applied': True
-                    }
-                    
-                    predictions.append(prediction_result)
-                    
-                except Exception as e:
-                    # Enhanced fallback with historical data
-                    historical_multiplier = 1.0
-                    if use_historical_fallback:
-                        historical_multiplier = self.get_historical_multiplier(current_date, room_type, rate_type)
-                    
-                    fallback_rate = float(base_rate) * historical_multiplier
-                    
-                    predictions.append({
-                        'date': (year_start_date + timedelta(days=i)).strftime('%Y-%m-%d'),
-                        'base_rate': float(base_rate),
-                        'dynamic_rate': fallback_rate,
-                        'multiplier': historical_multiplier,
-                        'multiplier_source': 'historical_fallback' if historical_multiplier != 1.0 else 'error_fallback',
-                        'occupancy_factor': 1.0,
-                        'demand_factor': 1.0,
-                        'occupancy_data': {'occupancy_percentage': 65.0, 'source': 'default'},
-                        'occasions': [],
-                        'room_type': room_type,
-                        'rate_type': rate_type,
-                        'dependencies_applied': False,
-                        'error': str(e)
-                    })
-            
-            return predictions
-            
-        except Exception as e:
-            print(f"Error in predict_daily_rates: {str(e)}")
-            # Enhanced fallback with historical data
-            fallback_predictions = []
-            year_start_date = datetime.strptime(str(year_start)[:10], '%Y-%m-%d')
-            
-            for i, base_rate in enumerate(base_rates):
-                current_date = year_start_date + timedelta(days=i)
-                historical_multiplier = 1.0
-                
-                if use_historical_fallback:
-                    historical_multiplier = self.get_historical_multiplier(current_date, room_type, rate_type)
-                
-                fallback_predictions.append({
-                    'date': current_date.strftime('%Y-%m-%d'),
-                    'base_rate': float(base_rate),
-                    'dynamic_rate': float(base_rate) * historical_multiplier,
-                    'multiplier': historical_multiplier,
-                    'multiplier_source': 'system_fallback',
-                    'occupancy_factor': 1.0,
-                    'demand_factor': 1.0,
-                    'occupancy_data': {'occupancy_percentage': 65.0, 'source': 'default'},
-                    'occasions': [],
-                    'room_type': room_type,
-                    'rate_type': rate_type,
-                    'dependencies_applied': False,
-                    'error': 'System error, using historical fallback'
-                })
-            
-            return fallback_predictions
-    
-    def save_model(self, filepath='hotel_pricing_model.pkl'):
-        """Save the trained model"""
-        model_data = {
-            'model': self.model,
-            'scaler': self.scaler,
-            'room_type_encoder': self.room_type_encoder,
-            'rate_type_multipliers': self.rate_type_multipliers,
-            'occasion_multipliers': self.occasion_multipliers
-        }
-        joblib.dump(model_data, filepath)
-    
-    def load_model(self, filepath='hotel_pricing_model.pkl'):
-        """Load a trained model"""
-        model_data = joblib.load(filepath)
-        self.model = model_data['model']
-        self.scaler = model_data['scaler']
-        self.room_type_encoder = model_data['room_type_encoder']
-        self.rate_type_multipliers = model_data['rate_type_multipliers']
-        self.occasion_multipliers = model_data['occasion_multipliers']
+            instrumentation.observe_request(*observation, time.perf_counter() - start)
+    instrumentation.flush_queries()
+    return response
+
+def timed_first_chunk(body, observation, start):
+    """Yield a streamed body, observing the request once its first chunk (or its end) is reached"""
+    observed = False
+    try:
+        for chunk in body:
+            if not observed:
+                instrumentation.observe_request(*observation, time.perf_counter() - start)
+                observed = True
+            yield chunk
+    finally:
+        if not observed:
+            instrumentation.observe_request(*observation, time.perf_counter() - start)
+        if hasattr(body, 'close'):
+            body.close()
 
+# The model is created on first use rather than at import, so importing this
+# module (tests, predict.py, tooling) stays cheap and side-effect free
+_pricing_model = None
+_pricing_model_lock = threading.Lock()
 
-# Flask API for integration
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import os
+# Set once this process has been asked to shut down (see gunicorn.conf.py)
+_draining = threading.Event()
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-pricing_model = HotelDynamicPricingModel()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'hotel_pricing_model.pkl')
+ARTIFACT_PATH = model_artifact_path(MODEL_PATH)
+TRAINING_STATUS_PATH = training_status_path(ARTIFACT_PATH)
+
+# How often each process checks whether a new artifact has been published
+MODEL_POLL_INTERVAL = float(os.environ.get('PRICING_MODEL_POLL_INTERVAL', 5))
+_loaded_artifact_mtime = None
+_next_model_check = 0.0
+_model_reload_lock = threading.Lock()
+_training_lock = threading.Lock()
+
+def load_artifact(pricing_model):
+    """Load (or hot-swap in) the published serving artifact
+    
+    If it cannot be loaded, the training job that published it is reported
+    as failed rather than succeeded.
+    """
+    global _loaded_artifact_mtime
+    mtime = os.stat(ARTIFACT_PATH).st_mtime_ns
+    try:
+        pricing_model.load_model(ARTIFACT_PATH)
+    except Exception as e:
+        fail_published_training(e)
+        raise
+    finally:
+        # A broken artifact is not retried until a new one is published
+        _loaded_artifact_mtime = mtime
+
+def fail_published_training(error):
+    """Mark a succeeded training job failed when its published artifact is refused"""
+    status = read_training_status(TRAINING_STATUS_PATH)
+    if status.get('state') == 'succeeded':
+        status.update(state='failed', error=f'Published model could not be loaded: {error}')
+        write_training_status(TRAINING_STATUS_PATH, status)
 
-# Load model on startup
-# ✅ Load model immediately on startup (Flask 3.0+ compatible)
-def load_model_on_startup():
+def load_model_on_startup(pricing_model):
     try:
-        model_path = os.path.join(os.path.dirname(__file__), 'hotel_pricing_model.pkl')
-        if os.path.exists(model_path):
-            # Try to remove the old model file if it has compatibility issues
+        # The memory-mapped serving artifact loads almost instantly and is shared
+        # between worker processes; the pickle is only read when it is missing or stale
+        if preferred_model_path(MODEL_PATH) == ARTIFACT_PATH:
             try:
-                pricing_model.load_model(model_path)
+                load_artifact(pricing_model)
+                print("✅ Dynamic pricing model loaded successfully (serving artifact)")
+                return
+            except Exception as artifact_error:
+                print(f"⚠️ Serving artifact unusable ({artifact_error}), loading {MODEL_PATH}")
+        
+        if os.path.exists(MODEL_PATH):
+            try:
+                pricing_model.load_model(MODEL_PATH)
                 print("✅ Dynamic pricing model loaded successfully")
+                pricing_model.save_artifact(ARTIFACT_PATH)
+                global _loaded_artifact_mtime
+                _loaded_artifact_mtime = os.stat(ARTIFACT_PATH).st_mtime_ns
+                return
             except Exception as load_error:
-                print(f"⚠️ Model loading failed ({load_error}), removing old model and training new one...")
-                os.remove(model_path)
-                print("Training new dynamic pricing model...")
-                pricing_model.train_model()
-                pricing_model.save_model(model_path)
-                print("✅ New model trained and saved successfully")
+                print(f"⚠️ Model loading failed ({load_error})")
         else:
-            print("⚠️ No trained model found. Training new model...")
-            print("Training dynamic pricing model...")
-            pricing_model.train_model()
-            pricing_model.save_model(model_path)
-            print("✅ Model trained and saved successfully")
+            print("⚠️ No trained model found.")
+        
+        # Requests are priced with the factor-based fallback until the new model is swapped in
+        if start_background_training():
+            print("Training a new dynamic pricing model in the background...")
     except Exception as e:
         print(f"❌ Error in model setup: {e}")
         print("⚠️ Running without trained model - will use fallback calculations")
 
-# Call immediately after creating the Flask app
-load_model_on_startup()
+def get_pricing_model():
+    """The shared pricing model, created and loaded on first use"""
+    global _pricing_model
+    if _pricing_model is None:
+        with _pricing_model_lock:
+            if _pricing_model is None:
+                pricing_model = HotelDynamicPricingModel()
+                load_model_on_startup(pricing_model)
+                _pricing_model = pricing_model
+    return _pricing_model
+
+def training_status():
+    """State of the latest background training job, shared by all workers"""
+    status = read_training_status(TRAINING_STATUS_PATH)
+    if status.get('state') == 'running':
+        try:
+            os.kill(status['pid'], 0)
+        except ProcessLookupError:
+            status.update(state='failed', error='Training process exited without reporting a result')
+        except (KeyError, TypeError, PermissionError):
+            pass
+    return status
+
+def start_background_training(max_mae=None, source='synthetic', max_rows=None):
+    """Train and publish a new model version in a separate process
+    
+    Returns False when a training job is already running. Every serving
+    process picks up the published artifact through refresh_model().
+    """
+    with _training_lock:
+        if training_status().get('state') == 'running':
+            return False
+        
+        command = [sys.executable, os.path.join(BASE_DIR, 'training.py'),
+                   '--output', ARTIFACT_PATH, '--status-file', TRAINING_STATUS_PATH]
+        command += ['--source', source]
+        if max_mae is not None:
+            command += ['--max-mae', str(max_mae)]
+        if max_rows is not None:
+            command += ['--max-rows', str(max_rows)]
+        process = subprocess.Popen(command, cwd=BASE_DIR)
+        write_training_status(TRAINING_STATUS_PATH, {
+            'state': 'running',
+            'pid': process.pid,
+            'started_at': datetime.now().isoformat()
+        })
+    
+    def wait_for_training():
+        process.wait()
+        refresh_model(force=True)
+    
+    threading.Thread(target=wait_for_training, name='model-training', daemon=True).start()
+    return True
 
+@app.before_request
+def refresh_model(force=False):
+    """Swap in a newly published artifact, checking at most every MODEL_POLL_INTERVAL seconds"""
+    global _next_model_check
+    if _pricing_model is None or (not force and time.monotonic() < _next_model_check):
+        return
+    if not _model_reload_lock.acquire(blocking=False):
+        return
+    try:
+        _next_model_check = time.monotonic() + MODEL_POLL_INTERVAL
+        if os.path.exists(ARTIFACT_PATH) and os.stat(ARTIFACT_PATH).st_mtime_ns != _loaded_artifact_mtime:
+            load_artifact(_pricing_model)
+            print(f"✅ Swapped in pricing model {_pricing_model.model_version}")
+    except Exception as e:
+        print(f"Error swapping in new model: {e}")
+    finally:
+        _model_reload_lock.release()
+
+def start_draining():
+    """Report not-ready so no new traffic is routed here while in-flight requests finish"""
+    _draining.set()
+
+def finish_draining():
+    """Write out queued multipliers before the process exits"""
+    if _pricing_model is not None:
+        _pricing_model.multiplier_writer.stop()
+
+def request_hotel_id(data=None):
+    """hotel_id from the JSON body or query string as a str; None selects the default database
+    
+    Raises ValueError for an id that cannot name a shard.
+    """
+    hotel_id = (data or {}).get('hotel_id')
+    if hotel_id is None:
+        hotel_id = request.args.get('hotel_id')
+    return HotelDatabaseRouter.hotel_key(hotel_id)
+
+def request_persist(data):
+    """The "persist" flag of a request or batch job, True by default
+    
+    Only JSON booleans are accepted: "false" as a string would be truthy and
+    write what the caller meant as a preview. Raises ValueError otherwise.
+    """
+    persist = data.get('persist', True)
+    if not isinstance(persist, bool):
+        raise ValueError('persist must be true or false')
+    return persist
+
+@app.before_request
+def reject_invalid_hotel_id():
+    """Answer 400 before any work is done when the request names an invalid hotel_id"""
+    data = request.get_json(silent=True) if request.is_json else None
+    try:
+        request_hotel_id(data if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Prediction responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = int(os.environ.get('PRICING_GZIP_LEVEL', 5))
+
+def request_response_format(data=None):
+    """Response format from the JSON body or query string: rows (default), ndjson, columnar or binary"""
+    response_format = (data or {}).get('format') or request.args.get('format') or 'rows'
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format: {response_format} (expected one of {', '.join(RESPONSE_FORMATS)})")
+    return response_format
+
+def prediction_response(payload, response_format):
+    """Encode a prediction payload in the requested format, gzipped when accepted"""
+    stage_start = time.perf_counter()
+    if response_format == 'binary':
+        response = Response(encode_binary(payload), mimetype=BINARY_MIMETYPE)
+    else:
+        response = jsonify(payload)
+    stage_start = instrumentation.lap('serialize', stage_start)
+    
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] and response.content_length >= GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        instrumentation.lap('compress', stage_start)
+    return response
 
 @app.route('/predict-daily-rates', methods=['POST'])
 def predict_daily_rates():
+    """Daily rates for one room/rate type
+    
+    "format" (body or query string) selects the response encoding: "rows"
+    (default) returns one dict per day, "ndjson" streams those dicts one per
+    line followed by a summary record (see stream_pricing_jobs), "columnar"
+    returns predictions as parallel arrays (see response_format.to_columnar),
+    and "binary" is the columnar document with numeric arrays packed as raw
+    buffers.
+    
+    "persist": false previews the rates without writing them to
+    multiplier_history; publish the ones that go live with /commit-daily-rates.
+    """
     try:
         data = request.json
         
@@ -706,6 +311,12 @@ def predict_daily_rates():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
+        try:
+            response_format = request_response_format(data)
+            persist = request_persist(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         base_rates = data['base_rates']
         room_type = data['room_type']
         rate_type = data['rate_type']
@@ -714,37 +325,256 @@ def predict_daily_rates():
         # Optional parameters
         custom_multipliers = data.get('custom_multipliers', None)
         use_historical_fallback = data.get('use_historical_fallback', True)
+        hotel_id = request_hotel_id(data)
+        
+        if response_format == 'ndjson':
+            return stream_response([dict(data, hotel_id=hotel_id)])
         
         # Predict dynamic rates with enhanced multiplier management
-        predictions = pricing_model.predict_daily_rates(
+        predictions = get_pricing_model().predict_daily_rates(
             base_rates=base_rates,
             room_type=room_type,
             rate_type=rate_type,
             year_start=year_start,
             custom_multipliers=custom_multipliers,
-            use_historical_fallback=use_historical_fallback
+            use_historical_fallback=use_historical_fallback,
+            hotel_id=hotel_id,
+            persist=persist
         )
         
-        # Calculate summary statistics
-        total_base_revenue = sum(p['base_rate'] for p in predictions)
-        total_dynamic_revenue = sum(p['dynamic_rate'] for p in predictions)
-        average_multiplier = sum(p['multiplier'] for p in predictions) / len(predictions) if predictions else 1.0
-        revenue_increase = ((total_dynamic_revenue - total_base_revenue) / total_base_revenue * 100) if total_base_revenue > 0 else 0
-        
-        return jsonify({
+        return prediction_response({
             'success': True,
-            'predictions': predictions,
+            'predictions': predictions if response_format == 'rows' else to_columnar(predictions),
             'room_type': room_type,
             'rate_type': rate_type,
+            'persisted': bool(persist),
             'total_days': len(predictions),
-            'summary': {
-                'total_base_revenue': round(total_base_revenue, 2),
-                'total_dynamic_revenue': round(total_dynamic_revenue, 2),
-                'average_multiplier': round(average_multiplier, 2),
-                'revenue_increase_percent': round(revenue_increase, 2),
-                'dependencies_applied': all(p.get('dependencies_applied', False) for p in predictions)
-            }
+            'summary': summarize_predictions(predictions)
+        }, response_format)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+class PredictionSummary:
+    """Running totals for summarize_predictions, fed one chunk of predictions at a time"""
+    
+    def __init__(self):
+        self.days = 0
+        self.total_base_revenue = 0
+        self.total_dynamic_revenue = 0
+        self.total_multiplier = 0
+        self.dependencies_applied = True
+    
+    def add(self, predictions):
+        for p in predictions:
+            self.days += 1
+            self.total_base_revenue += p['base_rate']
+            self.total_dynamic_revenue += p['dynamic_rate']
+            self.total_multiplier += p['multiplier']
+            self.dependencies_applied = self.dependencies_applied and p.get('dependencies_applied', False)
+    
+    def result(self):
+        average_multiplier = self.total_multiplier / self.days if self.days else 1.0
+        revenue_increase = ((self.total_dynamic_revenue - self.total_base_revenue) / self.total_base_revenue * 100) if self.total_base_revenue > 0 else 0
+        
+        return {
+            'total_base_revenue': round(self.total_base_revenue, 2),
+            'total_dynamic_revenue': round(self.total_dynamic_revenue, 2),
+            'average_multiplier': round(average_multiplier, 2),
+            'revenue_increase_percent': round(revenue_increase, 2),
+            'dependencies_applied': bool(self.dependencies_applied)
+        }
+
+def summarize_predictions(predictions):
+    """Calculate summary statistics for a list of daily predictions"""
+    summary = PredictionSummary()
+    summary.add(predictions)
+    return summary.result()
+
+def ndjson_record(record):
+    return app.json.dumps(record) + '\n'
+
+def stream_pricing_jobs(jobs, batch=False):
+    """NDJSON lines for each job's predictions, a chunk at a time as they are computed
+    
+    Every day's prediction is one line in the row format. Each job ends with a
+    {"record": "summary"} line (or {"record": "error"} if it failed), and a batch
+    ends with a {"record": "batch_summary"} line over all jobs. Nothing beyond the
+    chunk being written is held, so memory does not grow with the horizon.
+    """
+    required_fields = ['base_rates', 'room_type', 'rate_type', 'year_start']
+    combined = PredictionSummary()
+    failed_jobs = 0
+    for job in jobs:
+        try:
+            missing = [field for field in required_fields if field not in job]
+            if missing:
+                raise ValueError(f'Missing required field: {missing[0]}')
+            
+            summary = PredictionSummary()
+            for chunk in get_pricing_model().iter_daily_rate_chunks(**pricing_job_args(job)):
+                summary.add(chunk)
+                combined.add(chunk)
+                yield ''.join(ndjson_record(p) for p in chunk)
+        except Exception as e:
+            failed_jobs += 1
+            yield ndjson_record({
+                'record': 'error',
+                'room_type': job.get('room_type'),
+                'rate_type': job.get('rate_type'),
+                'error': str(e)
+            })
+            continue
+        
+        yield ndjson_record({
+            'record': 'summary',
+            'success': True,
+            'room_type': job['room_type'],
+            'rate_type': job['rate_type'],
+            'total_days': summary.days,
+            'summary': summary.result()
         })
+    
+    if batch:
+        combined_summary = combined.result()
+        combined_summary['total_jobs'] = len(jobs)
+        combined_summary['failed_jobs'] = failed_jobs
+        yield ndjson_record({'record': 'batch_summary', 'success': True, 'summary': combined_summary})
+    instrumentation.flush_queries()
+
+def stream_response(jobs, batch=False):
+    return Response(stream_pricing_jobs(jobs, batch), mimetype=NDJSON_MIMETYPE)
+
+# Thread pool for /predict-daily-rates/batch. Jobs run in this process, so they
+# price with the current (hot-swapped) model and share its prediction cache;
+# scoring and SQLite release the GIL for most of a job, and under gunicorn the
+# worker processes provide the parallelism across cores.
+BATCH_WORKERS = int(os.environ.get('PRICING_BATCH_WORKERS', os.cpu_count() or 1))
+_batch_executor = None
+_batch_executor_pid = None
+_batch_executor_lock = threading.Lock()
+
+def get_batch_executor():
+    """Create the batch thread pool on first use (again in a forked child, whose copy has no threads)"""
+    global _batch_executor, _batch_executor_pid
+    with _batch_executor_lock:
+        if _batch_executor is None or _batch_executor_pid != os.getpid():
+            _batch_executor = ThreadPoolExecutor(max_workers=max(1, BATCH_WORKERS), thread_name_prefix='pricing-batch')
+            _batch_executor_pid = os.getpid()
+        return _batch_executor
+
+def pricing_job_args(job):
+    """predict_daily_rates arguments for one batch job"""
+    return {
+        'base_rates': job['base_rates'],
+        'room_type': job['room_type'],
+        'rate_type': job['rate_type'],
+        'year_start': job['year_start'],
+        'custom_multipliers': job.get('custom_multipliers', None),
+        'use_historical_fallback': job.get('use_historical_fallback', True),
+        'hotel_id': HotelDatabaseRouter.hotel_key(job.get('hotel_id')),
+        'persist': request_persist(job)
+    }
+
+def run_pricing_job(job):
+    """Price one (room_type, rate_type) job of a batch request"""
+    predictions = get_pricing_model().predict_daily_rates(**pricing_job_args(job))
+    
+    # Pool threads never reach the after_request hook
+    instrumentation.flush_queries()
+    
+    return pricing_job_result(job, predictions)
+
+def pricing_job_result(job, predictions):
+    return {
+        'success': True,
+        'room_type': job['room_type'],
+        'rate_type': job['rate_type'],
+        'predictions': predictions,
+        'persisted': bool(job.get('persist', True)),
+        'total_days': len(predictions),
+        'summary': summarize_predictions(predictions)
+    }
+
+@app.route('/predict-daily-rates/batch', methods=['POST'])
+def predict_daily_rates_batch():
+    """Predict daily rates for several room/rate combinations in one round trip
+    
+    Accepts the same "format" as /predict-daily-rates; columnar and binary
+    responses encode each job's predictions as its own table. ndjson runs the
+    jobs one after another in this worker and streams their days in job order.
+    A top-level "persist" applies to every job that does not set its own.
+    """
+    try:
+        data = request.json
+        
+        jobs = data.get('jobs') if data else None
+        if not isinstance(jobs, list) or len(jobs) == 0:
+            return jsonify({'error': 'Missing required field: jobs'}), 400
+        if not all(isinstance(job, dict) for job in jobs):
+            return jsonify({'error': 'Each job must be an object'}), 400
+        
+        try:
+            response_format = request_response_format(data)
+            for options in [data] + jobs:
+                request_persist(options)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        required_fields = ['base_rates', 'room_type', 'rate_type', 'year_start']
+        results = [None] * len(jobs)
+        futures = {}
+        
+        # A top-level hotel_id or persist applies to every job that does not set its own
+        hotel_id = request_hotel_id(data)
+        job_defaults = {}
+        if hotel_id is not None:
+            job_defaults['hotel_id'] = hotel_id
+        if 'persist' in data:
+            job_defaults['persist'] = data['persist']
+        jobs = [{**job_defaults, **job} for job in jobs]
+        
+        if response_format == 'ndjson':
+            return stream_response(jobs, batch=True)
+        
+        executor = get_batch_executor()
+        for index, job in enumerate(jobs):
+            missing = [field for field in required_fields if field not in job]
+            if missing:
+                results[index] = {
+                    'success': False,
+                    'room_type': job.get('room_type'),
+                    'rate_type': job.get('rate_type'),
+                    'error': f'Missing required field: {missing[0]}'
+                }
+                continue
+            futures[index] = executor.submit(run_pricing_job, job)
+        
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = {
+                    'success': False,
+                    'room_type': jobs[index].get('room_type'),
+                    'rate_type': jobs[index].get('rate_type'),
+                    'error': str(e)
+                }
+        
+        # Combined summary across every successful job
+        all_predictions = [p for r in results if r['success'] for p in r['predictions']]
+        combined_summary = summarize_predictions(all_predictions)
+        combined_summary['total_jobs'] = len(jobs)
+        combined_summary['failed_jobs'] = sum(1 for r in results if not r['success'])
+        
+        if response_format != 'rows':
+            results = [dict(r, predictions=to_columnar(r['predictions'])) if r['success'] else r for r in results]
+        
+        return prediction_response({
+            'success': True,
+            'results': results,
+            'summary': combined_summary
+        }, response_format)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -765,7 +595,8 @@ def update_occupancy_data():
         total_rooms = data.get('total_rooms')
         occupied_rooms = data.get('occupied_rooms')
         
-        pricing_model.update_occupancy_data(date, actual_occupancy, total_rooms, occupied_rooms)
+        get_pricing_model().update_occupancy_data(date, actual_occupancy, total_rooms, occupied_rooms,
+                                            hotel_id=request_hotel_id(data))
         
         return jsonify({
             'success': True,
@@ -776,12 +607,78 @@ def update_occupancy_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/occupancy-data/bulk', methods=['POST'])
+def update_occupancy_data_bulk():
+    """Update actual occupancy data for many dates in one transaction"""
+    try:
+        data = request.json
+        
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return jsonify({'error': 'Missing required field: records'}), 400
+        
+        parsed_records = []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                return jsonify({'error': f'Each record must be an object (record {index})'}), 400
+            if 'date' not in record:
+                return jsonify({'error': f'Missing required field: date (record {index})'}), 400
+            
+            parsed_records.append({
+                'date': datetime.strptime(record['date'], '%Y-%m-%d'),
+                'actual_occupancy': record.get('actual_occupancy'),
+                'total_rooms': record.get('total_rooms'),
+                'occupied_rooms': record.get('occupied_rooms')
+            })
+        
+        hotel_id = request_hotel_id(data if isinstance(data, dict) else None)
+        updated = get_pricing_model().update_occupancy_data_bulk(parsed_records, hotel_id=hotel_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Occupancy data updated successfully',
+            'records_updated': updated
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/occupancy-data', methods=['GET'])
+def get_occupancy_data_range():
+    """Get occupancy data for every date in a range"""
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        if not start or not end:
+            return jsonify({'error': 'Missing required parameters: start, end'}), 400
+        
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+        if end_date < start_date:
+            return jsonify({'error': 'end must not be before start'}), 400
+        
+        occupancy_range = get_pricing_model().calculate_occupancy_range(start_date, end_date, hotel_id=request_hotel_id())
+        
+        return jsonify({
+            'success': True,
+            'start': start,
+            'end': end,
+            'total_days': len(occupancy_range),
+            'occupancy_data': [
+                {'date': date.strftime('%Y-%m-%d'), 'occupancy_data': data}
+                for date, data in occupancy_range
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/occupancy-data/<date>', methods=['GET'])
 def get_occupancy_data(date):
     """Get occupancy data for a specific date"""
     try:
         target_date = datetime.strptime(date, '%Y-%m-%d')
-        occupancy_data = pricing_model.calculate_occupancy_percentage(target_date)
+        occupancy_data = get_pricing_model().calculate_occupancy_percentage(target_date, hotel_id=request_hotel_id())
         
         return jsonify({
             'success': True,
@@ -801,8 +698,7 @@ def get_multiplier_history():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        conn = sqlite3.connect(pricing_model.db_path)
-        cursor = conn.cursor()
+        cursor = get_pricing_model().databases.get(request_hotel_id()).connection().cursor()
         
         query = '''
             SELECT date, room_type, rate_type, multiplier, base_rate, dynamic_rate,
@@ -832,7 +728,6 @@ def get_multiplier_history():
         
         cursor.execute(query, params)
         results = cursor.fetchall()
-        conn.close()
         
         history = []
         for row in results:
@@ -864,23 +759,19 @@ def get_revenue_analytics():
         start_date = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
         
-        conn = sqlite3.connect(pricing_model.db_path)
-        cursor = conn.cursor()
+        # Timestamps such as 2026-04-01T00:00:00.000Z select their whole day
+        try:
+            start_date = datetime.strptime(start_date[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+            end_date = datetime.strptime(end_date[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'start_date and end_date must be dates (YYYY-MM-DD)'}), 400
         
-        # Get multiplier trends
-        cursor.execute('''
-            SELECT date, AVG(multiplier) as avg_multiplier, 
-                   AVG(occupancy_factor) as avg_occupancy,
-                   AVG(demand_factor) as avg_demand,
-                   COUNT(*) as room_count
-            FROM multiplier_history 
-            WHERE date >= ? AND date <= ?
-            GROUP BY date
-            ORDER BY date
-        ''', (start_date, end_date))
+        hotel_id = request_hotel_id()
+        cursor = get_pricing_model().databases.get(hotel_id).connection().cursor()
         
+        # Get multiplier trends
         daily_trends = []
-        for row in cursor.fetchall():
+        for row in get_pricing_model().get_daily_trends(start_date, end_date, hotel_id):
             daily_trends.append({
                 'date': row[0],
                 'average_multiplier': round(row[1], 2),
@@ -890,19 +781,8 @@ def get_revenue_analytics():
             })
         
         # Get room type performance
-        cursor.execute('''
-            SELECT room_type, rate_type, 
-                   AVG(multiplier) as avg_multiplier,
-                   AVG(dynamic_rate - base_rate) as avg_revenue_gain,
-                   COUNT(*) as booking_days
-            FROM multiplier_history 
-            WHERE date >= ? AND date <= ?
-            GROUP BY room_type, rate_type
-            ORDER BY avg_revenue_gain DESC
-        ''', (start_date, end_date))
-        
         room_performance = []
-        for row in cursor.fetchall():
+        for row in get_pricing_model().get_room_performance(start_date, end_date, hotel_id):
             room_performance.append({
                 'room_type': row[0],
                 'rate_type': row[1],
@@ -928,8 +808,6 @@ def get_revenue_analytics():
                 'total_rooms': row[3]
             })
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'analytics': {
@@ -977,9 +855,10 @@ def set_custom_multiplier():
         dynamic_rate = base_rate * multiplier
         
         # Save the custom multiplier
-        pricing_model.save_multiplier(
+        get_pricing_model().save_multiplier(
             date, room_type, rate_type, multiplier,
-            base_rate, dynamic_rate, 1.0, 1.0  # Default factors for custom multipliers
+            base_rate, dynamic_rate, 1.0, 1.0,  # Default factors for custom multipliers
+            hotel_id=request_hotel_id(data)
         )
         
         return jsonify({
@@ -997,23 +876,116 @@ def set_custom_multiplier():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/commit-daily-rates', methods=['POST'])
+def commit_daily_rates():
+    """Record published daily rates in multiplier_history
+    
+    "rates" is a list of {date, base_rate, dynamic_rate} entries, optionally
+    with room_type/rate_type (defaulting to the top-level fields) and the
+    occupancy and demand factors; the predictions of a "persist": false
+    preview can be sent back as they are. Success means every rate is on
+    disk; if the write fails the answer is a 500 and nothing is recorded.
+    """
+    try:
+        data = request.json
+        
+        rates = data.get('rates') if isinstance(data, dict) else None
+        if not isinstance(rates, list):
+            return jsonify({'error': 'Missing required field: rates'}), 400
+        
+        try:
+            committed = get_pricing_model().commit_daily_rates(
+                rates,
+                room_type=data.get('room_type'),
+                rate_type=data.get('rate_type'),
+                hotel_id=request_hotel_id(data)
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'message': 'Daily rates committed successfully',
+            'rates_committed': committed
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy', 
-        'model_loaded': pricing_model.model is not None,
-        'database_initialized': os.path.exists(pricing_model.db_path),
+        'model_loaded': get_pricing_model().model_loaded,
+        'model_version': get_pricing_model().model_version,
+        'model_compiled': get_pricing_model().compiled is not None,
+        'database_initialized': os.path.exists(get_pricing_model().db_path),
         'version': '2.0.0'
     })
 
+@app.route('/model', methods=['GET'])
+def model_status():
+    pricing_model = get_pricing_model()
+    return jsonify({
+        'model_loaded': pricing_model.model_loaded,
+        'model_version': pricing_model.model_version,
+        'validation': pricing_model.validation,
+        'training': training_status()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition, summed over every serving process"""
+    body, content_type = instrumentation.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of this process's prediction cache"""
+    return jsonify({'pid': os.getpid(), **get_pricing_model().prediction_cache.stats()})
+
+@app.route('/model/train', methods=['POST'])
+def start_model_training():
+    try:
+        data = request.get_json(silent=True) or {}
+        max_mae = data.get('max_mae')
+        if max_mae is not None:
+            max_mae = float(max_mae)
+        max_rows = data.get('max_rows')
+        if max_rows is not None:
+            max_rows = int(max_rows)
+        
+        # 'history' retrains on the recorded multiplier history
+        source = data.get('source', 'synthetic')
+        if source not in ('synthetic', 'history'):
+            return jsonify({'error': f'Unknown training source: {source}'}), 400
+        
+        get_pricing_model()
+        if not start_background_training(max_mae, source, max_rows):
+            return jsonify({'error': 'A training job is already running', 'training': training_status()}), 409
+        return jsonify({'success': True, 'training': training_status()}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    # Unlike /health this never loads the model: a worker is ready once it is
+    # set up and not shutting down. Without a trained model (e.g. while the
+    # first one trains) it still serves, using factor-based pricing.
+    model_loaded = _pricing_model is not None and _pricing_model.model_loaded
+    ready = _pricing_model is not None and not _draining.is_set()
+    return jsonify({
+        'ready': ready,
+        'model_loaded': model_loaded,
+        'draining': _draining.is_set(),
+        'pid': os.getpid()
+    }), 200 if ready else 503
+
 if __name__ == '__main__':
-    # Train model if it doesn't exist
-    model_path = os.path.join(os.path.dirname(__file__), 'hotel_pricing_model.pkl')
-    if not os.path.exists(model_path):
-        print("Training dynamic pricing model...")
-        pricing_model.train_model()
-        pricing_model.save_model(model_path)
-        print("Model trained and saved successfully")
+    # Load the model before accepting requests; if there is none, one is
+    # trained in the background and swapped in when it validates
+    get_pricing_model()
     
-    # Run with better configuration for handling multiple requests
+    # Development server; for production use the pre-fork server:
+    #   gunicorn -c gunicorn.conf.py
     app.run(host='0.0.0.0', port=8001, debug=False, threaded=True)
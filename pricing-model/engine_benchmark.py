@@ -0,0 +1,368 @@
+# engine_benchmark.py
+#
+# Microbenchmarks for the pricing engine's hot paths: predict_daily_rates
+# over several horizons, the historical multiplier and occupancy lookups and
+# the /revenue-analytics queries against databases seeded with synthetic
+# multiplier_history, and training data generation and model fitting.
+#
+#   python3 engine_benchmark.py                          # run everything
+#   python3 engine_benchmark.py --filter predict/365     # a subset
+#   python3 engine_benchmark.py --rows 10000 10000000    # storage sizes
+#   python3 engine_benchmark.py --save                   # record a baseline
+#   python3 engine_benchmark.py --compare                # exit 1 on regressions
+#
+# Seeded databases are built in a temporary directory unless --data-dir names
+# one to keep; seeding ten million rows takes a while, so reuse it.
+import io
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import contextlib
+import platform
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+HORIZONS = [30, 90, 365, 730]
+DEFAULT_ROWS = [10000, 100000, 1000000]
+YEAR_START = '2025-01-01'
+
+# Seeded history ends here, so horizons starting at YEAR_START find it
+HISTORY_END = datetime(2026, 12, 31)
+HISTORY_MAX_DAYS = 3650
+SEED_VERSION = 1
+
+# predict_daily_rates runs against its own history of this size, whatever --rows is
+PREDICT_HISTORY_ROWS = 100000
+
+BENCHMARK_GROUPS = ('predict/', 'storage/', 'analytics/', 'training/')
+
+# Regressions smaller than this are treated as timer noise
+NOISE_FLOOR_SECONDS = 0.00005
+
+
+def seeded_hotel_id(rows):
+    return f'bench{SEED_VERSION}_{rows}'
+
+
+def seed_history(model, rows):
+    """Fill a hotel shard with `rows` synthetic multiplier_history rows (once)
+
+    Every real room/rate type gets history first, padded with synthetic room
+    types, over up to ten years ending at HISTORY_END with one occupancy_data
+    row per date. Triggers are dropped while loading and the rollups rebuilt
+    once, so the result matches what the service would have written.
+    """
+    hotel_id = seeded_hotel_id(rows)
+    db = model.databases.get(hotel_id)
+    conn = db.connection()
+    if conn.execute('SELECT COUNT(*) FROM multiplier_history').fetchone()[0] == rows:
+        return hotel_id
+
+    print(f"Seeding {rows:,} multiplier_history rows into {db.db_path} ...", file=sys.stderr)
+    started = time.perf_counter()
+    rng = np.random.default_rng((SEED_VERSION, rows))
+    real_combos = [(room, rate) for room in model.base_room_prices for rate in model.rate_type_multipliers]
+    days = max(1, min(HISTORY_MAX_DAYS, rows // len(real_combos)))
+    dates = [(HISTORY_END - timedelta(days=days - 1 - i)).strftime('%Y-%m-%d') for i in range(days)]
+    rate_types = list(model.rate_type_multipliers)
+
+    with conn:
+        conn.execute('DELETE FROM multiplier_history')
+        conn.execute('DELETE FROM occupancy_data')
+        for trigger in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS multiplier_history_rollup_{trigger}')
+
+        combo = 0
+        remaining = rows
+        while remaining > 0:
+            if combo < len(real_combos):
+                room_type, rate_type = real_combos[combo]
+            else:
+                room_type, rate_type = f'Synthetic{combo}', rate_types[combo % len(rate_types)]
+            n = min(days, remaining)
+            multipliers = np.round(rng.uniform(0.6, 1.8, n), 2)
+            base_rates = rng.choice([2000.0, 3000.0, 4500.0, 8000.0], n)
+            occupancy_factors = np.round(rng.uniform(0.8, 1.6, n), 2)
+            demand_factors = np.round(rng.uniform(0.9, 1.6, n), 2)
+            conn.executemany('''
+                INSERT INTO multiplier_history
+                (date, room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', zip(dates[days - n:], [room_type] * n, [rate_type] * n, multipliers.tolist(), base_rates.tolist(),
+                     (base_rates * multipliers).tolist(), occupancy_factors.tolist(), demand_factors.tolist()))
+            remaining -= n
+            combo += 1
+
+        occupancy = np.round(rng.uniform(0.4, 0.98, days), 3)
+        conn.executemany('''
+            INSERT INTO occupancy_data (date, actual_occupancy, total_rooms, occupied_rooms)
+            VALUES (?, ?, 100, ?)
+        ''', zip(dates, occupancy.tolist(), np.round(occupancy * 100).astype(int).tolist()))
+
+        cursor = conn.cursor()
+        model.rebuild_rollups(cursor)
+        model.init_rollups(cursor)
+
+    conn.execute('ANALYZE')
+    print(f"Seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return hotel_id
+
+
+def measure(func, repeat, number=1, setup=None):
+    """Seconds per call of func: one warm-up, then `repeat` timed runs of `number` calls"""
+    if setup:
+        setup()
+    func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'runs': repeat,
+        'calls_per_run': number
+    }
+
+
+def predict_benchmarks(model, history_hotel_id, repeat):
+    """predict_daily_rates per horizon, with and without custom multipliers and historical fallback"""
+    benchmarks = {}
+    for days in HORIZONS:
+        base_rates = [3000.0] * days
+        custom = [round(0.8 + 0.01 * (i % 50), 2) for i in range(days)]
+        for use_custom in (False, True):
+            for use_history in (False, True):
+                name = f"predict/{days}d/{'custom' if use_custom else 'model'}+{'history' if use_history else 'nohistory'}"
+
+                # Previews, so runs never add to the seeded history the next run reads
+                def run(base_rates=base_rates, custom=custom if use_custom else None, use_history=use_history):
+                    model.predict_daily_rates(base_rates, 'Deluxe', 'EP', YEAR_START, custom_multipliers=custom,
+                                              use_historical_fallback=use_history,
+                                              hotel_id=history_hotel_id, persist=False, use_cache=False)
+
+                benchmarks[name] = (run, {'repeat': repeat})
+    return benchmarks
+
+
+def storage_benchmarks(model, hotel_ids, repeat):
+    """Historical multiplier and occupancy lookups for random dates/room/rate types"""
+    benchmarks = {}
+    rooms = list(model.base_room_prices)
+    rates = list(model.rate_type_multipliers)
+    for rows, hotel_id in hotel_ids.items():
+        rng = np.random.default_rng(rows)
+        lookups = [
+            (HISTORY_END - timedelta(days=int(day)), rooms[room], rates[rate])
+            for day, room, rate in zip(rng.integers(0, 730, 200), rng.integers(0, len(rooms), 200),
+                                       rng.integers(0, len(rates), 200))
+        ]
+        position = [0]
+
+        def historical(lookups=lookups, hotel_id=hotel_id, position=position):
+            date, room_type, rate_type = lookups[position[0] % len(lookups)]
+            position[0] += 1
+            model.get_historical_multiplier(date, room_type, rate_type, hotel_id)
+
+        def occupancy(lookups=lookups, hotel_id=hotel_id, position=position):
+            date = lookups[position[0] % len(lookups)][0]
+            position[0] += 1
+            model.calculate_occupancy_percentage(date, hotel_id)
+
+        benchmarks[f'storage/get_historical_multiplier/{rows}'] = (historical, {'repeat': repeat, 'number': 200})
+        benchmarks[f'storage/calculate_occupancy_percentage/{rows}'] = (occupancy, {'repeat': repeat, 'number': 200})
+    return benchmarks
+
+
+def analytics_benchmarks(model, hotel_ids, repeat):
+    """The /revenue-analytics view over a month and a year of seeded history"""
+    import app
+
+    # Serve the benchmark's model (and its seeded shards) instead of loading one;
+    # the view is called directly so no model refresh runs before it
+    app._pricing_model = model
+
+    benchmarks = {}
+    end = HISTORY_END.strftime('%Y-%m-%d')
+    for rows, hotel_id in hotel_ids.items():
+        for label, days in (('30d', 30), ('365d', 365)):
+            start = (HISTORY_END - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+            url = f'/revenue-analytics?hotel_id={hotel_id}&start_date={start}&end_date={end}'
+
+            def run(url=url):
+                with app.app.test_request_context(url):
+                    response = app.get_revenue_analytics()
+                if isinstance(response, tuple):
+                    raise RuntimeError(f'{url} returned {response[1]}: {response[0].get_data(as_text=True)}')
+
+            benchmarks[f'analytics/revenue-analytics/{label}/{rows}'] = (run, {'repeat': repeat})
+    return benchmarks
+
+
+def training_benchmarks(repeat):
+    """Synthetic training data generation and a full train_model fit"""
+    from pricing_engine import HotelDynamicPricingModel
+
+    model = HotelDynamicPricingModel()
+
+    def quiet(func):
+        # Training reports progress on stdout, which carries the comparison table
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+        return run
+
+    return {
+        'training/generate_training_data/10000': (quiet(lambda: model.generate_training_data(10000)), {'repeat': repeat}),
+        'training/train_model': (quiet(model.train_model), {'repeat': max(1, repeat // 5)}),
+    }
+
+
+def machine_info():
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'sqlite': __import__('sqlite3').sqlite_version
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each result against the baseline; returns the names that regressed
+
+    Runs are compared on their fastest sample: noise from other processes only
+    ever adds time, so the minimum moves far less between runs than the median.
+    """
+    regressions = []
+    print(f"{'benchmark':<52} {'best':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        line = f"{name:<52} {format_seconds(result['min']):>10}"
+        if base is None:
+            print(f"{line} {'-':>10} {'new':>8}")
+            continue
+        change = result['min'] / base['min'] - 1 if base['min'] else 0.0
+        regressed = change > tolerance and result['min'] - base['min'] > NOISE_FLOOR_SECONDS
+        if regressed:
+            regressions.append(name)
+        print(f"{line} {format_seconds(base['min']):>10} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f'{seconds:.2f} s'
+    if seconds >= 0.001:
+        return f'{seconds * 1e3:.2f} ms'
+    return f'{seconds * 1e6:.1f} us'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for the pricing engine and storage paths')
+    parser.add_argument('--filter', action='append', default=[], help='only run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help=f'multiplier_history sizes to seed (default {" ".join(map(str, DEFAULT_ROWS))})')
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per benchmark (default 7)')
+    parser.add_argument('--data-dir', help='keep seeded databases here and reuse them across runs')
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, help='write results as the baseline (default benchmark_baseline.json)')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, help='compare against a saved baseline; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown of the fastest run before it counts as a regression (default 0.25)')
+    parser.add_argument('--json', action='store_true', help='print the raw results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        data_dir = args.data_dir or scratch_dir
+        os.makedirs(data_dir, exist_ok=True)
+        # Every database the benchmark touches lives under data_dir
+        os.environ['PRICING_DB_PATH'] = os.path.join(data_dir, 'pricing_data.db')
+        os.environ['PRICING_SHARD_DIR'] = data_dir
+        sys.path.insert(0, BASE_DIR)
+
+        # Enabled first so every connection is instrumented as in the service
+        import instrumentation
+        instrumentation.enable()
+        from pricing_engine import HotelDynamicPricingModel, preferred_model_path
+
+        model = HotelDynamicPricingModel()
+        model_path = preferred_model_path(os.path.join(BASE_DIR, 'hotel_pricing_model.pkl'))
+        if os.path.exists(model_path):
+            model.load_model(model_path)
+        else:
+            print('No trained model found; predictions use the factor fallback', file=sys.stderr)
+
+        def wanted(name):
+            return not args.filter or any(f in name for f in args.filter)
+
+        def wanted_group(prefix):
+            # A filter naming another group rules this one out; anything else
+            # (predict/365d, 365d, get_historical) may match inside it
+            return not args.filter or any(
+                f in prefix or f.startswith(prefix) or not f.startswith(BENCHMARK_GROUPS) for f in args.filter)
+
+        benchmarks = {}
+        if wanted_group('predict/'):
+            benchmarks.update(predict_benchmarks(model, seed_history(model, PREDICT_HISTORY_ROWS), args.repeat))
+        if wanted_group('storage/') or wanted_group('analytics/'):
+            hotel_ids = {rows: seed_history(model, rows) for rows in args.rows}
+            benchmarks.update(storage_benchmarks(model, hotel_ids, args.repeat))
+            benchmarks.update(analytics_benchmarks(model, hotel_ids, args.repeat))
+        if wanted_group('training/'):
+            benchmarks.update(training_benchmarks(args.repeat))
+
+        results = {}
+        for name, (func, options) in benchmarks.items():
+            if not wanted(name):
+                continue
+            results[name] = measure(func, **options)
+            print(f"{name:<52} {format_seconds(results[name]['median']):>10} median"
+                  f" {format_seconds(results[name]['min']):>10} best", file=sys.stderr)
+        model.multiplier_writer.stop()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'model': os.path.basename(model_path) if model.model_loaded else None,
+        'results': results
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('machine') != report['machine']:
+            print('Warning: baseline was recorded on a different machine or software stack', file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# gunicorn.conf.py
+#
+# Production serving for the pricing API:
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app and model are loaded once in the master and inherited by the forked
+# workers, so every worker starts ready and CPU-bound pricing runs on all
+# cores instead of behind one GIL. Each worker opens its own SQLite
+# connections and write-behind thread after the fork. On SIGTERM (or a HUP
+# reload) a worker reports not-ready on /ready, finishes in-flight requests
+# within graceful_timeout and flushes queued multipliers before exiting.
+import os
+import glob
+import shutil
+import signal
+import tempfile
+import multiprocessing
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'app:app'
+bind = os.environ.get('PRICING_BIND', '0.0.0.0:8001')
+workers = int(os.environ.get('PRICING_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('PRICING_THREADS', 4))
+preload_app = True
+timeout = int(os.environ.get('PRICING_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('PRICING_GRACEFUL_TIMEOUT', 30))
+
+# Workers already use every core, so each one runs its batch jobs on a
+# single pool thread rather than competing with the other workers
+os.environ.setdefault('PRICING_BATCH_WORKERS', '1')
+
+# Every process records metrics into files here and /metrics sums them. It
+# must be set before the app is imported and must not carry a previous
+# run's files; a HUP reload executes this file again and keeps it as is.
+if os.environ.get('PRICING_METRICS_MASTER') != str(os.getpid()):
+    os.environ['PRICING_METRICS_MASTER'] = str(os.getpid())
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        for stale in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+            os.remove(stale)
+    else:
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='pricing-metrics-')
+        os.environ['PRICING_METRICS_TEMP_DIR'] = os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+
+def on_starting(server):
+    import app
+    import instrumentation
+
+    # Before the model loads, so the load and every worker's connections are measured
+    instrumentation.enable()
+    pricing_model = app.get_pricing_model()
+
+    # SQLite connections must not cross a fork; workers open their own
+    for hotel_id in pricing_model.databases.hotel_ids():
+        pricing_model.databases.get(hotel_id).close()
+
+
+def post_worker_init(worker):
+    import app
+
+    # gunicorn's own SIGTERM handler still runs and starts the graceful stop
+    stop_worker = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        app.start_draining()
+        stop_worker(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    import app
+
+    app.finish_draining()
+
+
+def child_exit(server, worker):
+    import instrumentation
+
+    instrumentation.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if os.environ.get('PRICING_METRICS_TEMP_DIR'):
+        shutil.rmtree(os.environ['PRICING_METRICS_TEMP_DIR'], ignore_errors=True)
@@ -0,0 +1,228 @@
+# instrumentation.py
+#
+# Prometheus metrics for the pricing service. Every hook here is a no-op
+# until enable() is called, so pricing_engine can call them unconditionally
+# and tools that never serve /metrics (predict.py, training.py) neither pay
+# for prometheus_client nor import it.
+#
+# The app enables metrics on its first request, and gunicorn.conf.py in the
+# master before the model is loaded. Under gunicorn, PROMETHEUS_MULTIPROC_DIR
+# points at a per-run directory, so every worker records into it and /metrics
+# reports the sum over processes.
+import os
+import sqlite3
+import threading
+from time import perf_counter
+
+_enabled = False
+_enable_lock = threading.Lock()
+_stage_seconds = {}
+_query_count = {}
+_query_seconds = {}
+_query_local = threading.local()
+_cache_lookups = {}
+_cache_events = {}
+_model_load_seconds = None
+_model_loads = None
+_request_seconds = None
+_requests = None
+
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A year of predictions runs hundreds of SQLite statements, so each thread
+# totals them locally and adds the totals to the metrics at most this often
+# (and after every request and write-behind batch)
+QUERY_FLUSH_INTERVAL = 1.0
+
+
+def enable():
+    """Create the metrics; hooks called before this are not recorded. Safe to call repeatedly"""
+    if not _enabled:
+        with _enable_lock:
+            if not _enabled:
+                _create_metrics()
+
+
+def _create_metrics():
+    global _enabled, _stage_seconds, _query_count, _query_seconds, _cache_lookups, _cache_events
+    global _model_load_seconds, _model_loads, _request_seconds, _requests
+    from prometheus_client import Counter, Gauge, Histogram
+
+    stage_seconds = Histogram('pricing_stage_duration_seconds', 'Time spent in each prediction pipeline stage',
+                              ['stage'], buckets=STAGE_BUCKETS)
+    _stage_seconds = _LabelCache(stage_seconds)
+    _query_count = _LabelCache(Counter('pricing_db_queries_total', 'SQLite statements executed by kind', ['statement']))
+    _query_seconds = _LabelCache(Counter('pricing_db_query_seconds_total', 'Time spent executing SQLite statements by kind',
+                                         ['statement']))
+    cache_lookups = Counter('pricing_prediction_cache_lookups_total', 'Prediction cache lookups by result', ['result'])
+    _cache_lookups = _LabelCache(cache_lookups)
+    cache_events = Counter('pricing_prediction_cache_events_total', 'Prediction cache entries invalidated or evicted', ['event'])
+    _cache_events = _LabelCache(cache_events)
+    _model_load_seconds = Gauge('pricing_model_load_seconds', 'Duration of the most recent model load',
+                                multiprocess_mode='mostrecent')
+    _model_loads = Counter('pricing_model_loads_total', 'Model loads by source format', ['format'])
+    _request_seconds = Histogram('pricing_http_request_duration_seconds',
+                                 'Request latency until the response, or the first chunk of a streamed one, is ready',
+                                 ['route'], buckets=REQUEST_BUCKETS)
+    _requests = Counter('pricing_http_requests_total', 'Requests by route, method and status', ['route', 'method', 'status'])
+    _enabled = True
+
+
+class _LabelCache(dict):
+    """Children of a single-label metric, looked up once per label value"""
+
+    def __init__(self, metric):
+        super().__init__()
+        self.metric = metric
+
+    def __missing__(self, value):
+        child = self[value] = self.metric.labels(value)
+        return child
+
+
+class StageTimer:
+    """Context manager recording the time spent in one pipeline stage"""
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if _enabled:
+            _stage_seconds[self.stage].observe(perf_counter() - self.start)
+
+
+def stage(name):
+    return StageTimer(name)
+
+
+def lap(name, start):
+    """Record a stage that began at start (a perf_counter value); returns the time it ended"""
+    now = perf_counter()
+    if _enabled:
+        _stage_seconds[name].observe(now - start)
+    return now
+
+
+def count_cache_lookup(hit):
+    if _enabled:
+        _cache_lookups['hit' if hit else 'miss'].inc()
+
+
+def count_cache_event(event, count=1):
+    if _enabled and count:
+        _cache_events[event].inc(count)
+
+
+def observe_model_load(model_format, seconds):
+    if _enabled:
+        _model_load_seconds.set(seconds)
+        _model_loads.labels(model_format).inc()
+
+
+def observe_request(route, method, status, seconds):
+    if _enabled:
+        _request_seconds.labels(route).observe(seconds)
+        _requests.labels(route, method, str(status)).inc()
+
+
+def _record_query(sql, start):
+    now = perf_counter()
+    local = _query_local
+    totals = getattr(local, 'totals', None)
+    if totals is None:
+        totals = local.totals = {}
+        local.flushed_at = now
+    parts = sql.split(None, 1)
+    kind = parts[0].lower() if parts else 'empty'
+    entry = totals.get(kind)
+    if entry is None:
+        totals[kind] = [1, now - start]
+    else:
+        entry[0] += 1
+        entry[1] += now - start
+    if now - local.flushed_at > QUERY_FLUSH_INTERVAL:
+        flush_queries()
+
+
+def flush_queries():
+    """Add the calling thread's statement totals to the metrics"""
+    local = _query_local
+    totals = getattr(local, 'totals', None)
+    if not totals or not _enabled:
+        return
+    for kind, (count, seconds) in totals.items():
+        _query_count[kind].inc(count)
+        _query_seconds[kind].inc(seconds)
+    totals.clear()
+    local.flushed_at = perf_counter()
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements are timed by kind (select, insert, ...)"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute runs the statement on a fresh cursor in C, bypassing
+    # TimedCursor.execute, so it is timed here instead
+    def execute(self, sql, parameters=()):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, start)
+
+
+def connection_factory():
+    """sqlite3.connect factory: timed connections once metrics are enabled"""
+    return TimedConnection if _enabled else sqlite3.Connection
+
+
+def render():
+    """(body, content type) of the Prometheus text exposition"""
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges (gunicorn child_exit hook)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
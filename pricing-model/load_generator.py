@@ -0,0 +1,483 @@
+# load_generator.py
+#
+# End-to-end load test for a running pricing service. Virtual users replay
+# the Node backend's call patterns over HTTP: each picks a scenario from the
+# mix, sends its requests one after another the way the controller awaits
+# them, and starts over until the run ends. Latency percentiles, throughput
+# and errors are reported per route and per scenario; "database is locked"
+# failures and predictions served by the engine's error fallback (which
+# answer 200) are counted separately.
+#
+#   python3 load_generator.py --concurrency 8 --duration 60
+#   python3 load_generator.py --mix current --concurrency 32 --hotels 4
+#   python3 load_generator.py --mix rates-sequential=3,occupancy-per-day=1 --sessions 200
+#
+# Start the service first (gunicorn -c gunicorn.conf.py app:app). The run
+# writes occupancy data and multiplier history to the hotels it targets, so
+# point it at a scratch PRICING_DB_PATH / PRICING_SHARD_DIR, not production.
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import http.client
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOM_TYPES = ['Standard', 'Deluxe', 'Suite', 'Premium', 'Executive']
+RATE_TYPES = ['EP', 'CP', 'MAP', 'AP', 'AI']
+BASE_PRICES = {'Standard': 100, 'Deluxe': 150, 'Suite': 250, 'Premium': 350, 'Executive': 450}
+
+# Rate years start on April 1st (rateController.getRates)
+YEAR_START = f'{datetime.now().year}-04-01T00:00:00.000Z'
+YEAR_DAYS = 365
+
+LOCKED_MARKER = b'database is locked'
+FALLBACK_MARKERS = (b'system_fallback', b'error_fallback')
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scenario:
+    """One backend handler: builds the requests it sends, in the order it awaits them"""
+
+    def __init__(self, name, source, build):
+        self.name = name
+        self.source = source
+        self.build = build
+
+
+def room_jobs(rng, rooms):
+    """(room_type, rate_type, base_rates) for a hotel's first `rooms` room/rate combinations"""
+    jobs = []
+    for index in range(rooms):
+        room_type = ROOM_TYPES[index % len(ROOM_TYPES)]
+        rate_type = RATE_TYPES[(index // len(ROOM_TYPES)) % len(RATE_TYPES)]
+        base = BASE_PRICES[room_type] * 30
+        jobs.append((room_type, rate_type, [float(base + rng.randrange(-200, 201, 50)) for _ in range(YEAR_DAYS)]))
+    return jobs
+
+
+def window_dates(rng, days):
+    """`days` consecutive dates ending within the last year"""
+    end = datetime.now() - timedelta(days=rng.randrange(0, 365))
+    return [(end - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days - 1, -1, -1)]
+
+
+def occupancy_record(rng, date, total_rooms=40):
+    occupied = rng.randrange(0, total_rooms + 1)
+    return {'date': date, 'actual_occupancy': occupied / total_rooms * 100, 'total_rooms': total_rooms,
+            'occupied_rooms': occupied}
+
+
+def query_string(**params):
+    """?key=value&... for the parameters that are set (hotel_id None means the default database)"""
+    params = {key: value for key, value in params.items() if value is not None}
+    return f'?{urlencode(params)}' if params else ''
+
+
+# Each builder returns [(route label, method, path, JSON body or None), ...]
+
+def rates_sequential(rng, hotel_id, options):
+    """getRates before batching: one /predict-daily-rates call per room, awaited in turn"""
+    return [
+        ('POST /predict-daily-rates', 'POST', '/predict-daily-rates', {
+            'base_rates': base_rates, 'room_type': room_type, 'rate_type': rate_type,
+            'year_start': YEAR_START, 'use_historical_fallback': True, 'custom_multipliers': None,
+            'hotel_id': hotel_id
+        })
+        for room_type, rate_type, base_rates in room_jobs(rng, options.rooms)
+    ]
+
+
+def rates_batch(rng, hotel_id, options):
+    """getRates: every room/rate combination previewed in one batch round trip"""
+    jobs = [
+        {'base_rates': base_rates, 'room_type': room_type, 'rate_type': rate_type, 'year_start': YEAR_START,
+         'use_historical_fallback': True, 'custom_multipliers': None}
+        for room_type, rate_type, base_rates in room_jobs(rng, options.rooms)
+    ]
+    return [('POST /predict-daily-rates/batch', 'POST', '/predict-daily-rates/batch',
+             {'hotel_id': hotel_id, 'jobs': jobs, 'persist': False})]
+
+
+def rates_by_date(rng, hotel_id, options):
+    """getRatesByRoomAndDate: one room's base rates for a date range (sent with the rate year's start)"""
+    room_type, rate_type, base_rates = rng.choice(room_jobs(rng, options.rooms))
+    start = rng.randrange(0, YEAR_DAYS - options.days + 1) if options.days < YEAR_DAYS else 0
+    return [('POST /predict-daily-rates', 'POST', '/predict-daily-rates', {
+        'base_rates': base_rates[start:start + options.days], 'room_type': room_type, 'rate_type': rate_type,
+        'year_start': YEAR_START, 'hotel_id': hotel_id, 'persist': False
+    })]
+
+
+def occupancy_per_day(rng, hotel_id, options):
+    """Occupancy analytics before the range/bulk endpoints: a GET and a POST per day"""
+    dates = window_dates(rng, options.days)
+    requests = [
+        ('GET /occupancy-data/<date>', 'GET', f'/occupancy-data/{date}{query_string(hotel_id=hotel_id)}', None)
+        for date in dates
+    ]
+    requests.extend(
+        ('POST /occupancy-data', 'POST', '/occupancy-data', dict(occupancy_record(rng, date), hotel_id=hotel_id))
+        for date in dates
+    )
+    return requests
+
+
+def occupancy_range(rng, hotel_id, options):
+    """Occupancy analytics: one range GET, then one bulk POST of the actuals"""
+    dates = window_dates(rng, options.days)
+    query = query_string(start=dates[0], end=dates[-1], hotel_id=hotel_id)
+    return [
+        ('GET /occupancy-data', 'GET', f'/occupancy-data{query}', None),
+        ('POST /occupancy-data/bulk', 'POST', '/occupancy-data/bulk',
+         {'hotel_id': hotel_id, 'records': [occupancy_record(rng, date) for date in dates]}),
+    ]
+
+
+def revenue_analytics(rng, hotel_id, options):
+    """Revenue dashboard: the pricing analytics for the selected window"""
+    dates = window_dates(rng, options.days)
+    query = query_string(start_date=dates[0], end_date=dates[-1], hotel_id=hotel_id)
+    return [('GET /revenue-analytics', 'GET', f'/revenue-analytics{query}', None)]
+
+
+def apply_multipliers(rng, hotel_id, options):
+    """Multiplier propagation: per room, price with custom multipliers then bulk-write occupancy"""
+    requests = []
+    for room_type, rate_type, base_rates in room_jobs(rng, options.rooms):
+        multipliers = [round(rng.uniform(0.8, 1.3), 2) for _ in range(YEAR_DAYS)]
+        requests.append(('POST /predict-daily-rates', 'POST', '/predict-daily-rates', {
+            'base_rates': base_rates, 'room_type': room_type, 'rate_type': rate_type, 'year_start': YEAR_START,
+            'custom_multipliers': multipliers, 'use_historical_fallback': True, 'hotel_id': hotel_id
+        }))
+        records = [occupancy_record(rng, date) for date in window_dates(rng, options.days)]
+        requests.append(('POST /occupancy-data/bulk', 'POST', '/occupancy-data/bulk', {'hotel_id': hotel_id, 'records': records}))
+    return requests
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario('rates-sequential', 'rateController.getRates (per room)', rates_sequential),
+    Scenario('rates-batch', 'rateController.getRates', rates_batch),
+    Scenario('rates-by-date', 'rateController.getRatesByRoomAndDate', rates_by_date),
+    Scenario('occupancy-per-day', 'revenueAnalyticsController occupancy (per day)', occupancy_per_day),
+    Scenario('occupancy-range', 'revenueAnalyticsController occupancy', occupancy_range),
+    Scenario('revenue-analytics', 'revenueAnalyticsController.getRevenueAnalytics', revenue_analytics),
+    Scenario('apply-multipliers', 'revenueAnalyticsController multiplier propagation', apply_multipliers),
+]}
+
+# Named mixes: the storm-shaped traffic the per-room and per-day call
+# patterns produce, and the backend's current batch/range/bulk calls
+MIXES = {
+    'storm': 'rates-sequential=3,occupancy-per-day=2,revenue-analytics=1',
+    'current': 'rates-batch=3,rates-by-date=1,occupancy-range=2,revenue-analytics=1,apply-multipliers=1',
+}
+
+
+def parse_mix(text):
+    """{scenario: weight} from a named mix or "name=weight,..." """
+    text = MIXES.get(text, text)
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Scenario weight must not be negative: {part}")
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one scenario with a positive weight')
+    return mix
+
+
+class Results:
+    """Latency samples and outcome counts, shared by every virtual user"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.outcomes = {}
+        self.sessions = {}
+
+    def record_request(self, route, scenario, seconds, outcome):
+        with self.lock:
+            for key in (('route', route), ('scenario', scenario)):
+                self.latencies.setdefault(key, []).append(seconds)
+                counts = self.outcomes.setdefault(key, {})
+                counts[outcome] = counts.get(outcome, 0) + 1
+
+    def record_session(self, scenario, seconds, failed):
+        with self.lock:
+            entry = self.sessions.setdefault(scenario, {'count': 0, 'failed': 0, 'seconds': []})
+            entry['count'] += 1
+            entry['failed'] += failed
+            entry['seconds'].append(seconds)
+
+
+def classify(status, body):
+    """Outcome of one response: ok, degraded, database_locked or http_<status>"""
+    if LOCKED_MARKER in body:
+        return 'database_locked'
+    if status >= 400:
+        return f'http_{status}'
+    if any(marker in body for marker in FALLBACK_MARKERS):
+        return 'degraded'
+    return 'ok'
+
+
+class VirtualUser(threading.Thread):
+    """Runs scenarios back to back on one keep-alive connection, like one backend request handler"""
+
+    def __init__(self, index, options, mix, results, deadline, session_budget):
+        super().__init__(name=f'user-{index}', daemon=True)
+        self.options = options
+        self.rng = random.Random(options.seed * 1000003 + index)
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.results = results
+        self.deadline = deadline
+        self.session_budget = session_budget
+        self.hotels = [f'{options.hotel_prefix}{i}' for i in range(options.hotels)] if options.hotels else [None]
+        self.connection = None
+
+    def connect(self):
+        url = urlsplit(self.options.url)
+        factory = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.connection = factory(url.hostname, url.port, timeout=self.options.timeout)
+
+    def send(self, method, path, body):
+        """(status, decoded body); reconnects once if a kept-alive connection was dropped"""
+        headers = {'Accept-Encoding': 'gzip'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            if self.connection is None:
+                self.connect()
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status, data
+
+    def run(self):
+        while time.monotonic() < self.deadline and self.session_budget.take():
+            name = self.rng.choices(self.names, self.weights)[0]
+            hotel_id = self.rng.choice(self.hotels)
+            requests = SCENARIOS[name].build(self.rng, hotel_id, self.options)
+            session_start = time.perf_counter()
+            failed = False
+            for route, method, path, body in requests:
+                start = time.perf_counter()
+                try:
+                    status, data = self.send(method, path, body)
+                    outcome = classify(status, data)
+                except TimeoutError:
+                    outcome = 'timeout'
+                except OSError as e:
+                    outcome = f'connection_{type(e).__name__}'
+                except http.client.HTTPException as e:
+                    outcome = f'protocol_{type(e).__name__}'
+                if outcome.startswith(('timeout', 'connection', 'protocol')) and self.connection is not None:
+                    self.connection.close()
+                    self.connection = None
+                if time.monotonic() >= self.options.measure_from:
+                    self.results.record_request(route, name, time.perf_counter() - start, outcome)
+                failed = failed or outcome != 'ok'
+            if time.monotonic() >= self.options.measure_from:
+                self.results.record_session(name, time.perf_counter() - session_start, failed)
+            if self.options.think:
+                time.sleep(self.rng.uniform(0, 2 * self.options.think))
+        if self.connection is not None:
+            self.connection.close()
+
+
+class SessionBudget:
+    """Thread-safe countdown of scenarios left to start (unlimited when None)"""
+
+    def __init__(self, total):
+        self.lock = threading.Lock()
+        self.left = total
+
+    def take(self):
+        if self.left is None:
+            return True
+        with self.lock:
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            return True
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, outcomes, elapsed):
+    ordered = sorted(latencies)
+    errors = sum(count for outcome, count in outcomes.items() if outcome not in ('ok', 'degraded'))
+    return {
+        'requests': len(ordered),
+        'throughput': len(ordered) / elapsed if elapsed else 0.0,
+        'errors': errors,
+        'database_locked': outcomes.get('database_locked', 0),
+        'degraded': outcomes.get('degraded', 0),
+        'outcomes': dict(sorted(outcomes.items())),
+        'latency': {
+            **{f'p{p}': percentile(ordered, p) for p in PERCENTILES},
+            'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+            'max': ordered[-1] if ordered else 0.0
+        }
+    }
+
+
+def build_report(results, elapsed, options, mix):
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'url': options.url,
+        'concurrency': options.concurrency,
+        'hotels': options.hotels,
+        'mix': mix,
+        'elapsed_seconds': elapsed,
+        'routes': {},
+        'scenarios': {}
+    }
+    all_latencies = []
+    all_outcomes = {}
+    for (kind, name), latencies in sorted(results.latencies.items()):
+        outcomes = results.outcomes[(kind, name)]
+        summary = summarize(latencies, outcomes, elapsed)
+        if kind == 'scenario':
+            sessions = results.sessions.get(name, {'count': 0, 'failed': 0, 'seconds': []})
+            ordered = sorted(sessions['seconds'])
+            summary['sessions'] = sessions['count']
+            summary['failed_sessions'] = sessions['failed']
+            summary['session_latency'] = {f'p{p}': percentile(ordered, p) for p in PERCENTILES}
+            report['scenarios'][name] = summary
+        else:
+            report['routes'][name] = summary
+            all_latencies.extend(latencies)
+            for outcome, count in outcomes.items():
+                all_outcomes[outcome] = all_outcomes.get(outcome, 0) + count
+    report['total'] = summarize(all_latencies, all_outcomes, elapsed)
+    return report
+
+
+def format_ms(seconds):
+    return f'{seconds * 1e3:.1f}'
+
+
+def print_report(report):
+    header = f"{'':<34} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'locked':>7} {'degr.':>6}"
+
+    def line(name, summary):
+        latency = summary['latency']
+        return (f"{name:<34} {summary['requests']:>7} {summary['throughput']:>8.1f} {format_ms(latency['p50']):>8}"
+                f" {format_ms(latency['p95']):>8} {format_ms(latency['p99']):>8} {summary['errors']:>7}"
+                f" {summary['database_locked']:>7} {summary['degraded']:>6}")
+
+    print(f"{report['elapsed_seconds']:.1f} s against {report['url']}, concurrency {report['concurrency']}")
+    print()
+    print(header)
+    for name, summary in report['routes'].items():
+        print(line(name, summary))
+    print(line('total', report['total']))
+    print()
+    print(f"{'scenario':<34} {'runs':>7} {'failed':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, summary in report['scenarios'].items():
+        latency = summary['session_latency']
+        print(f"{name:<34} {summary['sessions']:>7} {summary['failed_sessions']:>8} {format_ms(latency['p50']):>8}"
+              f" {format_ms(latency['p95']):>8} {format_ms(latency['p99']):>8}")
+
+    other = {outcome: count for outcome, count in report['total']['outcomes'].items() if outcome != 'ok'}
+    if other:
+        print()
+        print('Outcomes other than ok: ' + ', '.join(f'{outcome}={count}' for outcome, count in other.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the backend's call patterns against a running pricing service")
+    parser.add_argument('--url', default='http://localhost:8001', help='service base URL (default http://localhost:8001)')
+    parser.add_argument('--mix', default='storm',
+                        help=f"named mix ({', '.join(MIXES)}) or scenario=weight,... from: {', '.join(SCENARIOS)} (default storm)")
+    parser.add_argument('--concurrency', type=int, default=8, help='virtual users running scenarios in parallel (default 8)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run (default 30)')
+    parser.add_argument('--sessions', type=int, help='stop after this many scenarios instead of --duration')
+    parser.add_argument('--warmup', type=float, default=0.0, help='seconds at the start not counted in the results')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between a user\'s scenarios in seconds')
+    parser.add_argument('--hotels', type=int, default=1, help='hotels to spread users over; 0 uses the default database (default 1)')
+    parser.add_argument('--hotel-prefix', default='loadtest', help='hotel_id prefix (default loadtest)')
+    parser.add_argument('--rooms', type=int, default=5, help='room/rate combinations per hotel (default 5)')
+    parser.add_argument('--days', type=int, default=30, help='analytics and rate-range window in days (default 30)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds, as the backend uses (default 30)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for scenario choice and payloads')
+    parser.add_argument('--json', nargs='?', const='-', help='write the report as JSON to this file (or stdout)')
+    parser.add_argument('--list', action='store_true', help='list the scenarios and named mixes, then exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in SCENARIOS.values():
+            print(f'{scenario.name:<20} {scenario.source}')
+        print()
+        for name, mix in MIXES.items():
+            print(f'{name:<20} {mix}')
+        return
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    run_for = args.duration if args.sessions is None else float('inf')
+    started = time.monotonic()
+    args.measure_from = started + args.warmup
+    deadline = started + args.warmup + run_for
+    budget = SessionBudget(args.sessions)
+    results = Results()
+
+    users = [VirtualUser(i, args, mix, results, deadline, budget) for i in range(args.concurrency)]
+    for user in users:
+        user.start()
+    try:
+        for user in users:
+            while user.is_alive():
+                user.join(0.5)
+    except KeyboardInterrupt:
+        print('Interrupted; reporting what completed', file=sys.stderr)
+    elapsed = max(0.0, time.monotonic() - args.measure_from)
+
+    report = build_report(results, elapsed, args, mix)
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {args.json}", file=sys.stderr)
+
+    if report['total']['errors']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,104 @@
 # predict.py
+#
+# One-shot:  python3 predict.py '<json request>'
+# Worker:    python3 predict.py --worker
+#
+# Worker mode loads the model once, then reads one JSON request per line on
+# stdin and writes one JSON response per line on stdout. A request's "id" is
+# echoed back so callers can match responses to requests.
 import os
 import sys
 import json
-from app import HotelDynamicPricingModel
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_pricing_model(required=True):
+    """The pricing model, loaded from the serving artifact or the pickle
+
+    With required=False a model that cannot be loaded is reported on stderr
+    and returned untrained, so quotes use the factor-based fallback.
+    """
+    from pricing_engine import HotelDynamicPricingModel, preferred_model_path
+
+    model = HotelDynamicPricingModel()
+    model_path = os.path.join(BASE_DIR, 'hotel_pricing_model.pkl')
+    try:
+        model.load_model(preferred_model_path(model_path))
+    except Exception as e:
+        if required:
+            model.multiplier_writer.stop()
+            raise
+        print(f"⚠️ Model loading failed ({e}), quoting with factor-based pricing")
+    return model
+
+
+def quote(model, input_data):
+    return model.predict_price(
+        checkin_date=input_data['checkin_date'],
+        checkout_date=input_data['checkout_date'],
+        room_type=input_data['room_type'],
+        num_rooms=input_data.get('num_rooms', 1),
+        rate_type=input_data.get('rate_type', 'EP'),
+        base_rate=input_data.get('base_rate'),
+        hotel_id=input_data.get('hotel_id')
+    )
+
+
+def run_worker(out):
+    # The caller waits for "ready" before sending requests, so a model that
+    # cannot be loaded must not keep the worker from starting
+    model = load_pricing_model(required=False)
+    out.write(json.dumps({'ready': True}) + '\n')
+    out.flush()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            input_data = json.loads(line)
+            request_id = input_data.get('id')
+            response = quote(model, input_data)
+        except Exception as e:
+            response = {'error': str(e)}
+
+        if request_id is not None:
+            response['id'] = request_id
+        out.write(json.dumps(response) + '\n')
+        out.flush()
+
+    model.multiplier_writer.stop()
+
 
 def main():
+    # Anything the model prints goes to stderr; stdout carries only JSON
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(out)
+        return
+
     try:
         # Load input from Node.js
         input_data = json.loads(sys.argv[1])
-        
-        # Initialize and load model
-        model = HotelDynamicPricingModel()
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(BASE_DIR, 'hotel_pricing_model.pkl')
-        
-        # Remove print statements from load_model() in your HotelDynamicPricingModel class
-        model.load_model(model_path)
-        
-        # Make prediction
-        prediction = model.predict_price(
-            checkin_date=input_data['checkin_date'],
-            checkout_date=input_data['checkout_date'],
-            room_type=input_data['room_type'],
-            num_rooms=input_data['num_rooms']
-        )
-        
+
+        model = load_pricing_model()
+        prediction = quote(model, input_data)
+        model.multiplier_writer.stop()
+
         # Return only JSON output
-        sys.stdout.write(json.dumps(prediction))
-        
+        out.write(json.dumps(prediction))
+
     except Exception as e:
         # Return error as JSON
         error = {'error': str(e)}
-        sys.stdout.write(json.dumps(error))
+        out.write(json.dumps(error))
         sys.exit(1)
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,2055 @@
+# pricing_engine.py
+#
+# Serving side of the dynamic pricing model: storage, occasion calendar and
+# daily-rate prediction. Importing this module does no work and pulls in no
+# heavy dependencies; holidays, joblib and scikit-learn load on first use and
+# the training code lives in training.py.
+import numpy as np
+from datetime import datetime, timedelta
+import warnings
+import sqlite3
+import os
+import json
+import struct
+import threading
+import queue
+import time
+import atexit
+from bisect import bisect_left
+from collections import OrderedDict
+import instrumentation
+warnings.filterwarnings('ignore')
+
+# Upsert for multiplier_history. An UPDATE (rather than INSERT OR REPLACE's
+# implicit delete) keeps the rollup triggers in step with the history table.
+MULTIPLIER_UPSERT_SQL = '''
+    INSERT INTO multiplier_history 
+    (date, room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date, room_type, rate_type) DO UPDATE SET
+        multiplier = excluded.multiplier,
+        base_rate = excluded.base_rate,
+        dynamic_rate = excluded.dynamic_rate,
+        occupancy_factor = excluded.occupancy_factor,
+        demand_factor = excluded.demand_factor,
+        created_at = CURRENT_TIMESTAMP
+'''
+
+# Model feature order, shared by training and inference
+FEATURE_COLUMNS = [
+    'weekday', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
+    'num_occasions', 'base_price', 'room_type_encoded', 'rate_type_encoded'
+]
+
+# Serving artifact: magic, (format version, header length), JSON header, then
+# the raw arrays, each starting on an ARTIFACT_ALIGNMENT byte boundary
+MODEL_ARTIFACT_MAGIC = b'HPMODEL\x00'
+MODEL_ARTIFACT_VERSION = 1
+ARTIFACT_ALIGNMENT = 64
+
+class PricingDatabase:
+    """Persistent per-thread SQLite connections for the pricing store
+    
+    Each thread opens its connection once and keeps it; forked worker processes
+    notice the pid change and open their own. Connections run in WAL mode so
+    readers proceed alongside the single writer, and wait on busy_timeout
+    instead of failing with "database is locked".
+    """
+    
+    def __init__(self, db_path, busy_timeout_ms=5000, cache_size_kb=16384, mmap_size=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+    
+    def _connect(self):
+        # cached_statements keeps prepared statements for the hot queries
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000.0, cached_statements=256,
+                               factory=instrumentation.connection_factory())
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+    
+    def connection(self):
+        """Connection owned by the calling thread, opened on first use"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None or local.pid != os.getpid():
+            conn = self._connect()
+            local.conn = conn
+            local.pid = os.getpid()
+        return conn
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+class HotelDatabaseRouter:
+    """Routes each hotel to its own SQLite shard
+    
+    Requests without a hotel_id use the default database; every other hotel gets
+    hotel_<id>.db under shard_dir, so hotels no longer share one file and one
+    write lock. Shards are created and initialized on first use.
+    """
+    
+    def __init__(self, default_path, shard_dir, initializer):
+        self.default_path = default_path
+        self.shard_dir = shard_dir
+        self.initializer = initializer
+        self._shards = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def hotel_key(hotel_id):
+        """Canonical form of a hotel_id: None for the default database, otherwise a str
+        
+        5 and '5' are the same hotel. Raises ValueError for an id that cannot
+        name a shard file.
+        """
+        if hotel_id is None:
+            return None
+        
+        hotel_key = str(hotel_id)
+        if not hotel_key or not all(ch.isalnum() or ch in '-_' for ch in hotel_key):
+            raise ValueError(f'Invalid hotel_id: {hotel_id}')
+        return hotel_key
+    
+    def shard_path(self, hotel_id=None):
+        """Database file for a hotel"""
+        hotel_key = self.hotel_key(hotel_id)
+        if hotel_key is None:
+            return self.default_path
+        return os.path.join(self.shard_dir, f'hotel_{hotel_key}.db')
+    
+    def get(self, hotel_id=None):
+        """PricingDatabase for a hotel, initializing its schema on first use"""
+        if hotel_id is not None and not isinstance(hotel_id, str):
+            hotel_id = self.hotel_key(hotel_id)
+        db = self._shards.get(hotel_id)
+        if db is not None:
+            return db
+        
+        with self._lock:
+            db = self._shards.get(hotel_id)
+            if db is None:
+                path = self.shard_path(hotel_id)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                db = PricingDatabase(path)
+                self.initializer(db)
+                self._shards[hotel_id] = db
+            return db
+    
+    def hotel_ids(self):
+        """Hotels with an open shard, None being the default database"""
+        return list(self._shards.keys())
+    
+    def all_hotel_ids(self):
+        """Every hotel with a shard on disk, opened or not, plus None for the default database"""
+        hotel_ids = [None]
+        if os.path.isdir(self.shard_dir):
+            for name in sorted(os.listdir(self.shard_dir)):
+                if name.startswith('hotel_') and name.endswith('.db'):
+                    hotel_ids.append(name[len('hotel_'):-len('.db')])
+        return hotel_ids
+
+
+class MultiplierWriter:
+    """Write-behind queue for multiplier_history rows
+    
+    Requests hand their rows to submit() and return without waiting on disk. A
+    background thread drains the queue every flush_interval seconds, merges rows
+    from all pending requests (last write per date/room/rate wins) and writes them
+    with one executemany in one transaction per database. When the bounded queue
+    is full the caller writes its own rows synchronously instead of dropping them.
+    After each commit on_write(hotel_id, rows) is called with the rows written.
+    """
+    
+    _FLUSH = object()
+    _STOP = object()
+    
+    def __init__(self, flush_interval=0.5, max_queue=1000, on_write=None):
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.on_write = on_write
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def _ensure_started(self):
+        # Threads do not survive fork, so each process starts its own writer
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._thread = threading.Thread(target=self._run, name='multiplier-writer', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+    
+    def submit(self, db, rows, hotel_id=None):
+        """Queue rows bound for db (hotel_id's shard) for the next flush"""
+        if not rows:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((db, list(rows), hotel_id))
+        except queue.Full:
+            self._write([(db, rows, hotel_id)])
+    
+    def flush(self):
+        """Block until every row submitted so far is on disk"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(self._FLUSH)
+        self._queue.join()
+    
+    def stop(self):
+        """Flush pending rows and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            pending = []
+            item = self._queue.get()
+            taken = 1
+            deadline = time.monotonic() + self.flush_interval
+            
+            # Collect until the flush interval elapses or a flush/stop is requested
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if item is self._FLUSH:
+                    break
+                pending.append(item)
+                
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    taken += 1
+                except queue.Empty:
+                    break
+            
+            self._write(pending)
+            instrumentation.flush_queries()
+            for _ in range(taken):
+                self._queue.task_done()
+    
+    def _write(self, batches):
+        merged = {}
+        hotel_ids = {}
+        for db, rows, hotel_id in batches:
+            db_rows = merged.setdefault(db, {})
+            hotel_ids[db] = hotel_id
+            for row in rows:
+                db_rows[(row[0], row[1], row[2])] = row
+        
+        for db, db_rows in merged.items():
+            rows = list(db_rows.values())
+            try:
+                with db.connection() as conn:
+                    conn.executemany(MULTIPLIER_UPSERT_SQL, rows)
+            except Exception as e:
+                print(f"Error saving multipliers: {e}")
+                continue
+            if self.on_write is not None:
+                try:
+                    self.on_write(hotel_ids[db], rows)
+                except Exception as e:
+                    print(f"Error after saving multipliers: {e}")
+
+
+class OccasionCalendar:
+    """Per-year cache of holidays/occasions and the day features derived from them
+    
+    Each year is computed once (one holidays.US build, one pass over its days)
+    and kept until more than max_years years are cached, oldest-used first.
+    """
+    
+    def __init__(self, occasion_multipliers, max_years=8):
+        self.occasion_multipliers = occasion_multipliers
+        self.max_years = max_years
+        self._years = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _day_occasions(date, us_holidays):
+        """Occasion names for one date"""
+        occasions = []
+        
+        # US Holidays
+        if date in us_holidays:
+            occasions.append(us_holidays[date])
+        
+        month = date.month
+        day = date.day
+        
+        # Weekend
+        if date.weekday() >= 5:  # Saturday=5, Sunday=6
+            occasions.append('Weekend')
+        
+        # Seasonal occasions
+        if month in [6, 7, 8]:
+            occasions.append('Summer Peak')
+        elif month in [12, 1]:
+            occasions.append('Winter Holiday')
+        elif month in [3, 4]:
+            occasions.append('Spring Break')
+        
+        # Wedding season 
+        if month >= 4 and month <= 10:
+            occasions.append('Wedding Season')
+        
+        # Festival season 
+        if month >= 10 or month <= 3:
+            occasions.append('Festival')
+        
+        # Valentine's Day
+        if month == 2 and day == 14:
+            occasions.append('Valentine\'s Day')
+        
+        return occasions
+    
+    def _build_year(self, year):
+        import holidays
+        
+        us_holidays = holidays.US(years=year)
+        first_day = datetime(year, 1, 1)
+        num_days = (datetime(year + 1, 1, 1) - first_day).days
+        
+        occasions = [self._day_occasions(first_day + timedelta(days=i), us_holidays) for i in range(num_days)]
+        known = self.occasion_multipliers
+        
+        return {
+            'occasions': occasions,
+            'num_occasions': np.array([len(o) for o in occasions], dtype=np.int64),
+            'is_weekend': np.array([(first_day + timedelta(days=i)).weekday() >= 5 for i in range(num_days)]),
+            # Largest known multiplier, floored at 1.0 (demand factor rule)
+            'max_multiplier': np.array([
+                max([1.0] + [known[occ] for occ in o if occ in known]) for o in occasions
+            ]),
+            # Largest boost over 1.0, unknown occasions count as 1.0 (occupancy rule)
+            'occasion_boost': np.array([
+                max([known.get(occ, 1.0) - 1.0 for occ in o]) if o else 0.0 for o in occasions
+            ])
+        }
+    
+    def _year(self, year):
+        with self._lock:
+            entry = self._years.get(year)
+            if entry is None:
+                entry = self._build_year(year)
+                self._years[year] = entry
+                while len(self._years) > self.max_years:
+                    self._years.popitem(last=False)
+            else:
+                self._years.move_to_end(year)
+            return entry
+    
+    def occasions(self, date):
+        """Occasion names for a single date"""
+        return list(self._year(date.year)['occasions'][date.timetuple().tm_yday - 1])
+    
+    def features(self, dates):
+        """Occasion features for a sequence of dates as aligned NumPy arrays
+        
+        Returns is_holiday, num_occasions, max_multiplier, occasion_boost and
+        is_weekend arrays plus the per-date occasion lists.
+        """
+        n = len(dates)
+        years = np.fromiter((d.year for d in dates), dtype=np.int64, count=n)
+        day_index = np.fromiter((d.timetuple().tm_yday - 1 for d in dates), dtype=np.int64, count=n)
+        
+        num_occasions = np.zeros(n, dtype=np.int64)
+        max_multiplier = np.ones(n)
+        occasion_boost = np.zeros(n)
+        is_weekend = np.zeros(n, dtype=bool)
+        occasions = [None] * n
+        
+        for year in np.unique(years):
+            entry = self._year(int(year))
+            mask = years == year
+            idx = day_index[mask]
+            num_occasions[mask] = entry['num_occasions'][idx]
+            max_multiplier[mask] = entry['max_multiplier'][idx]
+            occasion_boost[mask] = entry['occasion_boost'][idx]
+            is_weekend[mask] = entry['is_weekend'][idx]
+            for position, day in zip(np.flatnonzero(mask), idx):
+                occasions[position] = entry['occasions'][day]
+        
+        return {
+            'is_holiday': num_occasions > 0,
+            'num_occasions': num_occasions,
+            'max_multiplier': max_multiplier,
+            'occasion_boost': occasion_boost,
+            'is_weekend': is_weekend,
+            'occasions': occasions
+        }
+
+
+class PredictionCache:
+    """Bounded LRU cache of predict_daily_rates results, each kept for at most ttl seconds
+    
+    Entries are keyed by the full request content, hotel_id taken as a str
+    like the database router does. Each entry covers the dates its horizon
+    spans for one hotel, room type and rate type, and writes that feed
+    predictions invalidate exactly the entries they touch. A result
+    is only stored if no invalidation for its hotel (and no clear) happened
+    while it was computed; see generation(). The cache is per process: a
+    forked child starts empty, and writes made by other processes are bounded
+    by the TTL.
+    """
+    
+    def __init__(self, max_entries=64, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._epoch = 0
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def key(base_rates, room_type, rate_type, year_start, custom_multipliers=None, use_historical_fallback=True, hotel_id=None, persist=True):
+        """Cache key for a request, or None if it cannot be cached
+        
+        Previews are keyed apart from persisting requests, so a cached preview
+        never stands in for a request that has to write its multipliers.
+        """
+        try:
+            key = (
+                None if hotel_id is None else str(hotel_id), room_type, rate_type, str(year_start)[:10], tuple(base_rates),
+                json.dumps(custom_multipliers, sort_keys=True, default=str) if custom_multipliers else None,
+                bool(use_historical_fallback), bool(persist)
+            )
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._entries.clear()
+            self._pid = os.getpid()
+    
+    def get(self, key):
+        """Cached predictions for key, or None"""
+        if key is None or self.max_entries <= 0:
+            return None
+        with self._lock:
+            self._check_pid()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                instrumentation.count_cache_lookup(False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            instrumentation.count_cache_lookup(True)
+            return entry[3]
+    
+    def generation(self, hotel_id):
+        """Token to take before computing a result for hotel_id and pass to put()
+        
+        It changes on every invalidation for the hotel and on clear(), so a
+        result computed from data that changed meanwhile is not stored.
+        """
+        hotel_id = None if hotel_id is None else str(hotel_id)
+        with self._lock:
+            return (self._epoch, self._generations.get(hotel_id, 0))
+    
+    def put(self, key, predictions, generation=None):
+        if key is None or self.max_entries <= 0 or not predictions:
+            return
+        with self._lock:
+            self._check_pid()
+            if generation is not None and generation != (self._epoch, self._generations.get(key[0], 0)):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, predictions[0]['date'], predictions[-1]['date'], predictions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                instrumentation.count_cache_event('eviction')
+    
+    def invalidate(self, hotel_id, dates, room_type=None, rate_type=None):
+        """Drop entries for hotel_id whose horizon covers any of dates (YYYY-MM-DD),
+        limited to room_type / rate_type when given"""
+        dates = sorted(dates)
+        if not dates:
+            return
+        hotel_id = None if hotel_id is None else str(hotel_id)
+        with self._lock:
+            self._check_pid()
+            self._generations[hotel_id] = self._generations.get(hotel_id, 0) + 1
+            stale = []
+            for key, (_, first_date, last_date, _) in self._entries.items():
+                if key[0] != hotel_id:
+                    continue
+                if (room_type is not None and key[1] != room_type) or (rate_type is not None and key[2] != rate_type):
+                    continue
+                i = bisect_left(dates, first_date)
+                if i < len(dates) and dates[i] <= last_date:
+                    stale.append(key)
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            instrumentation.count_cache_event('invalidation', len(stale))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions
+            }
+
+
+class CompiledTreeEnsemble:
+    """A fitted gradient-boosted tree ensemble compiled into flat NumPy arrays
+    
+    Scoring needs no scikit-learn. Each tree's leaves, left to right, are the
+    bits of a uint64 (trees may have at most 64 leaves), and a row's exit leaf
+    is the lowest bit that survives every split it fails. Split thresholds are
+    grouped per feature, sorted and folded through the StandardScaler into raw
+    feature units; masks[j] holds, per tree, the AND of the masks of all splits
+    whose threshold is below the j-th one. So a whole batch is scored with
+    one searchsorted and one row gather per feature.
+    """
+    
+    ALL_LEAVES = np.uint64(0xFFFFFFFFFFFFFFFF)
+    MAX_LEAVES = 64
+    CHUNK_ROWS = 256  # keeps the (rows x trees) mask in cache
+    
+    def __init__(self, thresholds, threshold_offsets, masks, mask_offsets, leaf_values, baseline):
+        self.thresholds = np.ascontiguousarray(thresholds, dtype=np.float64)
+        self.threshold_offsets = np.ascontiguousarray(threshold_offsets, dtype=np.intp)
+        self.masks = np.ascontiguousarray(masks, dtype=np.uint64)
+        self.mask_offsets = np.ascontiguousarray(mask_offsets, dtype=np.intp)
+        self.leaf_values = np.ascontiguousarray(leaf_values, dtype=np.float64)
+        self.baseline = float(baseline)
+        self._leaf_base = np.arange(self.leaf_values.shape[0], dtype=np.intp) * self.leaf_values.shape[1]
+    
+    @staticmethod
+    def _float32_boundary(threshold):
+        # sklearn compares float32(x) <= threshold; this is the float64 value
+        # below which x rounds to a float32 that satisfies the split
+        below = threshold.astype(np.float32)
+        below = np.where(below.astype(np.float64) > threshold, np.nextafter(below, np.float32(-np.inf)), below)
+        above = np.nextafter(below, np.float32(np.inf))
+        return (below.astype(np.float64) + above.astype(np.float64)) / 2
+    
+    @classmethod
+    def from_estimator(cls, estimator, scaler=None):
+        """Compile a fitted GradientBoostingRegressor (and the scaler in front of it)
+        or HistGradientBoostingRegressor"""
+        if hasattr(estimator, '_predictors'):
+            return cls._compile(*cls._histogram_trees(estimator))
+        return cls._compile(*cls._gradient_boosting_trees(estimator, scaler))
+    
+    @classmethod
+    def _gradient_boosting_trees(cls, estimator, scaler):
+        n_features = estimator.n_features_in_
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if getattr(scaler, 'mean_', None) is not None:
+                mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, 'scale_', None) is not None:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+        
+        trees = []
+        for tree in estimator.estimators_[:, 0]:
+            t = tree.tree_
+            is_leaf = t.children_left < 0
+            feature = np.where(is_leaf, 0, t.feature)
+            # Scaled split x' <= t is the raw split x <= t * scale + mean
+            threshold = cls._float32_boundary(t.threshold) * scale[feature] + mean[feature]
+            trees.append((t.children_left, t.children_right, feature, threshold,
+                          t.value[:, 0, 0] * estimator.learning_rate, is_leaf))
+        
+        init = estimator.init_
+        baseline = 0.0 if isinstance(init, str) else float(np.ravel(init.constant_)[0])
+        return n_features, trees, baseline
+    
+    @classmethod
+    def _histogram_trees(cls, estimator):
+        # Leaf values already include the learning rate and splits compare raw
+        # float64 features (x <= threshold goes left), so they carry over as is
+        trees = []
+        for (predictor,) in estimator._predictors:
+            nodes = predictor.nodes
+            if nodes['is_categorical'].any():
+                raise ValueError('Categorical splits cannot be compiled')
+            is_leaf = nodes['is_leaf'].astype(bool)
+            trees.append((nodes['left'], nodes['right'], nodes['feature_idx'], nodes['num_threshold'],
+                          nodes['value'], is_leaf))
+        
+        baseline = float(np.ravel(estimator._baseline_prediction)[0])
+        return estimator.n_features_in_, trees, baseline
+    
+    @classmethod
+    def _compile(cls, n_features, trees, baseline):
+        """Build the ensemble from per-tree (left, right, feature, threshold, value, is_leaf)
+        node arrays, thresholds in raw feature units and values already scaled"""
+        # One (feature, threshold, tree, mask) per split; the mask clears the
+        # split's left-subtree leaves, which a row going right cannot reach
+        splits = []
+        leaf_values = np.zeros((len(trees), cls.MAX_LEAVES))
+        for tree_index, (left, right, feature, threshold, value, is_leaf) in enumerate(trees):
+            leaves = []
+            
+            def walk(node):
+                if is_leaf[node]:
+                    leaves.append(value[node])
+                    return
+                first = len(leaves)
+                walk(left[node])
+                left_leaves = ((1 << len(leaves)) - 1) ^ ((1 << first) - 1)
+                splits.append((feature[node], threshold[node], tree_index, ~left_leaves & 0xFFFFFFFFFFFFFFFF))
+                walk(right[node])
+            
+            walk(0)
+            if len(leaves) > cls.MAX_LEAVES:
+                raise ValueError(f'Tree {tree_index} has {len(leaves)} leaves; at most {cls.MAX_LEAVES} can be compiled')
+            leaf_values[tree_index, :len(leaves)] = leaves
+        
+        features = np.array([s[0] for s in splits], dtype=np.intp)
+        thresholds = np.array([s[1] for s in splits], dtype=np.float64)
+        
+        all_thresholds, all_masks = [], []
+        threshold_offsets, mask_offsets = [0], [0]
+        for feature in range(n_features):
+            on_feature = np.flatnonzero(features == feature)
+            unique, group = np.unique(thresholds[on_feature], return_inverse=True)
+            
+            masks = np.full((len(unique) + 1, len(trees)), cls.ALL_LEAVES)
+            running = masks[0].copy()
+            for j in range(len(unique)):
+                for split in on_feature[group == j]:
+                    running[splits[split][2]] &= np.uint64(splits[split][3])
+                masks[j + 1] = running
+            
+            all_thresholds.append(unique)
+            all_masks.append(masks)
+            threshold_offsets.append(threshold_offsets[-1] + len(unique))
+            mask_offsets.append(mask_offsets[-1] + len(masks))
+        
+        return cls(
+            np.concatenate(all_thresholds), threshold_offsets,
+            np.concatenate(all_masks), mask_offsets,
+            leaf_values, baseline
+        )
+    
+    @property
+    def nbytes(self):
+        return self.thresholds.nbytes + self.masks.nbytes + self.leaf_values.nbytes
+    
+    def predict(self, X):
+        """Score raw feature rows; equivalent to estimator.predict(scaler.transform(X))"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[0] <= self.CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([
+            self._predict_chunk(X[start:start + self.CHUNK_ROWS])
+            for start in range(0, X.shape[0], self.CHUNK_ROWS)
+        ])
+    
+    def _predict_chunk(self, X):
+        surviving = np.full((X.shape[0], self.leaf_values.shape[0]), self.ALL_LEAVES)
+        for feature in range(len(self.threshold_offsets) - 1):
+            start, end = self.threshold_offsets[feature], self.threshold_offsets[feature + 1]
+            if start == end:
+                continue
+            # Splits with threshold < x send the row right
+            failed = np.searchsorted(self.thresholds[start:end], X[:, feature], side='left')
+            surviving &= self.masks[self.mask_offsets[feature] + failed]
+        
+        # Exit leaf = lowest surviving bit
+        lowest = surviving & (~surviving + np.uint64(1))
+        leaf = np.frexp(lowest.astype(np.float64))[1] - 1
+        return self.baseline + self.leaf_values.ravel().take(leaf + self._leaf_base).sum(axis=1)
+    
+    def to_arrays(self):
+        """The arrays that make up the ensemble, for write_model_artifact"""
+        return {
+            'thresholds': self.thresholds,
+            'threshold_offsets': self.threshold_offsets.astype(np.int64),
+            'masks': self.masks,
+            'mask_offsets': self.mask_offsets.astype(np.int64),
+            'leaf_values': self.leaf_values
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays, baseline):
+        """Rebuild from to_arrays() output; the large arrays are used in place, not copied"""
+        return cls(
+            arrays['thresholds'], arrays['threshold_offsets'],
+            arrays['masks'], arrays['mask_offsets'],
+            arrays['leaf_values'], baseline
+        )
+
+
+class CategoryEncoder:
+    """Label to code lookup equivalent to a fitted LabelEncoder, without scikit-learn"""
+    
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+        self._codes = {label: code for code, label in enumerate(self.classes_.tolist())}
+    
+    def transform(self, labels):
+        try:
+            return np.array([self._codes[label] for label in labels], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f'y contains previously unseen labels: {e}')
+
+
+class ModelState:
+    """Everything predictions read from a trained model, published as one immutable unit
+    
+    Loading or training never modifies a state: it builds a new one and swaps
+    HotelDynamicPricingModel.state in a single assignment. A request that
+    takes the state once therefore scores with encoders, model, multipliers
+    and calendar that belong together, even while a new model is swapped in.
+    """
+    
+    FIELDS = ('model', 'scaler', 'compiled', 'room_type_encoder', 'rate_type_encoder',
+              'rate_type_multipliers', 'occasion_multipliers', 'calendar', 'model_version', 'validation')
+    __slots__ = FIELDS
+    
+    def __init__(self, **fields):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f'Unknown model state fields: {sorted(unknown)}')
+        # Holidays/occasions are computed once per year and reused
+        if fields.get('calendar') is None and fields.get('occasion_multipliers') is not None:
+            fields['calendar'] = OccasionCalendar(fields['occasion_multipliers'])
+        for name in self.FIELDS:
+            object.__setattr__(self, name, fields.get(name))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelState is immutable; build a new one with replace()')
+    
+    def replace(self, **changes):
+        """A copy of this state with some fields changed"""
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        if 'occasion_multipliers' in changes and changes['occasion_multipliers'] != self.occasion_multipliers:
+            # The calendar derives occasion features from the multipliers
+            fields['calendar'] = None
+        fields.update(changes)
+        return ModelState(**fields)
+    
+    @property
+    def loaded(self):
+        return self.compiled is not None or self.model is not None
+
+
+def _state_field(name):
+    """HotelDynamicPricingModel attribute that reads, or swaps in a copy of, one field of its state"""
+    def get(self):
+        return getattr(self.state, name)
+    
+    def set(self, value):
+        self.state = self.state.replace(**{name: value})
+    
+    return property(get, set, doc=f'Shortcut for state.{name}')
+
+
+def _aligned(offset):
+    return -(-offset // ARTIFACT_ALIGNMENT) * ARTIFACT_ALIGNMENT
+
+
+def model_artifact_path(model_path):
+    """Serving artifact kept alongside a pickled model"""
+    return os.path.splitext(model_path)[0] + '.hpm'
+
+
+def preferred_model_path(model_path):
+    """The serving artifact for model_path if it is at least as new as the pickle"""
+    artifact_path = model_artifact_path(model_path)
+    if os.path.exists(artifact_path) and (
+            not os.path.exists(model_path) or os.path.getmtime(artifact_path) >= os.path.getmtime(model_path)):
+        return artifact_path
+    return model_path
+
+
+def training_status_path(artifact_path):
+    """Status file of the background training job that publishes artifact_path"""
+    return os.path.splitext(artifact_path)[0] + '.training.json'
+
+
+def read_training_status(filepath):
+    try:
+        with open(filepath) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'state': 'idle'}
+
+
+def write_training_status(filepath, status):
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, filepath)
+
+
+def is_model_artifact(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read(len(MODEL_ARTIFACT_MAGIC)) == MODEL_ARTIFACT_MAGIC
+
+
+def write_model_artifact(filepath, metadata, arrays):
+    """Write metadata and uncompressed, aligned arrays; replaces filepath atomically"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+    
+    header = json.dumps({'metadata': metadata, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(len(MODEL_ARTIFACT_MAGIC) + 8 + len(header))
+    
+    # Readers that still map the old file keep a valid mapping after the replace
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MODEL_ARTIFACT_MAGIC)
+        f.write(struct.pack('<II', MODEL_ARTIFACT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_path, filepath)
+
+
+def read_model_artifact(filepath):
+    """Metadata and read-only memory-mapped arrays of a model artifact
+    
+    The arrays are views onto one shared file mapping, so every process that
+    loads the same artifact shares its pages instead of holding a copy.
+    """
+    mapped = np.memmap(filepath, dtype=np.uint8, mode='r')
+    prefix = len(MODEL_ARTIFACT_MAGIC)
+    if bytes(mapped[:prefix]) != MODEL_ARTIFACT_MAGIC:
+        raise ValueError(f'{filepath} is not a model artifact')
+    
+    version, header_length = struct.unpack('<II', bytes(mapped[prefix:prefix + 8]))
+    if version != MODEL_ARTIFACT_VERSION:
+        raise ValueError(f'Unsupported model artifact version {version} (expected {MODEL_ARTIFACT_VERSION})')
+    header = json.loads(bytes(mapped[prefix + 8:prefix + 8 + header_length]).decode('utf-8'))
+    data_start = _aligned(prefix + 8 + header_length)
+    
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = np.ndarray(spec['shape'], dtype=dtype, buffer=mapped, offset=start) if count else np.empty(spec['shape'], dtype=dtype)
+    return header['metadata'], arrays
+
+
+class HotelDynamicPricingModel:
+    # Fitted by training.train_model or restored by load_model
+    model = _state_field('model')
+    scaler = _state_field('scaler')
+    # Flat-array form of model + scaler used at serve time (see compile_model)
+    compiled = _state_field('compiled')
+    # Set when a model is trained; validation holds its holdout metrics
+    model_version = _state_field('model_version')
+    validation = _state_field('validation')
+    room_type_encoder = _state_field('room_type_encoder')
+    rate_type_encoder = _state_field('rate_type_encoder')
+    rate_type_multipliers = _state_field('rate_type_multipliers')
+    occasion_multipliers = _state_field('occasion_multipliers')
+    calendar = _state_field('calendar')
+    
+    def __init__(self):
+        self.db_path = os.environ.get('PRICING_DB_PATH', os.path.join(os.path.dirname(__file__), 'pricing_data.db'))
+        
+        # One SQLite shard per hotel; self.db is the default (no hotel_id) shard
+        self.databases = HotelDatabaseRouter(
+            self.db_path,
+            os.environ.get('PRICING_SHARD_DIR', os.path.join(os.path.dirname(__file__), 'hotel_data')),
+            self.init_database
+        )
+        self.db = self.databases.get(None)
+        
+        # Multipliers computed by predictions are persisted in the background
+        self.multiplier_writer = MultiplierWriter(
+            flush_interval=float(os.environ.get('PRICING_WRITE_FLUSH_INTERVAL', 0.5)),
+            max_queue=int(os.environ.get('PRICING_WRITE_QUEUE_SIZE', 1000)),
+            on_write=self.invalidate_multiplier_rows
+        )
+        atexit.register(self.multiplier_writer.stop)
+        
+        # Recent predict_daily_rates results, invalidated by the writes below
+        self.prediction_cache = PredictionCache(
+            max_entries=int(os.environ.get('PRICING_CACHE_SIZE', 64)),
+            ttl=float(os.environ.get('PRICING_CACHE_TTL', 300))
+        )
+        
+        # Reference nightly price per room type (EP rate)
+        self.base_room_prices = {'Standard': 100, 'Deluxe': 150, 'Suite': 250, 'Premium': 350, 'Executive': 450}
+        
+        # Base multipliers for different rate types
+        rate_type_multipliers = {
+            'EP': 1.0,  # Room Only
+            'CP': 1.2,  # Breakfast
+            'MAP': 1.4, # Breakfast + One Meal
+            'AP': 1.6,  # Full Board
+            'AI': 2.0   # All Inclusive
+        }
+        
+        occasion_multipliers = {
+            'New Year': 2.5,
+            'Christmas': 2.2,
+            'Valentine\'s Day': 1.8,
+            'Easter': 1.6,
+            'Independence Day': 1.7,
+            'Thanksgiving': 1.9,
+            'Labor Day': 1.5,
+            'Memorial Day': 1.6,
+            'Mother\'s Day': 1.4,
+            'Father\'s Day': 1.3,
+            'Halloween': 1.3,
+            'Diwali': 1.8,
+            'Eid': 1.7,
+            'Chinese New Year': 1.9,
+            'Weekend': 1.3,
+            'Summer Peak': 1.4,
+            'Winter Holiday': 1.6,
+            'Spring Break': 1.7,
+            'Conference Season': 1.5,
+            'Wedding Season': 1.6,
+            'Festival': 1.4,
+            'Concert/Event': 1.8,
+            'Sports Event': 1.9,
+            'Convention': 1.6
+        }
+        
+        # No model until one is trained or loaded; predictions use the factor-based fallback
+        self.state = ModelState(rate_type_multipliers=rate_type_multipliers, occasion_multipliers=occasion_multipliers)
+        
+        # Initialize historical multipliers cache
+        self.historical_multipliers = {}
+        self.occupancy_data = {}
+        
+    def init_database(self, db):
+        """Initialize SQLite database for storing multipliers and occupancy data"""
+        try:
+            conn = db.connection()
+            cursor = conn.cursor()
+            
+            # Create tables for multipliers and occupancy tracking
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS multiplier_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    room_type TEXT NOT NULL,
+                    rate_type TEXT NOT NULL,
+                    multiplier REAL NOT NULL,
+                    base_rate REAL NOT NULL,
+                    dynamic_rate REAL NOT NULL,
+                    occupancy_factor REAL NOT NULL,
+                    demand_factor REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(date, room_type, rate_type)
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS occupancy_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    actual_occupancy REAL,
+                    predicted_occupancy REAL,
+                    total_rooms INTEGER,
+                    occupied_rooms INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(date)
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pricing_dependencies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_type TEXT NOT NULL,
+                    rate_type TEXT NOT NULL,
+                    dependency_type TEXT NOT NULL,
+                    dependency_config TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_multiplier_history_room_rate_date
+                ON multiplier_history (room_type, rate_type, date)
+            ''')
+            
+            self.init_rollups(cursor)
+            
+            conn.commit()
+        except Exception as e:
+            print(f"Database initialization error: {e}")
+    
+    def init_rollups(self, cursor):
+        """Create the analytics rollup tables and the triggers that maintain them
+        
+        multiplier_daily_rollup holds per-date sums and multiplier_room_rollup
+        per room/rate/month sums, so /revenue-analytics reads aggregates instead
+        of scanning multiplier_history. Triggers keep both in step with every
+        insert, update and delete on the history table.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS multiplier_daily_rollup (
+                date TEXT PRIMARY KEY,
+                multiplier_sum REAL NOT NULL DEFAULT 0,
+                occupancy_factor_sum REAL NOT NULL DEFAULT 0,
+                demand_factor_sum REAL NOT NULL DEFAULT 0,
+                row_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS multiplier_room_rollup (
+                room_type TEXT NOT NULL,
+                rate_type TEXT NOT NULL,
+                month TEXT NOT NULL,
+                multiplier_sum REAL NOT NULL DEFAULT 0,
+                revenue_gain_sum REAL NOT NULL DEFAULT 0,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (room_type, rate_type, month)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_multiplier_room_rollup_month
+            ON multiplier_room_rollup (month)
+        ''')
+        
+        add_new = '''
+            INSERT INTO multiplier_daily_rollup (date, multiplier_sum, occupancy_factor_sum, demand_factor_sum, row_count)
+            VALUES (NEW.date, NEW.multiplier, NEW.occupancy_factor, NEW.demand_factor, 1)
+            ON CONFLICT(date) DO UPDATE SET
+                multiplier_sum = multiplier_sum + excluded.multiplier_sum,
+                occupancy_factor_sum = occupancy_factor_sum + excluded.occupancy_factor_sum,
+                demand_factor_sum = demand_factor_sum + excluded.demand_factor_sum,
+                row_count = row_count + 1;
+            INSERT INTO multiplier_room_rollup (room_type, rate_type, month, multiplier_sum, revenue_gain_sum, row_count)
+            VALUES (NEW.room_type, NEW.rate_type, substr(NEW.date, 1, 7), NEW.multiplier, NEW.dynamic_rate - NEW.base_rate, 1)
+            ON CONFLICT(room_type, rate_type, month) DO UPDATE SET
+                multiplier_sum = multiplier_sum + excluded.multiplier_sum,
+                revenue_gain_sum = revenue_gain_sum + excluded.revenue_gain_sum,
+                row_count = row_count + 1;
+        '''
+        remove_old = '''
+            UPDATE multiplier_daily_rollup SET
+                multiplier_sum = multiplier_sum - OLD.multiplier,
+                occupancy_factor_sum = occupancy_factor_sum - OLD.occupancy_factor,
+                demand_factor_sum = demand_factor_sum - OLD.demand_factor,
+                row_count = row_count - 1
+            WHERE date = OLD.date;
+            UPDATE multiplier_room_rollup SET
+                multiplier_sum = multiplier_sum - OLD.multiplier,
+                revenue_gain_sum = revenue_gain_sum - (OLD.dynamic_rate - OLD.base_rate),
+                row_count = row_count - 1
+            WHERE room_type = OLD.room_type AND rate_type = OLD.rate_type AND month = substr(OLD.date, 1, 7);
+        '''
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS multiplier_history_rollup_insert
+            AFTER INSERT ON multiplier_history BEGIN {add_new} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS multiplier_history_rollup_update
+            AFTER UPDATE ON multiplier_history BEGIN {remove_old} {add_new} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS multiplier_history_rollup_delete
+            AFTER DELETE ON multiplier_history BEGIN {remove_old} END
+        ''')
+        
+        # Backfill rollups for history written before they existed
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM multiplier_daily_rollup)')
+        if not cursor.fetchone()[0]:
+            self.rebuild_rollups(cursor)
+    
+    def rebuild_rollups(self, cursor):
+        """Recompute both rollup tables from multiplier_history"""
+        cursor.execute('DELETE FROM multiplier_daily_rollup')
+        cursor.execute('DELETE FROM multiplier_room_rollup')
+        cursor.execute('''
+            INSERT INTO multiplier_daily_rollup (date, multiplier_sum, occupancy_factor_sum, demand_factor_sum, row_count)
+            SELECT date, SUM(multiplier), SUM(occupancy_factor), SUM(demand_factor), COUNT(*)
+            FROM multiplier_history
+            GROUP BY date
+        ''')
+        cursor.execute('''
+            INSERT INTO multiplier_room_rollup (room_type, rate_type, month, multiplier_sum, revenue_gain_sum, row_count)
+            SELECT room_type, rate_type, substr(date, 1, 7), SUM(multiplier), SUM(dynamic_rate - base_rate), COUNT(*)
+            FROM multiplier_history
+            GROUP BY room_type, rate_type, substr(date, 1, 7)
+        ''')
+    
+    def get_daily_trends(self, start_date, end_date, hotel_id=None):
+        """Per-date multiplier averages for [start_date, end_date] from the daily rollup"""
+        cursor = self.databases.get(hotel_id).connection().cursor()
+        cursor.execute('''
+            SELECT date, multiplier_sum / row_count, occupancy_factor_sum / row_count,
+                   demand_factor_sum / row_count, row_count
+            FROM multiplier_daily_rollup
+            WHERE date >= ? AND date <= ? AND row_count > 0
+            ORDER BY date
+        ''', (start_date, end_date))
+        return cursor.fetchall()
+    
+    def get_room_performance(self, start_date, end_date, hotel_id=None):
+        """Per room/rate multiplier and revenue gain averages for [start_date, end_date]
+        
+        Whole months inside the range come from the monthly room rollup; only the
+        partial months at either edge are read from multiplier_history. Dates may
+        carry a time of day, which is ignored.
+        """
+        start = datetime.strptime(str(start_date)[:10], '%Y-%m-%d')
+        end = datetime.strptime(str(end_date)[:10], '%Y-%m-%d')
+        start_date = start.strftime('%Y-%m-%d')
+        end_date = end.strftime('%Y-%m-%d')
+        
+        first_full = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        after_end = end + timedelta(days=1)
+        last_full_end = end if after_end.day == 1 else end.replace(day=1) - timedelta(days=1)
+        
+        if first_full <= last_full_end:
+            month_range = (first_full.strftime('%Y-%m'), last_full_end.strftime('%Y-%m'))
+            head = (start_date, (first_full - timedelta(days=1)).strftime('%Y-%m-%d'))
+            tail = ((last_full_end + timedelta(days=1)).strftime('%Y-%m-%d'), end_date)
+        else:
+            # No whole month in range: everything comes from the history table
+            month_range = ('9999-12', '0000-01')
+            head = (start_date, end_date)
+            tail = (end_date, start_date)
+        
+        cursor = self.databases.get(hotel_id).connection().cursor()
+        cursor.execute('''
+            SELECT room_type, rate_type,
+                   SUM(multiplier_sum) / SUM(row_count) AS avg_multiplier,
+                   SUM(revenue_gain_sum) / SUM(row_count) AS avg_revenue_gain,
+                   SUM(row_count) AS booking_days
+            FROM (
+                SELECT room_type, rate_type, multiplier_sum, revenue_gain_sum, row_count
+                FROM multiplier_room_rollup
+                WHERE month >= ? AND month <= ?
+                UNION ALL
+                SELECT room_type, rate_type, multiplier, dynamic_rate - base_rate, 1
+                FROM multiplier_history
+                WHERE (date >= ? AND date <= ?) OR (date >= ? AND date <= ?)
+            )
+            GROUP BY room_type, rate_type
+            HAVING SUM(row_count) > 0
+            ORDER BY avg_revenue_gain DESC
+        ''', (month_range[0], month_range[1], head[0], head[1], tail[0], tail[1]))
+        return cursor.fetchall()
+    
+    def get_holidays_and_occasions(self, date):
+        """Get all holidays and special occasions for a given date"""
+        return self.calendar.occasions(date)
+    
+    def get_historical_multiplier(self, date, room_type, rate_type, hotel_id=None):
+        """Get historical multiplier for a specific date/room/rate combination"""
+        return self.get_historical_multipliers([date], room_type, rate_type, hotel_id)[0]
+    
+    def get_historical_multipliers(self, dates, room_type, rate_type, hotel_id=None):
+        """Get historical multipliers for many dates of one room/rate combination
+        
+        Fetches every multiplier_history row in [earliest date - 4 weeks, latest date]
+        with one query, then applies the lookup rules in memory: the exact date
+        first, otherwise the same weekday 1-4 weeks back, otherwise 1.0.
+        """
+        if not dates:
+            return []
+        
+        try:
+            cursor = self.databases.get(hotel_id).connection().cursor()
+            cursor.execute('''
+                SELECT date, multiplier FROM multiplier_history 
+                WHERE room_type = ? AND rate_type = ? AND date >= ? AND date <= ?
+                ORDER BY created_at
+            ''', (
+                room_type,
+                rate_type,
+                (min(dates) - timedelta(weeks=4)).strftime('%Y-%m-%d'),
+                max(dates).strftime('%Y-%m-%d')
+            ))
+            
+            # Later rows overwrite earlier ones, so each date keeps its newest multiplier
+            history = {row[0]: float(row[1]) for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"Error getting historical multiplier: {e}")
+            return [1.0] * len(dates)
+        
+        multipliers = []
+        for date in dates:
+            multiplier = 1.0  # Default multiplier
+            for weeks_back in [0, 1, 2, 3, 4]:
+                lookup_key = (date - timedelta(weeks=weeks_back)).strftime('%Y-%m-%d')
+                if lookup_key in history:
+                    multiplier = history[lookup_key]
+                    break
+            multipliers.append(multiplier)
+        
+        return multipliers
+    
+    def save_multiplier(self, date, room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor, hotel_id=None):
+        """Save multiplier data to database"""
+        try:
+            with self.databases.get(hotel_id).connection() as conn:
+                conn.execute(MULTIPLIER_UPSERT_SQL, (date.strftime('%Y-%m-%d'), room_type, rate_type, multiplier, base_rate, dynamic_rate, occupancy_factor, demand_factor))
+        except Exception as e:
+            print(f"Error saving multiplier: {e}")
+        self.invalidate_multiplier_dates(hotel_id, room_type, rate_type, [date.strftime('%Y-%m-%d')])
+    
+    def save_multipliers(self, rows, wait=False, hotel_id=None):
+        """Queue many multiplier rows for one batched write
+        
+        Rows are (date, room_type, rate_type, multiplier, base_rate, dynamic_rate,
+        occupancy_factor, demand_factor) tuples with the date as YYYY-MM-DD.
+        """
+        self.multiplier_writer.submit(self.databases.get(hotel_id), rows, hotel_id)
+        if wait:
+            self.multiplier_writer.flush()
+        
+        # Predictions already running read the old history; the writer
+        # invalidates again once the rows are committed
+        self.invalidate_multiplier_rows(hotel_id, rows)
+    
+    def invalidate_multiplier_rows(self, hotel_id, rows):
+        """invalidate_multiplier_dates for multiplier_history rows of any room/rate types"""
+        by_room_rate = {}
+        for row in rows:
+            by_room_rate.setdefault((row[1], row[2]), []).append(row[0])
+        for (room_type, rate_type), dates in by_room_rate.items():
+            self.invalidate_multiplier_dates(hotel_id, room_type, rate_type, dates)
+    
+    def commit_daily_rates(self, rates, room_type=None, rate_type=None, hotel_id=None):
+        """Write published daily rates to multiplier_history; returns the number of rows
+        
+        rates are dicts with date (YYYY-MM-DD), base_rate and dynamic_rate, and
+        optionally room_type, rate_type (defaulting to the arguments),
+        occupancy_factor and demand_factor; predictions from a preview can be
+        passed back unchanged. The multiplier is dynamic_rate / base_rate.
+        
+        Unlike save_multipliers, the rows are written on the calling thread in
+        one transaction: they are on disk when this returns, and a failed write
+        raises instead of being logged.
+        """
+        rows = []
+        for index, rate in enumerate(rates):
+            for field in ('date', 'base_rate', 'dynamic_rate'):
+                if rate.get(field) is None:
+                    raise ValueError(f'Missing required field: {field} (rate {index})')
+            
+            row_room_type = rate.get('room_type', room_type)
+            row_rate_type = rate.get('rate_type', rate_type)
+            if row_room_type is None or row_rate_type is None:
+                raise ValueError(f'Missing required field: {"room_type" if row_room_type is None else "rate_type"} (rate {index})')
+            
+            date = datetime.strptime(str(rate['date'])[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+            base_rate = float(rate['base_rate'])
+            dynamic_rate = float(rate['dynamic_rate'])
+            if base_rate <= 0:
+                raise ValueError(f'base_rate must be positive (rate {index})')
+            
+            rows.append((date, row_room_type, row_rate_type, dynamic_rate / base_rate, base_rate, dynamic_rate,
+                         float(rate.get('occupancy_factor', 1.0)), float(rate.get('demand_factor', 1.0))))
+        
+        # Rows queued earlier for the same days must not land after these
+        self.multiplier_writer.flush()
+        with self.databases.get(hotel_id).connection() as conn:
+            conn.executemany(MULTIPLIER_UPSERT_SQL, rows)
+        
+        self.invalidate_multiplier_rows(hotel_id, rows)
+        return len(rows)
+    
+    def invalidate_multiplier_dates(self, hotel_id, room_type, rate_type, dates):
+        """Drop cached predictions that read multiplier history written for dates
+        
+        A prediction for day D falls back to the multiplier of D, D-7, ... D-28,
+        so a write for day W can change predictions for W, W+7, ... W+28.
+        """
+        if not dates:
+            return
+        affected = (np.array(dates, dtype='datetime64[D]')[:, None] + np.arange(0, 29, 7)).ravel()
+        self.prediction_cache.invalidate(hotel_id, np.unique(affected).astype(str).tolist(), room_type, rate_type)
+    
+    def calculate_occupancy_percentage(self, date, hotel_id=None):
+        """Calculate actual occupancy percentage for a given date"""
+        try:
+            cursor = self.databases.get(hotel_id).connection().cursor()
+            
+            # Try to get actual occupancy data
+            cursor.execute('''
+                SELECT actual_occupancy, occupied_rooms, total_rooms 
+                FROM occupancy_data 
+                WHERE date = ?
+                ORDER BY created_at DESC LIMIT 1
+            ''', (date.strftime('%Y-%m-%d'),))
+            
+            result = cursor.fetchone()
+            if result and result[0] is not None:
+                return {
+                    'occupancy_percentage': float(result[0]),
+                    'occupied_rooms': int(result[1]) if result[1] else 0,
+                    'total_rooms': int(result[2]) if result[2] else 100,
+                    'source': 'actual'
+                }
+            
+            # If no actual data, calculate based on patterns and occasions
+            base_occupancy = 0.65  # Base 65% occupancy
+            
+            # Adjust for day of week
+            weekday = date.weekday()
+            if weekday >= 5:  # Weekend
+                base_occupancy += 0.15
+            elif weekday >= 3:  # Thu-Fri
+                base_occupancy += 0.05
+            
+            # Adjust for occasions
+            day_features = self.calendar.features([date])
+            occasions = day_features['occasions'][0]
+            if occasions:
+                base_occupancy += float(day_features['occasion_boost'][0]) * 0.2
+            
+            # Seasonal adjustments
+            month = date.month
+            if month in [6, 7, 8]:  # Summer
+                base_occupancy += 0.1
+            elif month in [12, 1]:  # Winter holidays
+                base_occupancy += 0.15
+            elif month in [3, 4]:  # Spring
+                base_occupancy += 0.05
+            
+            # Ensure reasonable bounds
+            occupancy_percentage = min(95.0, max(20.0, base_occupancy * 100))
+            
+            return {
+                'occupancy_percentage': occupancy_percentage,
+                'occupied_rooms': int(occupancy_percentage * 100 / 100),  # Assume 100 rooms
+                'total_rooms': 100,
+                'source': 'predicted',
+                'factors': {
+                    'base': 0.65,
+                    'day_of_week': weekday,
+                    'occasions': occasions,
+                    'season': month
+                }
+            }
+            
+        except Exception as e:
+            print(f"Error calculating occupancy: {e}")
+            return {
+                'occupancy_percentage': 65.0,
+                'occupied_rooms': 65,
+                'total_rooms': 100,
+                'source': 'default'
+            }
+    
+    def calculate_occupancy_range(self, start_date, end_date, hotel_id=None, calendar=None):
+        """Occupancy for every date in [start_date, end_date] from one range scan
+        
+        Dates without actual data get the same heuristic forecast as
+        calculate_occupancy_percentage, computed as one vectorized pass
+        with calendar (the current model's if None).
+        """
+        calendar = calendar or self.calendar
+        dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        
+        actual_rows = {}
+        try:
+            cursor = self.databases.get(hotel_id).connection().cursor()
+            cursor.execute('''
+                SELECT date, actual_occupancy, occupied_rooms, total_rooms 
+                FROM occupancy_data 
+                WHERE date >= ? AND date <= ? AND actual_occupancy IS NOT NULL
+            ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+            for row in cursor.fetchall():
+                actual_rows[row[0]] = row
+        except Exception as e:
+            print(f"Error reading occupancy range: {e}")
+        
+        results = [None] * len(dates)
+        missing = []
+        for i, date in enumerate(dates):
+            row = actual_rows.get(date.strftime('%Y-%m-%d'))
+            if row:
+                results[i] = {
+                    'occupancy_percentage': float(row[1]),
+                    'occupied_rooms': int(row[2]) if row[2] else 0,
+                    'total_rooms': int(row[3]) if row[3] else 100,
+                    'source': 'actual'
+                }
+            else:
+                missing.append(i)
+        
+        if missing:
+            missing_dates = [dates[i] for i in missing]
+            day_features = calendar.features(missing_dates)
+            occasions = day_features['occasions']
+            occasion_boost = day_features['occasion_boost']
+            weekday = np.array([date.weekday() for date in missing_dates])
+            month = np.array([date.month for date in missing_dates])
+            
+            # Same adjustments, in the same order, as calculate_occupancy_percentage
+            base_occupancy = np.full(len(missing_dates), 0.65)
+            base_occupancy += np.select([weekday >= 5, weekday >= 3], [0.15, 0.05], 0.0)
+            base_occupancy += occasion_boost * 0.2
+            base_occupancy += np.select(
+                [np.isin(month, [6, 7, 8]), np.isin(month, [12, 1]), np.isin(month, [3, 4])],
+                [0.1, 0.15, 0.05],
+                0.0
+            )
+            occupancy_percentage = np.minimum(95.0, np.maximum(20.0, base_occupancy * 100))
+            
+            for j, i in enumerate(missing):
+                results[i] = {
+                    'occupancy_percentage': float(occupancy_percentage[j]),
+                    'occupied_rooms': int(occupancy_percentage[j]),
+                    'total_rooms': 100,
+                    'source': 'predicted',
+                    'factors': {
+                        'base': 0.65,
+                        'day_of_week': int(weekday[j]),
+                        'occasions': occasions[j],
+                        'season': int(month[j])
+                    }
+                }
+        
+        return [(date, data) for date, data in zip(dates, results)]
+    
+    def update_occupancy_data(self, date, actual_occupancy=None, total_rooms=None, occupied_rooms=None, hotel_id=None):
+        """Update actual occupancy data"""
+        try:
+            if actual_occupancy is None and occupied_rooms is not None and total_rooms is not None:
+                actual_occupancy = (occupied_rooms / total_rooms) * 100
+            
+            with self.databases.get(hotel_id).connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO occupancy_data 
+                    (date, actual_occupancy, total_rooms, occupied_rooms)
+                    VALUES (?, ?, ?, ?)
+                ''', (date.strftime('%Y-%m-%d'), actual_occupancy, total_rooms, occupied_rooms))
+        except Exception as e:
+            print(f"Error updating occupancy data: {e}")
+        
+        # Occupancy feeds every room and rate type's prediction for that day
+        self.prediction_cache.invalidate(hotel_id, [date.strftime('%Y-%m-%d')])
+    
+    def update_occupancy_data_bulk(self, records, hotel_id=None):
+        """Upsert many occupancy rows with a single executemany in one transaction"""
+        rows = []
+        for record in records:
+            actual_occupancy = record.get('actual_occupancy')
+            total_rooms = record.get('total_rooms')
+            occupied_rooms = record.get('occupied_rooms')
+            
+            if actual_occupancy is None and occupied_rooms is not None and total_rooms:
+                actual_occupancy = (occupied_rooms / total_rooms) * 100
+            
+            rows.append((record['date'].strftime('%Y-%m-%d'), actual_occupancy, total_rooms, occupied_rooms))
+        
+        with self.databases.get(hotel_id).connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO occupancy_data 
+                (date, actual_occupancy, total_rooms, occupied_rooms)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        
+        self.prediction_cache.invalidate(hotel_id, [row[0] for row in rows])
+        return len(rows)
+    
+    def calculate_occupancy_factor(self, date, base_occupancy=0.7, use_actual_data=True, hotel_id=None):
+        """Calculate pricing factor based on expected occupancy with actual data integration"""
+        if use_actual_data:
+            occupancy_data = self.calculate_occupancy_percentage(date, hotel_id)
+            occupancy_percentage = occupancy_data['occupancy_percentage'] / 100.0
+        else:
+            occasions = self.get_holidays_and_occasions(date)
+            
+            if occasions:
+                base_occupancy += 0.2
+            
+            weekday = date.weekday()
+            if weekday >= 5: 
+                base_occupancy += 0.1
+            
+            occupancy_percentage = min(0.95, max(0.3, base_occupancy))
+        
+        return self.occupancy_factor_for(occupancy_percentage)
+    
+    @staticmethod
+    def occupancy_factor_for(occupancy_percentage):
+        """Pricing factor for an occupancy fraction (0-1)"""
+        # Higher occupancy = higher prices with more granular scaling
+        if occupancy_percentage >= 0.9:
+            return 1.6
+        elif occupancy_percentage >= 0.85:
+            return 1.4
+        elif occupancy_percentage >= 0.8:
+            return 1.3
+        elif occupancy_percentage >= 0.75:
+            return 1.2
+        elif occupancy_percentage >= 0.7:
+            return 1.1
+        elif occupancy_percentage >= 0.6:
+            return 1.0
+        elif occupancy_percentage >= 0.5:
+            return 0.95
+        else:
+            return 0.9
+    
+    def calculate_demand_factor(self, date, historical_demand=1.0, calendar=None):
+        """Calculate demand factor based on date and historical data"""
+        calendar = calendar or self.calendar
+        day_features = calendar.features([date])
+        
+        demand_factor = historical_demand
+        
+        # Apply occasion multipliers
+        if day_features['num_occasions'][0] > 0:
+            demand_factor *= float(day_features['max_multiplier'][0])
+        
+        # Weekend premium
+        if date.weekday() >= 5:
+            demand_factor *= 1.2
+        
+        return min(3.0, max(0.5, demand_factor))  # Cap between 0.5x and 3.0x
+    
+    def generate_training_data(self, num_samples=10000):
+        """Generate synthetic training data focusing on daily rates"""
+        from training import generate_training_data
+        return generate_training_data(self, num_samples)
+    
+    def prepare_features(self, df):
+        """Prepare features for training"""
+        from training import prepare_features
+        return prepare_features(self, df)
+    
+    def build_feature_matrix(self, dates, base_prices, num_occasions, room_type, rate_type, state=None):
+        """Build the model feature matrix for a whole horizon of days in one pass"""
+        state = state or self.state
+        n = len(dates)
+        weekday = np.fromiter((d.weekday() for d in dates), dtype=np.float64, count=n)
+        
+        X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+        X[:, 0] = weekday
+        X[:, 1] = np.fromiter((d.month for d in dates), dtype=np.float64, count=n)
+        X[:, 2] = np.fromiter((d.day for d in dates), dtype=np.float64, count=n)
+        X[:, 3] = weekday >= 5
+        X[:, 4] = np.asarray(num_occasions, dtype=np.float64) > 0
+        X[:, 5] = num_occasions
+        X[:, 6] = base_prices
+        X[:, 7] = state.room_type_encoder.transform([room_type])[0]
+        X[:, 8] = state.rate_type_encoder.transform([rate_type])[0]
+        
+        return X
+    
+    def train_model(self):
+        """Train the dynamic pricing model"""
+        from training import train_model
+        return train_model(self)
+    
+    def compile_model(self):
+        """Compile the fitted model and scaler into the flat-array evaluator"""
+        state = self.state
+        compiled = CompiledTreeEnsemble.from_estimator(state.model, state.scaler) if state.model is not None else None
+        self.state = state.replace(compiled=compiled)
+        self.prediction_cache.clear()
+        return compiled
+    
+    def score_features(self, X, state=None):
+        """Model prices for raw feature rows, through the compiled evaluator when available"""
+        state = state or self.state
+        if state.compiled is not None:
+            return state.compiled.predict(X)
+        return state.model.predict(X if state.scaler is None else state.scaler.transform(X))
+    
+    def _error_fallback_prediction(self, current_date, base_rate, room_type, rate_type, use_historical_fallback, error, hotel_id=None):
+        """Build the fallback result for a day that could not be priced"""
+        historical_multiplier = 1.0
+        if use_historical_fallback:
+            historical_multiplier = self.get_historical_multiplier(current_date, room_type, rate_type, hotel_id)
+        
+        fallback_rate = float(base_rate) * historical_multiplier
+        
+        return {
+            'date': current_date.strftime('%Y-%m-%d'),
+            'base_rate': float(base_rate),
+            'dynamic_rate': fallback_rate,
+            'multiplier': historical_multiplier,
+            'multiplier_source': 'historical_fallback' if historical_multiplier != 1.0 else 'error_fallback',
+            'occupancy_factor': 1.0,
+            'demand_factor': 1.0,
+            'occupancy_data': {'occupancy_percentage': 65.0, 'source': 'default'},
+            'occasions': [],
+            'room_type': room_type,
+            'rate_type': rate_type,
+            'dependencies_applied': False,
+            'error': str(error)
+        }
+    
+    def predict_daily_rates(self, base_rates, room_type, rate_type, year_start, custom_multipliers=None, use_historical_fallback=True, hotel_id=None, persist=True, use_cache=True):
+        """Predict dynamic prices for each day's base rate with enhanced multiplier management
+        
+        Days are resolved in two passes: the first collects multipliers, occasions and
+        factors per day, then every day left for the ML model is scored in a single
+        batched scaler/model call before results are bounded and saved. With
+        persist=False nothing is saved (a preview; see commit_daily_rates). Results are
+        served from prediction_cache while nothing they depend on has changed; the
+        rows a persisting request writes are such a change (later requests read them
+        as history), so only previews (persist=False) are cached. The returned list
+        may be shared and must not be modified.
+        """
+        try:
+            if not base_rates or len(base_rates) == 0:
+                return []
+            
+            # Only previews are cached: a persisting request writes its rows, which
+            # later requests read as history, so it must run (and write) every time
+            cache_key = None
+            if use_cache and not persist:
+                cache_key = self.prediction_cache.key(base_rates, room_type, rate_type, year_start,
+                                                      custom_multipliers, use_historical_fallback, hotel_id, persist)
+                cached = self.prediction_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            generation = self.prediction_cache.generation(hotel_id)
+            
+            predictions = []
+            for chunk in self._daily_rate_chunks(base_rates, room_type, rate_type, year_start,
+                                                 custom_multipliers, use_historical_fallback, hotel_id, persist=persist):
+                predictions.extend(chunk)
+            
+            if cache_key is not None:
+                self.prediction_cache.put(cache_key, predictions, generation)
+            return predictions
+            
+        except Exception as e:
+            print(f"Error in predict_daily_rates: {str(e)}")
+            return self._system_fallback_predictions(base_rates, room_type, rate_type, year_start, use_historical_fallback, hotel_id)
+    
+    def iter_daily_rate_chunks(self, base_rates, room_type, rate_type, year_start, custom_multipliers=None, use_historical_fallback=True, hotel_id=None, persist=True, chunk_days=31, use_cache=True):
+        """predict_daily_rates as a generator of consecutive lists of at most chunk_days predictions
+        
+        Each chunk is scored and saved (unless persist is False) before the next is
+        computed, so memory does not grow with the horizon. A cached preview is
+        yielded as one chunk; streamed results are not added to the cache.
+        """
+        if not base_rates:
+            return
+        
+        if use_cache and not persist:
+            cached = self.prediction_cache.get(self.prediction_cache.key(
+                base_rates, room_type, rate_type, year_start, custom_multipliers, use_historical_fallback, hotel_id, persist))
+            if cached is not None:
+                yield cached
+                return
+        
+        emitted = 0
+        try:
+            for chunk in self._daily_rate_chunks(base_rates, room_type, rate_type, year_start,
+                                                 custom_multipliers, use_historical_fallback, hotel_id, chunk_days, persist):
+                yield chunk
+                emitted += len(chunk)
+        except Exception as e:
+            print(f"Error in iter_daily_rate_chunks: {str(e)}")
+            yield self._system_fallback_predictions(base_rates, room_type, rate_type, year_start, use_historical_fallback, hotel_id, start=emitted)
+    
+    def _daily_rate_chunks(self, base_rates, room_type, rate_type, year_start, custom_multipliers, use_historical_fallback, hotel_id, chunk_days=None, persist=True):
+        """Compute, save (if persist) and yield predictions chunk_days at a time (the whole horizon if None)"""
+        year_start_date = datetime.strptime(str(year_start)[:10], '%Y-%m-%d')
+        
+        # One model for the whole request, even if a new one is swapped in meanwhile
+        state = self.state
+        
+        # Calculate date for each rate, stopping beyond the rate year
+        dates = []
+        for i in range(len(base_rates)):
+            current_date = year_start_date + timedelta(days=i)
+            if current_date.year > year_start_date.year + 1 and current_date.month > 3:
+                break
+            dates.append(current_date)
+        
+        # Occasions for the whole horizon in one calendar lookup
+        with instrumentation.stage('calendar'):
+            horizon_occasions = state.calendar.features(dates)['occasions']
+        
+        # Historical multipliers for the whole horizon from one range query
+        horizon_historical = [1.0] * len(dates)
+        if use_historical_fallback:
+            with instrumentation.stage('history'):
+                horizon_historical = self.get_historical_multipliers(dates, room_type, rate_type, hotel_id)
+        
+        # History is read once for the whole horizon, so later chunks never see
+        # the multipliers this request saves for earlier ones
+        chunk_days = chunk_days or len(dates)
+        for start in range(0, len(dates), chunk_days):
+            # Pass 1: per-day multiplier resolution and factors
+            stage_start = time.perf_counter()
+            chunk_end = min(start + chunk_days, len(dates))
+            # Occupancy for the whole chunk from one range scan and one calendar lookup
+            chunk_occupancy = self.calculate_occupancy_range(dates[start], dates[chunk_end - 1], hotel_id, state.calendar)
+            days = []
+            for i in range(start, chunk_end):
+                current_date = dates[i]
+                base_rate = base_rates[i]
+                try:
+                    # Convert Decimal to float if needed
+                    base_price = float(base_rate)
+                    
+                    # Determine multiplier to use
+                    multiplier_to_use = 1.0
+                    multiplier_source = 'default'
+                    
+                    # 1. Check if custom multipliers are provided
+                    if custom_multipliers and len(custom_multipliers) > i:
+                        multiplier_to_use = float(custom_multipliers[i])
+                        multiplier_source = 'custom'
+                    
+                    # 2. If no custom multiplier, try historical data
+                    elif use_historical_fallback:
+                        historical_multiplier = horizon_historical[i]
+                        if historical_multiplier != 1.0:
+                            multiplier_to_use = historical_multiplier
+                            multiplier_source = 'historical'
+                    
+                    # Get occasions and factors for calculation or display
+                    occasions = list(horizon_occasions[i])
+                    occupancy_data = chunk_occupancy[i - start][1]
+                    occupancy_factor = self.occupancy_factor_for(occupancy_data['occupancy_percentage'] / 100.0)
+                    demand_factor = self.calculate_demand_factor(current_date, calendar=state.calendar)
+                    
+                    days.append({
+                        'index': i,
+                        'date': current_date,
+                        'base_rate': base_rate,
+                        'base_price': base_price,
+                        'multiplier': multiplier_to_use,
+                        'source': multiplier_source,
+                        'occasions': occasions,
+                        'occupancy_data': occupancy_data,
+                        'occupancy_factor': occupancy_factor,
+                        'demand_factor': demand_factor,
+                        'ml_rate': None,
+                        'error': None
+                    })
+                    
+                except Exception as e:
+                    days.append({'index': i, 'date': current_date, 'base_rate': base_rate, 'error': e})
+            
+            stage_start = instrumentation.lap('factors', stage_start)
+            
+            # Pass 2: score every ML-priced day with one scaler/model call
+            ml_days = [day for day in days if day['error'] is None and day['source'] == 'default']
+            if ml_days and state.loaded:
+                try:
+                    X = self.build_feature_matrix(
+                        [day['date'] for day in ml_days],
+                        [day['base_price'] for day in ml_days],
+                        [len(day['occasions']) for day in ml_days],
+                        room_type,
+                        rate_type,
+                        state
+                    )
+                    ml_rates = self.score_features(X, state)
+                    for day, ml_rate in zip(ml_days, ml_rates):
+                        day['ml_rate'] = float(ml_rate)
+                except Exception:
+                    # Fallback to factor-based calculation below
+                    pass
+            
+            stage_start = instrumentation.lap('score', stage_start)
+            
+            # Pass 3: bound, persist and format
+            predictions = []
+            multiplier_rows = []
+            for day in days:
+                if day['error'] is not None:
+                    predictions.append(self._error_fallback_prediction(
+                        day['date'], day['base_rate'], room_type, rate_type, use_historical_fallback, day['error'], hotel_id))
+                    continue
+                
+                try:
+                    current_date = day['date']
+                    base_price = day['base_price']
+                    multiplier_source = day['source']
+                    occupancy_factor = day['occupancy_factor']
+                    demand_factor = day['demand_factor']
+                    
+                    # Calculate dynamic rate
+                    if multiplier_source in ['custom', 'historical']:
+                        # Use provided or historical multiplier
+                        dynamic_rate = base_price * day['multiplier']
+                    elif day['ml_rate'] is not None:
+                        # Use ML prediction
+                        dynamic_rate = day['ml_rate']
+                        multiplier_source = 'ml_prediction'
+                    else:
+                        # Model not available, use factor-based calculation
+                        dynamic_rate = base_price * occupancy_factor * demand_factor
+                        multiplier_source = 'factor_calculation'
+                    
+                    # Ensure reasonable bounds
+                    min_price = base_price * 0.4  # Minimum 40% of base
+                    max_price = base_price * 4.0  # Maximum 400% of base
+                    dynamic_rate = max(min_price, min(max_price, dynamic_rate))
+                    final_multiplier = dynamic_rate / base_price
+                    
+                    # Collect multiplier for history, written once per request
+                    multiplier_rows.append((current_date.strftime('%Y-%m-%d'), room_type, rate_type, final_multiplier,
+                                            base_price, dynamic_rate, occupancy_factor, demand_factor))
+                    
+                    predictions.append({
+                        'date': current_date.strftime('%Y-%m-%d'),
+                        'base_rate': base_price,
+                        'dynamic_rate': round(dynamic_rate, 2),
+                        'multiplier': round(final_multiplier, 2),
+                        'multiplier_source': multiplier_source,
+                        'occupancy_factor': occupancy_factor,
+                        'demand_factor': demand_factor,
+                        'occupancy_data': day['occupancy_data'],
+                        'occasions': day['occasions'],
+                        'room_type': room_type,
+                        'rate_type': rate_type,
+                        'dependencies_applied': True
+                    })
+                    
+                except Exception as e:
+                    predictions.append(self._error_fallback_prediction(
+                        day['date'], day['base_rate'], room_type, rate_type, use_historical_fallback, e, hotel_id))
+            
+            stage_start = instrumentation.lap('finalize', stage_start)
+            
+            # Save multipliers to history for future use
+            if persist:
+                self.save_multipliers(multiplier_rows, hotel_id=hotel_id)
+                instrumentation.lap('save', stage_start)
+            
+            yield predictions
+    
+    def _system_fallback_predictions(self, base_rates, room_type, rate_type, year_start, use_historical_fallback, hotel_id, start=0):
+        """Historical-multiplier-only predictions for base_rates[start:] after a system error"""
+        fallback_predictions = []
+        year_start_date = datetime.strptime(str(year_start)[:10], '%Y-%m-%d')
+        
+        for i in range(start, len(base_rates)):
+            base_rate = base_rates[i]
+            current_date = year_start_date + timedelta(days=i)
+            historical_multiplier = 1.0
+            
+            if use_historical_fallback:
+                historical_multiplier = self.get_historical_multiplier(current_date, room_type, rate_type, hotel_id)
+            
+            fallback_predictions.append({
+                'date': current_date.strftime('%Y-%m-%d'),
+                'base_rate': float(base_rate),
+                'dynamic_rate': float(base_rate) * historical_multiplier,
+                'multiplier': historical_multiplier,
+                'multiplier_source': 'system_fallback',
+                'occupancy_factor': 1.0,
+                'demand_factor': 1.0,
+                'occupancy_data': {'occupancy_percentage': 65.0, 'source': 'default'},
+                'occasions': [],
+                'room_type': room_type,
+                'rate_type': rate_type,
+                'dependencies_applied': False,
+                'error': 'System error, using historical fallback'
+            })
+        
+        return fallback_predictions
+    
+    def predict_price(self, checkin_date, checkout_date, room_type, num_rooms=1, rate_type='EP', base_rate=None, hotel_id=None):
+        """Quote a stay from check-in to check-out using the daily-rate engine
+        
+        Each night is priced by predict_daily_rates as a preview: a quote writes
+        nothing to multiplier_history. Without an explicit base_rate the nightly
+        base is the reference price for the room type and rate type.
+        """
+        checkin = datetime.strptime(str(checkin_date)[:10], '%Y-%m-%d')
+        checkout = datetime.strptime(str(checkout_date)[:10], '%Y-%m-%d')
+        nights = (checkout - checkin).days
+        if nights < 1:
+            raise ValueError('checkout_date must be after checkin_date')
+        
+        num_rooms = int(num_rooms)
+        if num_rooms < 1:
+            raise ValueError('num_rooms must be at least 1')
+        
+        if base_rate is None:
+            base_rate = self.base_room_prices.get(room_type, self.base_room_prices['Standard']) \
+                * self.rate_type_multipliers.get(rate_type, 1.0)
+        
+        nightly = self.predict_daily_rates(
+            base_rates=[float(base_rate)] * nights,
+            room_type=room_type,
+            rate_type=rate_type,
+            year_start=checkin.strftime('%Y-%m-%d'),
+            hotel_id=hotel_id,
+            persist=False
+        )
+        
+        price_per_room = round(sum(night['dynamic_rate'] for night in nightly), 2)
+        
+        return {
+            'checkin_date': checkin.strftime('%Y-%m-%d'),
+            'checkout_date': checkout.strftime('%Y-%m-%d'),
+            'room_type': room_type,
+            'rate_type': rate_type,
+            'num_rooms': num_rooms,
+            'nights': nights,
+            'nightly_rates': [
+                {
+                    'date': night['date'],
+                    'base_rate': night['base_rate'],
+                    'dynamic_rate': night['dynamic_rate'],
+                    'multiplier': night['multiplier'],
+                    'multiplier_source': night['multiplier_source']
+                }
+                for night in nightly
+            ],
+            'average_nightly_rate': round(price_per_room / nights, 2),
+            'price_per_room': price_per_room,
+            'total_price': round(price_per_room * num_rooms, 2)
+        }
+    
+    @property
+    def model_loaded(self):
+        return self.state.loaded
+    
+    def save_model(self, filepath='hotel_pricing_model.pkl'):
+        """Save the trained model, plus its serving artifact alongside"""
+        import joblib
+        
+        state = self.state
+        model_data = {
+            'model': state.model,
+            'scaler': state.scaler,
+            'room_type_encoder': state.room_type_encoder,
+            'rate_type_encoder': state.rate_type_encoder,
+            'rate_type_multipliers': state.rate_type_multipliers,
+            'occasion_multipliers': state.occasion_multipliers,
+            'model_version': state.model_version
+        }
+        joblib.dump(model_data, filepath)
+        self.save_artifact(model_artifact_path(filepath))
+    
+    def save_artifact(self, filepath='hotel_pricing_model.hpm'):
+        """Write the compiled model as a memory-mappable serving artifact"""
+        state = self.state
+        if state.compiled is None:
+            raise ValueError('No compiled model to save')
+        
+        metadata = {
+            'created_at': datetime.now().isoformat(),
+            'feature_columns': FEATURE_COLUMNS,
+            'room_types': state.room_type_encoder.classes_.tolist(),
+            'rate_types': state.rate_type_encoder.classes_.tolist(),
+            'rate_type_multipliers': state.rate_type_multipliers,
+            'occasion_multipliers': state.occasion_multipliers,
+            'baseline': state.compiled.baseline,
+            'model_version': state.model_version,
+            'validation': state.validation
+        }
+        write_model_artifact(filepath, metadata, state.compiled.to_arrays())
+    
+    def load_model(self, filepath='hotel_pricing_model.pkl'):
+        """Load a trained model from a pickle or a serving artifact"""
+        start = time.perf_counter()
+        if is_model_artifact(filepath):
+            self.load_artifact(filepath)
+            instrumentation.observe_model_load('artifact', time.perf_counter() - start)
+            return
+        
+        import joblib
+        
+        model_data = joblib.load(filepath)
+        
+        # Older artifacts did not persist the rate type encoder; training encodes
+        # every known rate type, so refitting on the same keys reproduces it
+        rate_type_encoder = model_data.get('rate_type_encoder')
+        if rate_type_encoder is None:
+            from sklearn.preprocessing import LabelEncoder
+            rate_type_encoder = LabelEncoder().fit(list(model_data['rate_type_multipliers'].keys()))
+        
+        self.state = self.state.replace(
+            model=model_data['model'],
+            scaler=model_data['scaler'],
+            compiled=CompiledTreeEnsemble.from_estimator(model_data['model'], model_data['scaler']),
+            room_type_encoder=model_data['room_type_encoder'],
+            rate_type_encoder=rate_type_encoder,
+            rate_type_multipliers=model_data['rate_type_multipliers'],
+            occasion_multipliers=model_data['occasion_multipliers'],
+            model_version=model_data.get('model_version'),
+            validation=None
+        )
+        self.prediction_cache.clear()
+        instrumentation.observe_model_load('pickle', time.perf_counter() - start)
+    
+    def load_artifact(self, filepath='hotel_pricing_model.hpm'):
+        """Load a serving artifact; scoring runs on its memory-mapped arrays
+        
+        Safe to call while requests are being served: the new ensemble, its
+        encoders and multipliers are built completely and then published with
+        a single state swap, so a request scores with either the old model or
+        the new one. The artifact may encode different room or rate types.
+        """
+        metadata, arrays = read_model_artifact(filepath)
+        if metadata['feature_columns'] != FEATURE_COLUMNS:
+            raise ValueError(f'Model artifact features {metadata["feature_columns"]} do not match {FEATURE_COLUMNS}')
+        
+        # The artifact holds no sklearn objects; scoring goes through compiled
+        self.state = self.state.replace(
+            model=None,
+            scaler=None,
+            compiled=CompiledTreeEnsemble.from_arrays(arrays, metadata['baseline']),
+            room_type_encoder=CategoryEncoder(metadata['room_types']),
+            rate_type_encoder=CategoryEncoder(metadata['rate_types']),
+            rate_type_multipliers=metadata['rate_type_multipliers'],
+            occasion_multipliers=metadata['occasion_multipliers'],
+            model_version=metadata.get('model_version'),
+            validation=metadata.get('validation')
+        )
+        # After the swap, so no request still scoring with the old model caches its result
+        self.prediction_cache.clear()
@@ -0,0 +1,150 @@
+# response_format.py
+#
+# Encodings for prediction responses. The default "rows" format is one dict
+# per day. "ndjson" streams the same dicts one per line as they are computed,
+# followed by summary records. "columnar" turns the list of days into parallel arrays, one per
+# (flattened) field, with values shared by every day stated once. "binary"
+# is the columnar document with every numeric array moved into a raw
+# little-endian buffer after a JSON header:
+#
+#   magic (8 bytes) | header length (uint32) | header JSON | padding | arrays
+#
+# Arrays start on 8-byte boundaries; the header replaces each one with
+# {"$array": i} and lists its dtype, length and offset from the data start.
+import json
+import struct
+import numpy as np
+
+RESPONSE_FORMATS = ('rows', 'ndjson', 'columnar', 'binary')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+BINARY_MIMETYPE = 'application/vnd.hotel-pricing.columnar'
+BINARY_MAGIC = b'HPCOLS\x00\x01'
+
+
+def _flatten_columns(records, prefix, columns):
+    """Add one column per dotted field path of records (dicts, or None where absent)"""
+    names = dict.fromkeys(name for record in records if record is not None for name in record)
+    for name in names:
+        values = [None if record is None else record.get(name) for record in records]
+        if any(isinstance(value, dict) for value in values):
+            _flatten_columns([value if isinstance(value, dict) else None for value in values], f'{prefix}{name}.', columns)
+        else:
+            columns[f'{prefix}{name}'] = values
+
+
+def to_columnar(predictions):
+    """Parallel arrays for a list of daily predictions
+
+    Nested dicts become dotted field names and fields missing from a day are
+    None in its column. A field with the same value on every day goes into
+    "dimensions" instead of a column, and a column identical to an earlier
+    one is listed in "aliases".
+    """
+    flat = {}
+    _flatten_columns(predictions, '', flat)
+
+    dimensions = {}
+    columns = {}
+    aliases = {}
+    for name, values in flat.items():
+        if values.count(values[0]) == len(values):
+            dimensions[name] = values[0]
+            continue
+        for other, other_values in columns.items():
+            if other_values == values:
+                aliases[name] = other
+                break
+        else:
+            columns[name] = values
+
+    return {
+        'length': len(predictions),
+        'dimensions': dimensions,
+        'columns': columns,
+        'aliases': aliases
+    }
+
+
+def from_columnar(table):
+    """Flat per-day dicts (dotted keys) back from a columnar table"""
+    columns = dict(table['columns'])
+    for name, source in table['aliases'].items():
+        columns[name] = columns[source]
+    return [
+        {**table['dimensions'], **{name: values[i] for name, values in columns.items()}}
+        for i in range(table['length'])
+    ]
+
+
+def _numeric_dtype(values):
+    """Smallest little-endian dtype holding every value of a list of numbers, or None"""
+    if not values:
+        return None
+    if all(type(value) is int for value in values):
+        low, high = min(values), max(values)
+        for dtype in ('<i1', '<i2', '<i4', '<i8'):
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return dtype
+        return None
+    if all(type(value) in (int, float) for value in values):
+        return '<f8'
+    return None
+
+
+def encode_binary(document):
+    """Serialize a JSON-compatible document with its numeric lists as raw arrays"""
+    arrays = []
+
+    def extract(value):
+        if isinstance(value, dict):
+            return {key: extract(item) for key, item in value.items()}
+        if isinstance(value, list):
+            dtype = _numeric_dtype(value)
+            if dtype is None:
+                return [extract(item) for item in value]
+            arrays.append(np.asarray(value, dtype=dtype))
+            return {'$array': len(arrays) - 1}
+        return value
+
+    body = extract(document)
+    layout = []
+    chunks = []
+    offset = 0
+    for array in arrays:
+        layout.append({'dtype': array.dtype.str, 'length': len(array), 'offset': offset})
+        chunks.append(array.tobytes() + b'\x00' * (-array.nbytes % 8))
+        offset += len(chunks[-1])
+
+    header = json.dumps({'document': body, 'arrays': layout}, separators=(',', ':')).encode('utf-8')
+    prefix_size = len(BINARY_MAGIC) + 4 + len(header)
+    padding = b'\x00' * (-prefix_size % 8)
+    return b''.join([BINARY_MAGIC, struct.pack('<I', len(header)), header, padding] + chunks)
+
+
+def decode_binary(data):
+    """Inverse of encode_binary; numeric arrays come back as numpy arrays"""
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError('Not a binary prediction response')
+    start = len(BINARY_MAGIC)
+    (header_size,) = struct.unpack_from('<I', data, start)
+    start += 4
+    header = json.loads(bytes(data[start:start + header_size]).decode('utf-8'))
+    start += header_size
+    data_start = start + (-start % 8)
+
+    arrays = [
+        np.frombuffer(data, dtype=spec['dtype'], count=spec['length'], offset=data_start + spec['offset'])
+        for spec in header['arrays']
+    ]
+
+    def restore(value):
+        if isinstance(value, dict):
+            if set(value) == {'$array'}:
+                return arrays[value['$array']]
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        return value
+
+    return restore(header['document'])
@@ -0,0 +1,96 @@
+# startup_benchmark.py
+#
+# Measures cold start of the pricing service: each run is a fresh Python
+# process against a throwaway database, timing the import of the serving
+# modules, model construction + load, and the first full-year prediction,
+# once for the pickled model and once for the serving artifact if present.
+#
+#   python3 startup_benchmark.py --runs 5
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ['import_pricing_engine', 'import_app', 'load_model', 'first_prediction', 'total']
+
+# Executed in a fresh interpreter so nothing is already imported or cached
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+timings = {}
+
+t = time.perf_counter()
+import pricing_engine
+timings['import_pricing_engine'] = time.perf_counter() - t
+
+t = time.perf_counter()
+import app
+timings['import_app'] = time.perf_counter() - t
+
+t = time.perf_counter()
+model = pricing_engine.HotelDynamicPricingModel()
+model.load_model(os.path.join(os.getcwd(), MODEL_FILE))
+timings['load_model'] = time.perf_counter() - t
+
+t = time.perf_counter()
+model.predict_daily_rates([3000.0] * 365, 'Deluxe', 'EP', '2025-01-01')
+model.multiplier_writer.flush()
+timings['first_prediction'] = time.perf_counter() - t
+
+timings['total'] = time.perf_counter() - start
+model.multiplier_writer.stop()
+sys.__stdout__.write(json.dumps(timings) + '\n')
+'''
+
+
+def run_once(db_dir, model_file):
+    env = dict(os.environ)
+    env['PRICING_DB_PATH'] = os.path.join(db_dir, 'pricing_data.db')
+    env['PRICING_SHARD_DIR'] = os.path.join(db_dir, 'hotel_data')
+
+    result = subprocess.run(
+        [sys.executable, '-c', f'MODEL_FILE = {model_file!r}\n' + PROBE],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for the pricing service')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes to time (default 5)')
+    parser.add_argument('--json', action='store_true', help='print the raw per-run timings as JSON')
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(BASE_DIR, 'hotel_pricing_model.pkl')):
+        sys.exit('hotel_pricing_model.pkl not found - train the model first (python3 app.py)')
+
+    # The pickle and, when it has been exported, the memory-mapped serving artifact
+    model_files = [name for name in ('hotel_pricing_model.pkl', 'hotel_pricing_model.hpm')
+                   if os.path.exists(os.path.join(BASE_DIR, name))]
+
+    results = {}
+    for model_file in model_files:
+        runs = []
+        for _ in range(args.runs):
+            # A new database per run so schema creation is part of the measurement
+            with tempfile.TemporaryDirectory() as db_dir:
+                runs.append(run_once(db_dir, model_file))
+        results[model_file] = runs
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for model_file, runs in results.items():
+        print(f"Cold start from {model_file} over {len(runs)} runs (median / min / max, ms)")
+        for stage in STAGES:
+            values = [run[stage] * 1000 for run in runs]
+            print(f"  {stage:<22} {statistics.median(values):8.1f} {min(values):8.1f} {max(values):8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def pricing_model(tmp_path, monkeypatch):
+    """A model with no trained estimator, storing everything under tmp_path
+
+    The write-behind writer only commits on flush(), so tests decide when
+    queued multiplier rows reach the database.
+    """
+    monkeypatch.setenv('PRICING_DB_PATH', str(tmp_path / 'pricing_data.db'))
+    monkeypatch.setenv('PRICING_SHARD_DIR', str(tmp_path / 'hotels'))
+    monkeypatch.setenv('PRICING_WRITE_FLUSH_INTERVAL', '3600')
+    from pricing_engine import HotelDynamicPricingModel
+
+    model = HotelDynamicPricingModel()
+    yield model
+    model.multiplier_writer.stop()
+
+
+@pytest.fixture
+def client(pricing_model, tmp_path, monkeypatch):
+    """Flask test client serving pricing_model, with no published artifact to swap in"""
+    import app
+
+    monkeypatch.setattr(app, '_pricing_model', pricing_model)
+    monkeypatch.setattr(app, 'ARTIFACT_PATH', str(tmp_path / 'missing.hpm'))
+    return app.app.test_client()
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+
+def history_rows(start, days, room_type='Deluxe', rate_type='EP'):
+    return [
+        ((start + timedelta(days=i)).isoformat(), room_type, rate_type, 1.0 + 0.01 * i,
+         3000.0, 3000.0 * (1.0 + 0.01 * i), 1.0, 1.0)
+        for i in range(days)
+    ]
+
+
+def test_room_performance_accepts_timestamps(pricing_model):
+    pricing_model.save_multipliers(history_rows(date(2026, 3, 20), 60), wait=True)
+
+    expected = pricing_model.get_room_performance('2026-03-25', '2026-05-10')
+    assert expected
+    assert pricing_model.get_room_performance('2026-03-25T00:00:00.000Z', '2026-05-10T23:59:59.000Z') == expected
+
+
+def test_revenue_analytics_accepts_timestamps(pricing_model, client):
+    pricing_model.save_multipliers(history_rows(date(2026, 3, 20), 60), wait=True)
+
+    response = client.get('/revenue-analytics?start_date=2026-03-25T00:00:00.000Z&end_date=2026-05-10T00:00:00.000Z')
+
+    assert response.status_code == 200
+    assert response.json['date_range'] == {'start': '2026-03-25', 'end': '2026-05-10'}
+    assert response.json['analytics']['room_performance'][0]['booking_days'] == 47
+
+
+def test_revenue_analytics_rejects_invalid_dates(client):
+    response = client.get('/revenue-analytics?start_date=last-week')
+
+    assert response.status_code == 400
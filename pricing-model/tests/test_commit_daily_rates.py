@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from test_prediction_cache import YEAR_START, preview_args
+
+
+def history(model, hotel_id='h1'):
+    conn = model.databases.get(hotel_id).connection()
+    return conn.execute('SELECT date, room_type, rate_type, multiplier FROM multiplier_history ORDER BY date').fetchall()
+
+
+def fail_history_inserts(model, hotel_id='h1'):
+    with model.databases.get(hotel_id).connection() as conn:
+        conn.execute('''
+            CREATE TRIGGER fail_history_insert BEFORE INSERT ON multiplier_history
+            BEGIN SELECT RAISE(ABORT, 'disk is full'); END
+        ''')
+
+
+def published_rates(model, multiplier=1.25):
+    preview = model.predict_daily_rates(**preview_args())
+    return [dict(p, dynamic_rate=p['base_rate'] * multiplier) for p in preview]
+
+
+def test_commit_writes_every_rate(pricing_model):
+    rates = published_rates(pricing_model)
+
+    assert pricing_model.commit_daily_rates(rates, hotel_id='h1') == len(rates)
+
+    rows = history(pricing_model)
+    assert len(rows) == len(rates)
+    assert rows[0] == (YEAR_START, 'Deluxe', 'EP', pytest.approx(1.25))
+
+
+def test_commit_overrides_rows_still_queued(pricing_model):
+    queued = [(YEAR_START, 'Deluxe', 'EP', 0.9, 3000.0, 2700.0, 1.0, 1.0)]
+    pricing_model.save_multipliers(queued, hotel_id='h1')
+
+    pricing_model.commit_daily_rates([{'date': YEAR_START, 'base_rate': 3000.0, 'dynamic_rate': 3600.0}],
+                                     room_type='Deluxe', rate_type='EP', hotel_id='h1')
+    pricing_model.multiplier_writer.flush()
+
+    assert history(pricing_model) == [(YEAR_START, 'Deluxe', 'EP', pytest.approx(1.2))]
+
+
+def test_failed_commit_raises(pricing_model):
+    rates = published_rates(pricing_model)
+    fail_history_inserts(pricing_model)
+
+    with pytest.raises(sqlite3.Error):
+        pricing_model.commit_daily_rates(rates, hotel_id='h1')
+    assert history(pricing_model) == []
+
+
+def test_commit_route_reports_committed_rates(pricing_model, client):
+    rates = published_rates(pricing_model)
+
+    response = client.post('/commit-daily-rates', json={'rates': rates, 'hotel_id': 'h1'})
+
+    assert response.status_code == 200
+    assert response.json['rates_committed'] == len(rates)
+    assert len(history(pricing_model)) == len(rates)
+
+
+def test_commit_route_fails_when_the_write_fails(pricing_model, client):
+    rates = published_rates(pricing_model)
+    fail_history_inserts(pricing_model)
+
+    response = client.post('/commit-daily-rates', json={'rates': rates, 'hotel_id': 'h1'})
+
+    assert response.status_code == 500
+    assert 'disk is full' in response.json['error']
+    assert history(pricing_model) == []
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'rates': [{'date': YEAR_START, 'base_rate': 3000.0}], 'room_type': 'Deluxe', 'rate_type': 'EP'},
+    {'rates': [{'date': YEAR_START, 'base_rate': 3000.0, 'dynamic_rate': 3600.0}], 'room_type': 'Deluxe'},
+    {'rates': [{'date': 'soon', 'base_rate': 3000.0, 'dynamic_rate': 3600.0}], 'room_type': 'Deluxe', 'rate_type': 'EP'},
+])
+def test_commit_route_rejects_invalid_rates(pricing_model, client, body):
+    response = client.post('/commit-daily-rates', json=dict(body, hotel_id='h1'))
+
+    assert response.status_code == 400
+    assert history(pricing_model) == []
+
+
+def test_batch_preview_results_commit_as_they_are(pricing_model, client):
+    # What the backend does after saving uploaded base rates
+    jobs = [dict(preview_args(), room_type=room_type) for room_type in ('Deluxe', 'Suite')]
+    for job in jobs:
+        del job['hotel_id'], job['persist']
+    preview = client.post('/predict-daily-rates/batch', json={'hotel_id': 'h1', 'jobs': jobs, 'persist': False})
+    assert history(pricing_model) == []
+
+    rates = [p for result in preview.json['results'] for p in result['predictions']]
+    response = client.post('/commit-daily-rates', json={'hotel_id': 'h1', 'rates': rates})
+
+    assert response.status_code == 200
+    assert response.json['rates_committed'] == len(rates) == 2 * len(jobs[0]['base_rates'])
+    assert {row[1] for row in history(pricing_model)} == {'Deluxe', 'Suite'}
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+
+from pricing_engine import (
+    FEATURE_COLUMNS,
+    CompiledTreeEnsemble,
+    read_model_artifact,
+    write_model_artifact,
+)
+
+# Summing the same leaves in another order differs from sklearn by ~1e-12
+MAX_DIFFERENCE = 1e-9
+
+
+def feature_rows(n, seed):
+    """Rows shaped like build_feature_matrix output"""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n, len(FEATURE_COLUMNS)))
+    X[:, 0] = rng.integers(0, 7, n)
+    X[:, 1] = rng.integers(1, 13, n)
+    X[:, 2] = rng.integers(1, 29, n)
+    X[:, 3] = X[:, 0] >= 5
+    X[:, 5] = rng.integers(0, 3, n)
+    X[:, 4] = X[:, 5] > 0
+    X[:, 6] = np.round(rng.uniform(100, 900, n), 2)
+    X[:, 7] = rng.integers(0, 5, n)
+    X[:, 8] = rng.integers(0, 5, n)
+    return X
+
+
+def prices(X):
+    return X[:, 6] * (1.0 + 0.2 * X[:, 3] + 0.15 * X[:, 5] + 0.1 * X[:, 7]) + 5.0 * X[:, 1]
+
+
+@pytest.fixture(scope='module')
+def training_rows():
+    X = feature_rows(3000, seed=1)
+    return X, prices(X)
+
+
+def assert_matches(compiled, expected, X):
+    difference = np.abs(compiled.predict(X) - expected)
+    assert difference.max() < MAX_DIFFERENCE
+
+
+def test_gradient_boosting_with_scaler_matches_sklearn(training_rows):
+    X, y = training_rows
+    scaler = StandardScaler().fit(X)
+    estimator = GradientBoostingRegressor(n_estimators=50, max_depth=6, random_state=42).fit(scaler.transform(X), y)
+    compiled = CompiledTreeEnsemble.from_estimator(estimator, scaler)
+
+    # The training rows sit exactly on split thresholds; the others between them
+    for rows in (X, feature_rows(1000, seed=2), X[:1]):
+        assert_matches(compiled, estimator.predict(scaler.transform(rows)), rows)
+
+
+def test_histogram_gradient_boosting_matches_sklearn(training_rows):
+    X, y = training_rows
+    estimator = HistGradientBoostingRegressor(max_iter=50, random_state=42).fit(X, y)
+    compiled = CompiledTreeEnsemble.from_estimator(estimator)
+
+    for rows in (X, feature_rows(1000, seed=2), X[:1]):
+        assert_matches(compiled, estimator.predict(rows), rows)
+
+
+def test_artifact_round_trip_scores_identically(training_rows, tmp_path):
+    X, y = training_rows
+    estimator = HistGradientBoostingRegressor(max_iter=20, random_state=42).fit(X, y)
+    compiled = CompiledTreeEnsemble.from_estimator(estimator)
+    path = str(tmp_path / 'model.hpm')
+
+    write_model_artifact(path, {'baseline': compiled.baseline}, compiled.to_arrays())
+    metadata, arrays = read_model_artifact(path)
+    loaded = CompiledTreeEnsemble.from_arrays(arrays, metadata['baseline'])
+
+    rows = feature_rows(1000, seed=3)
+    np.testing.assert_array_equal(loaded.predict(rows), compiled.predict(rows))
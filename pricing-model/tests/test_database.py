@@ -0,0 +1,80 @@
+import os
+import threading
+
+import pytest
+
+from pricing_engine import PricingDatabase
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = PricingDatabase(str(tmp_path / 'pricing.db'), busy_timeout_ms=2000, cache_size_kb=4096)
+    with database.connection() as conn:
+        conn.execute('CREATE TABLE rates (day TEXT PRIMARY KEY, rate REAL)')
+        conn.execute("INSERT INTO rates VALUES ('2026-04-01', 3000.0)")
+    yield database
+    database.close()
+
+
+def in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_each_thread_keeps_its_own_connection(database):
+    conn = database.connection()
+
+    assert database.connection() is conn
+    other = in_thread(database.connection)
+    assert other is not conn
+    assert in_thread(database.connection) is not other
+
+
+def test_connections_use_wal_and_tuned_pragmas(database):
+    conn = database.connection()
+
+    def pragma(name):
+        return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+    assert pragma('journal_mode') == 'wal'
+    assert pragma('synchronous') == 1  # NORMAL
+    assert pragma('busy_timeout') == 2000
+    assert pragma('cache_size') == -4096
+    assert pragma('temp_store') == 2  # MEMORY
+
+
+def test_open_reads_do_not_block_a_commit(database):
+    # A second store on the same file stands in for another process
+    reader = PricingDatabase(database.db_path).connection()
+    reader.execute('BEGIN')
+    assert reader.execute('SELECT rate FROM rates').fetchone()[0] == 3000.0
+
+    # Without WAL this commit would wait for the reader and fail as "database is locked"
+    with database.connection() as writer:
+        writer.execute("UPDATE rates SET rate = 3500.0 WHERE day = '2026-04-01'")
+
+    assert reader.execute('SELECT rate FROM rates').fetchone()[0] == 3000.0
+    reader.commit()
+    assert reader.execute('SELECT rate FROM rates').fetchone()[0] == 3500.0
+    reader.close()
+
+
+def test_closed_connection_is_reopened(database):
+    conn = database.connection()
+
+    database.close()
+
+    assert database.connection() is not conn
+    assert database.connection().execute('SELECT COUNT(*) FROM rates').fetchone()[0] == 1
+
+
+def test_forked_process_opens_its_own_connection(database, monkeypatch):
+    conn = database.connection()
+    parent_pid = os.getpid()
+
+    monkeypatch.setattr(os, 'getpid', lambda: parent_pid + 1)
+
+    assert database.connection() is not conn
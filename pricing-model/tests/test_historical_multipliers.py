@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2026, 3, 1)
+HOTEL = 'h1'
+
+
+def per_day_multiplier(conn, date, room_type, rate_type):
+    """The lookup run one day at a time: the date itself, else the same weekday 1-4 weeks back"""
+    for weeks_back in [0, 1, 2, 3, 4]:
+        row = conn.execute('''
+            SELECT multiplier FROM multiplier_history
+            WHERE date = ? AND room_type = ? AND rate_type = ?
+            ORDER BY created_at DESC LIMIT 1
+        ''', ((date - timedelta(weeks=weeks_back)).strftime('%Y-%m-%d'), room_type, rate_type)).fetchone()
+        if row:
+            return float(row[0])
+    return 1.0
+
+
+@pytest.fixture
+def sparse_history(pricing_model):
+    """Scattered days with gaps longer than four weeks, and rows of other rooms and rate types"""
+    rows = []
+    for offset in list(range(0, 10)) + [17, 23, 40, 41, 95, 96, 130]:
+        for room_type, rate_type, multiplier in (('Deluxe', 'EP', 1.1), ('Deluxe', 'CP', 1.5), ('Suite', 'EP', 0.8)):
+            date = START + timedelta(days=offset)
+            rows.append((date.strftime('%Y-%m-%d'), room_type, rate_type, multiplier + offset / 1000,
+                         3000.0, 3000.0 * multiplier, 1.0, 1.0))
+    pricing_model.save_multipliers(rows, wait=True, hotel_id=HOTEL)
+    return pricing_model.databases.get(HOTEL).connection()
+
+
+@pytest.mark.parametrize('dates', [
+    [START - timedelta(days=10) + timedelta(days=i) for i in range(200)],
+    # Unordered, repeated, and far from any history
+    [START + timedelta(days=130), START, START + timedelta(days=44), START, datetime(2027, 1, 1)],
+    [START + timedelta(days=40)],
+])
+@pytest.mark.parametrize('room_type, rate_type', [('Deluxe', 'EP'), ('Deluxe', 'CP'), ('Standard', 'EP')])
+def test_prefetched_history_matches_per_day_lookup(pricing_model, sparse_history, dates, room_type, rate_type):
+    prefetched = pricing_model.get_historical_multipliers(dates, room_type, rate_type, HOTEL)
+
+    assert prefetched == [per_day_multiplier(sparse_history, date, room_type, rate_type) for date in dates]
+    assert pricing_model.get_historical_multiplier(dates[0], room_type, rate_type, HOTEL) == prefetched[0]
+
+
+def test_predictions_use_the_per_day_multipliers(pricing_model, sparse_history):
+    predictions = pricing_model.predict_daily_rates([3000.0] * 60, 'Deluxe', 'EP', START.strftime('%Y-%m-%d'),
+                                                    hotel_id=HOTEL, persist=False, use_cache=False)
+
+    for offset, prediction in enumerate(predictions):
+        expected = per_day_multiplier(sparse_history, START + timedelta(days=offset), 'Deluxe', 'EP')
+        assert (prediction['multiplier_source'] == 'historical') == (expected != 1.0)
+        if expected != 1.0:
+            assert prediction['dynamic_rate'] == round(3000.0 * expected, 2)
+
+
+def test_no_history_is_a_multiplier_of_one(pricing_model):
+    dates = [START + timedelta(days=i) for i in range(30)]
+
+    assert pricing_model.get_historical_multipliers(dates, 'Deluxe', 'EP', HOTEL) == [1.0] * 30
+    assert pricing_model.get_historical_multipliers([], 'Deluxe', 'EP', HOTEL) == []
@@ -0,0 +1,63 @@
+import pytest
+
+from test_prediction_cache import multiplier_rows, preview_args
+
+
+def predict_request(hotel_id):
+    return dict(preview_args(), hotel_id=hotel_id, persist=False)
+
+
+def test_int_and_str_hotel_ids_share_a_shard(pricing_model):
+    databases = pricing_model.databases
+
+    assert databases.get(5) is databases.get('5')
+    assert databases.hotel_ids().count('5') == 1
+    assert 5 not in databases.hotel_ids()
+
+
+def test_invalid_hotel_id_raises_value_error(pricing_model):
+    with pytest.raises(ValueError):
+        pricing_model.databases.get('../other')
+    with pytest.raises(ValueError):
+        pricing_model.databases.hotel_key(5.5)
+
+
+def test_int_hotel_id_write_invalidates_str_hotel_id_entry(pricing_model):
+    cached = pricing_model.predict_daily_rates(**preview_args(hotel_id='5'))
+
+    pricing_model.save_multipliers(multiplier_rows(1.3), wait=True, hotel_id=5)
+
+    after = pricing_model.predict_daily_rates(**preview_args(hotel_id='5'))
+    assert after is not cached
+    assert {p['multiplier'] for p in after} == {1.3}
+
+
+def test_routes_treat_int_and_str_hotel_ids_alike(pricing_model, client):
+    as_int = client.post('/predict-daily-rates', json=predict_request(5))
+    as_str = client.post('/predict-daily-rates', json=predict_request('5'))
+
+    assert as_int.status_code == as_str.status_code == 200
+    assert as_int.json['predictions'] == as_str.json['predictions']
+    assert pricing_model.prediction_cache.stats()['entries'] == 1
+
+
+@pytest.mark.parametrize('hotel_id', ['../other', 'a b', 5.5])
+def test_invalid_hotel_id_is_a_bad_request(client, hotel_id):
+    response = client.post('/predict-daily-rates', json=predict_request(hotel_id))
+
+    assert response.status_code == 400
+    assert response.json['error'].startswith('Invalid hotel_id')
+
+
+def test_invalid_query_string_hotel_id_is_a_bad_request(client):
+    assert client.get('/revenue-analytics?hotel_id=../other').status_code == 400
+
+
+def test_invalid_batch_job_hotel_id_fails_only_that_job(client):
+    jobs = [predict_request('5'), predict_request('../other')]
+
+    response = client.post('/predict-daily-rates/batch', json={'jobs': jobs})
+
+    assert response.status_code == 200
+    assert [r['success'] for r in response.json['results']] == [True, False]
+    assert response.json['results'][1]['error'].startswith('Invalid hotel_id')
@@ -0,0 +1,90 @@
+import sqlite3
+
+from prometheus_client.parser import text_string_to_metric_families
+
+import app
+import instrumentation
+from test_prediction_cache import preview_args
+
+ROUTE = '/predict-daily-rates'
+
+
+def predict_request(**changes):
+    return dict(preview_args(), **changes)
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    return {(sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(response.get_data(as_text=True))
+            for sample in family.samples}
+
+
+def sample(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0.0)
+
+
+def test_metrics_count_requests_stages_and_cache_lookups(pricing_model, client):
+    before = scrape(client)
+
+    client.post(ROUTE, json=predict_request())
+    client.post(ROUTE, json=predict_request())
+    client.post(ROUTE, json={'room_type': 'Deluxe'})
+    after = scrape(client)
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta('pricing_http_requests_total', route=ROUTE, method='POST', status='200') == 2
+    assert delta('pricing_http_requests_total', route=ROUTE, method='POST', status='400') == 1
+    assert delta('pricing_http_request_duration_seconds_count', route=ROUTE) == 3
+    assert delta('pricing_prediction_cache_lookups_total', result='miss') == 1
+    assert delta('pricing_prediction_cache_lookups_total', result='hit') == 1
+    # The second request is a cache hit: only its response is serialized
+    for stage in ('calendar', 'history', 'factors', 'score', 'finalize'):
+        assert delta('pricing_stage_duration_seconds_count', stage=stage) == 1
+    assert delta('pricing_stage_duration_seconds_count', stage='serialize') == 2
+
+
+def test_queries_are_counted_by_statement_kind():
+    instrumentation.enable()
+    conn = sqlite3.connect(':memory:', factory=instrumentation.connection_factory())
+    selects, inserts = instrumentation._query_count['select'], instrumentation._query_count['insert']
+    before = selects._value.get(), inserts._value.get()
+
+    conn.execute('CREATE TABLE t (x)')
+    conn.cursor().executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+    conn.execute('SELECT x FROM t').fetchall()
+    instrumentation.flush_queries()
+
+    assert (selects._value.get() - before[0], inserts._value.get() - before[1]) == (1, 1)
+
+
+def test_streamed_request_is_timed_to_its_first_chunk(client, monkeypatch):
+    events = []
+
+    def stream(jobs, batch=False):
+        events.append('first chunk')
+        yield '{}\n'
+        events.append('last chunk')
+        yield '{}\n'
+
+    monkeypatch.setattr(app, 'stream_pricing_jobs', stream)
+    monkeypatch.setattr(instrumentation, 'observe_request', lambda *args: events.append(args[:3]))
+
+    response = client.post(ROUTE, json=predict_request(format='ndjson'))
+
+    assert response.get_data(as_text=True) == '{}\n{}\n'
+    assert events == ['first chunk', (ROUTE, 'POST', 200), 'last chunk']
+
+
+def test_empty_streamed_body_is_observed_when_it_ends(client, monkeypatch):
+    events = []
+    monkeypatch.setattr(app, 'stream_pricing_jobs', lambda jobs, batch=False: iter(()))
+    monkeypatch.setattr(instrumentation, 'observe_request', lambda *args: events.append(args[:3]))
+
+    response = client.post(ROUTE, json=predict_request(format='ndjson'))
+
+    assert response.get_data() == b''
+    assert events == [(ROUTE, 'POST', 200)]
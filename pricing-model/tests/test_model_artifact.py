@@ -0,0 +1,148 @@
+import json
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from pricing_engine import (
+    ARTIFACT_ALIGNMENT,
+    MODEL_ARTIFACT_MAGIC,
+    is_model_artifact,
+    model_artifact_path,
+    preferred_model_path,
+    read_model_artifact,
+    write_model_artifact,
+)
+from test_model_state import STANDARD_ROOMS, preview, publish_artifact
+
+
+def sample_arrays():
+    return {
+        'thresholds': np.linspace(0.0, 1.0, 13),
+        'features': np.arange(7, dtype=np.int32),
+        'missing_left': np.array([True, False, True]),
+        'values': np.arange(12, dtype=np.float32).reshape(3, 4),
+        'empty': np.empty((0,), dtype=np.int64),
+        'transposed': np.arange(6, dtype=np.int16).reshape(2, 3).T,
+    }
+
+
+def test_arrays_and_metadata_round_trip(tmp_path):
+    path = str(tmp_path / 'model.hpm')
+    metadata = {'baseline': 12.5, 'room_types': ['Deluxe', 'Suite'], 'validation': None}
+
+    write_model_artifact(path, metadata, sample_arrays())
+    loaded_metadata, arrays = read_model_artifact(path)
+
+    assert loaded_metadata == metadata
+    assert list(arrays) == list(sample_arrays())
+    for name, expected in sample_arrays().items():
+        assert arrays[name].dtype == expected.dtype
+        np.testing.assert_array_equal(arrays[name], expected)
+
+
+def test_arrays_are_aligned_read_only_views_of_the_file(tmp_path):
+    path = str(tmp_path / 'model.hpm')
+    write_model_artifact(path, {}, sample_arrays())
+
+    _, arrays = read_model_artifact(path)
+
+    for name, array in arrays.items():
+        if array.size:
+            assert array.ctypes.data % ARTIFACT_ALIGNMENT == 0, name
+            assert isinstance(array.base, np.memmap)
+            assert not array.flags.writeable
+
+
+def test_file_layout(tmp_path):
+    path = str(tmp_path / 'model.hpm')
+    write_model_artifact(path, {'baseline': 1.0}, {'values': np.arange(3, dtype=np.float64)})
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    prefix = len(MODEL_ARTIFACT_MAGIC)
+    assert data[:prefix] == MODEL_ARTIFACT_MAGIC
+    version, header_length = struct.unpack('<II', data[prefix:prefix + 8])
+    header = json.loads(data[prefix + 8:prefix + 8 + header_length])
+    assert version == 1
+    assert header['arrays']['values'] == {'dtype': '<f8', 'shape': [3], 'offset': 0}
+    # The arrays start at the first aligned offset after the header
+    data_start = -(-(prefix + 8 + header_length) // ARTIFACT_ALIGNMENT) * ARTIFACT_ALIGNMENT
+    assert data[data_start:] == np.arange(3, dtype=np.float64).tobytes()
+    assert is_model_artifact(path)
+
+
+def test_replacing_an_artifact_keeps_existing_mappings_valid(tmp_path):
+    path = str(tmp_path / 'model.hpm')
+    write_model_artifact(path, {'version': 1}, {'values': np.full(1000, 1.0)})
+    _, old = read_model_artifact(path)
+
+    write_model_artifact(path, {'version': 2}, {'values': np.full(10, 2.0)})
+    metadata, new = read_model_artifact(path)
+
+    assert metadata == {'version': 2}
+    np.testing.assert_array_equal(new['values'], np.full(10, 2.0))
+    np.testing.assert_array_equal(old['values'], np.full(1000, 1.0))
+    assert os.listdir(tmp_path) == ['model.hpm']
+
+
+def test_other_files_are_rejected(tmp_path):
+    pickle_path = tmp_path / 'model.pkl'
+    pickle_path.write_bytes(b'\x80\x04\x95 not an artifact')
+    future_path = tmp_path / 'future.hpm'
+    write_model_artifact(str(future_path), {}, {})
+    data = bytearray(future_path.read_bytes())
+    data[len(MODEL_ARTIFACT_MAGIC):len(MODEL_ARTIFACT_MAGIC) + 4] = struct.pack('<I', 2)
+    future_path.write_bytes(bytes(data))
+
+    assert not is_model_artifact(str(pickle_path))
+    with pytest.raises(ValueError, match='not a model artifact'):
+        read_model_artifact(str(pickle_path))
+    with pytest.raises(ValueError, match='Unsupported model artifact version 2'):
+        read_model_artifact(str(future_path))
+
+
+def test_preferred_model_path(tmp_path):
+    pickle_path = str(tmp_path / 'hotel_pricing_model.pkl')
+    artifact_path = model_artifact_path(pickle_path)
+    assert artifact_path == str(tmp_path / 'hotel_pricing_model.hpm')
+
+    open(pickle_path, 'wb').close()
+    assert preferred_model_path(pickle_path) == pickle_path
+
+    open(artifact_path, 'wb').close()
+    os.utime(pickle_path, (1000, 1000))
+    assert preferred_model_path(pickle_path) == artifact_path
+
+    # A pickle saved after the artifact wins until the artifact is rewritten
+    os.utime(pickle_path, (os.path.getmtime(artifact_path) + 10,) * 2)
+    assert preferred_model_path(pickle_path) == pickle_path
+
+    os.remove(pickle_path)
+    assert preferred_model_path(pickle_path) == artifact_path
+
+
+def test_loaded_artifact_predicts_like_the_model_that_saved_it(pricing_model, tmp_path):
+    path = publish_artifact(pricing_model, tmp_path / 'model.hpm', STANDARD_ROOMS, 'v7')
+    expected = preview(pricing_model)
+
+    pricing_model.state = pricing_model.state.replace(model=None, scaler=None, compiled=None, model_version=None)
+    pricing_model.load_model(path)
+
+    assert pricing_model.model_version == 'v7'
+    assert pricing_model.model is None
+    assert preview(pricing_model) == expected
+    assert {p['multiplier_source'] for p in expected} == {'ml_prediction'}
+
+
+def test_artifact_for_other_features_is_refused(pricing_model, tmp_path):
+    path = publish_artifact(pricing_model, tmp_path / 'model.hpm', STANDARD_ROOMS, 'v1')
+    metadata, arrays = read_model_artifact(path)
+    write_model_artifact(path, dict(metadata, feature_columns=metadata['feature_columns'][:-1]), arrays)
+    state = pricing_model.state
+
+    with pytest.raises(ValueError, match='do not match'):
+        pricing_model.load_artifact(path)
+    assert pricing_model.state is state
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from pricing_engine import FEATURE_COLUMNS, ModelState
+
+STANDARD_ROOMS = ['Deluxe', 'Executive', 'Premium', 'Standard', 'Suite']
+
+
+def publish_artifact(model, path, room_types, version, offset=0.0):
+    """Fit a small model encoding room_types and save it as a serving artifact"""
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, (400, len(FEATURE_COLUMNS)))
+    X[:, 6] = rng.uniform(1000, 5000, 400)
+    X[:, 7] = rng.integers(0, len(room_types), 400)
+    X[:, 8] = rng.integers(0, 5, 400)
+    y = X[:, 6] * (1.0 + 0.05 * X[:, 7]) + offset
+
+    model.model = GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0).fit(X, y)
+    model.scaler = None
+    model.room_type_encoder = LabelEncoder().fit(room_types)
+    model.rate_type_encoder = LabelEncoder().fit(list(model.rate_type_multipliers))
+    model.model_version = version
+    model.compile_model()
+    model.save_artifact(str(path))
+    return str(path)
+
+
+def preview(model, room_type='Deluxe'):
+    return model.predict_daily_rates([3000.0] * 7, room_type, 'EP', '2026-04-01',
+                                     use_historical_fallback=False, persist=False, use_cache=False)
+
+
+def test_artifact_with_new_room_types_loads_over_a_loaded_model(pricing_model, tmp_path):
+    current = publish_artifact(pricing_model, tmp_path / 'current.hpm', STANDARD_ROOMS, 'v1')
+    extended = publish_artifact(pricing_model, tmp_path / 'extended.hpm', STANDARD_ROOMS + ['Penthouse'], 'v2')
+
+    pricing_model.load_artifact(current)
+    assert {p['multiplier_source'] for p in preview(pricing_model, 'Penthouse')} == {'factor_calculation'}
+
+    pricing_model.load_artifact(extended)
+    assert pricing_model.model_version == 'v2'
+    assert pricing_model.room_type_encoder.classes_.tolist() == sorted(STANDARD_ROOMS + ['Penthouse'])
+    assert {p['multiplier_source'] for p in preview(pricing_model, 'Penthouse')} == {'ml_prediction'}
+
+
+def test_request_scores_with_the_model_it_started_with(pricing_model, tmp_path):
+    first = publish_artifact(pricing_model, tmp_path / 'first.hpm', STANDARD_ROOMS, 'v1')
+    second = publish_artifact(pricing_model, tmp_path / 'second.hpm', ['Penthouse'] + STANDARD_ROOMS, 'v2', offset=500.0)
+
+    pricing_model.load_artifact(first)
+    expected = preview(pricing_model)
+
+    # Publish the second model while the request is between its calendar lookup and scoring
+    calendar = pricing_model.calendar
+    features = calendar.features
+
+    def features_then_swap(dates):
+        result = features(dates)
+        pricing_model.load_artifact(second)
+        return result
+
+    calendar.features = features_then_swap
+    assert preview(pricing_model) == expected
+    assert pricing_model.model_version == 'v2'
+    assert preview(pricing_model) != expected
+
+
+def test_request_factors_use_the_calendar_it_started_with(pricing_model):
+    def factor_preview():
+        return pricing_model.predict_daily_rates([3000.0] * 14, 'Deluxe', 'EP', '2026-12-20',
+                                                 use_historical_fallback=False, persist=False, use_cache=False)
+
+    expected = factor_preview()
+    state = pricing_model.state
+    raised = state.replace(occasion_multipliers={name: value + 0.5 for name, value in state.occasion_multipliers.items()})
+
+    # Swap in new occasion multipliers once the request has looked up its occasions
+    features = state.calendar.features
+
+    def features_then_swap(dates):
+        result = features(dates)
+        pricing_model.state = raised
+        return result
+
+    state.calendar.features = features_then_swap
+    assert factor_preview() == expected
+    assert pricing_model.calendar is raised.calendar
+    assert [p['demand_factor'] for p in factor_preview()] != [p['demand_factor'] for p in expected]
+
+
+def test_occasion_multiplier_change_gets_its_own_calendar(pricing_model):
+    state = pricing_model.state
+
+    assert state.replace(model_version='v2').calendar is state.calendar
+    changed = state.replace(occasion_multipliers=dict(state.occasion_multipliers, Weekend=1.5))
+    assert changed.calendar is not state.calendar
+    assert changed.calendar.occasion_multipliers['Weekend'] == 1.5
+
+
+def test_model_state_is_immutable(pricing_model):
+    with pytest.raises(AttributeError):
+        pricing_model.state.model_version = 'v2'
+    with pytest.raises(TypeError):
+        ModelState(encoder=None)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import holidays
+import pytest
+
+from pricing_engine import OccasionCalendar
+
+MULTIPLIERS = {'Weekend': 1.2, 'Summer Peak': 1.4, 'Winter Holiday': 1.3, 'Christmas Day': 1.9, 'Festival': 0.9}
+
+
+def days(start, count):
+    return [start + timedelta(days=i) for i in range(count)]
+
+
+@pytest.mark.parametrize('dates', [
+    days(datetime(2026, 1, 1), 365),
+    days(datetime(2027, 12, 20), 80),  # across a year boundary, into a leap year
+    [datetime(2028, 2, 29), datetime(2026, 7, 4), datetime(2028, 2, 29), datetime(2025, 12, 25)],
+])
+def test_features_match_per_day_rules(dates):
+    calendar = OccasionCalendar(MULTIPLIERS)
+
+    features = calendar.features(dates)
+
+    for i, date in enumerate(dates):
+        occasions = OccasionCalendar._day_occasions(date, holidays.US(years=date.year))
+        assert features['occasions'][i] == occasions
+        assert calendar.occasions(date) == occasions
+        assert features['num_occasions'][i] == len(occasions)
+        assert features['is_holiday'][i] == bool(occasions)
+        assert features['is_weekend'][i] == (date.weekday() >= 5)
+        assert features['max_multiplier'][i] == max([1.0] + [MULTIPLIERS[o] for o in occasions if o in MULTIPLIERS])
+        assert features['occasion_boost'][i] == pytest.approx(
+            max(MULTIPLIERS.get(o, 1.0) - 1.0 for o in occasions) if occasions else 0.0)
+
+
+def test_occasions_of_a_day():
+    calendar = OccasionCalendar(MULTIPLIERS)
+
+    assert calendar.occasions(datetime(2026, 12, 25)) == ['Christmas Day', 'Winter Holiday', 'Festival']
+    assert calendar.occasions(datetime(2026, 2, 14)) == ['Weekend', 'Festival', "Valentine's Day"]
+    assert calendar.occasions(datetime(2026, 5, 13)) == ['Wedding Season']
+
+
+def test_returned_occasions_do_not_change_the_calendar():
+    calendar = OccasionCalendar(MULTIPLIERS)
+    day = datetime(2026, 12, 25)
+
+    calendar.occasions(day).append('Party')
+
+    assert 'Party' not in calendar.occasions(day)
+
+
+def test_each_year_is_built_once_and_least_recently_used_evicted(monkeypatch):
+    calendar = OccasionCalendar(MULTIPLIERS, max_years=2)
+    built = []
+    build_year = calendar._build_year
+    monkeypatch.setattr(calendar, '_build_year', lambda year: built.append(year) or build_year(year))
+
+    calendar.features(days(datetime(2025, 12, 1), 62))
+    calendar.occasions(datetime(2025, 6, 1))
+    calendar.occasions(datetime(2027, 6, 1))
+    calendar.occasions(datetime(2025, 7, 1))
+    calendar.occasions(datetime(2026, 7, 1))
+
+    assert built == [2025, 2026, 2027, 2026]
+    assert list(calendar._years) == [2025, 2026]
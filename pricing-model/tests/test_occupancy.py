@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2026, 1, 1)
+
+
+def record_occupancy(model, hotel_id='h1'):
+    """Actual occupancy on a few days, one of them without a percentage"""
+    for offset, occupancy in ((5, 92.0), (40, 71.0), (41, None), (200, 55.5)):
+        model.update_occupancy_data(START + timedelta(days=offset), occupancy, 100,
+                                    None if occupancy is None else int(occupancy), hotel_id=hotel_id)
+
+
+def test_daily_rates_match_per_date_occupancy(pricing_model):
+    record_occupancy(pricing_model)
+
+    chunks = pricing_model.iter_daily_rate_chunks([3000.0] * 120, 'Deluxe', 'EP', START.strftime('%Y-%m-%d'),
+                                                  hotel_id='h1', persist=False, chunk_days=31, use_cache=False)
+    predictions = [p for chunk in chunks for p in chunk]
+
+    assert len(predictions) == 120
+    for offset, prediction in enumerate(predictions):
+        date = START + timedelta(days=offset)
+        assert prediction['occupancy_data'] == pricing_model.calculate_occupancy_percentage(date, 'h1')
+        assert prediction['occupancy_factor'] == pricing_model.calculate_occupancy_factor(date, hotel_id='h1')
+
+
+def test_occupancy_range_matches_per_date_lookups(pricing_model):
+    record_occupancy(pricing_model)
+    # Across a year boundary, with actual, missing-percentage and forecast days
+    start, end = datetime(2025, 12, 20), datetime(2026, 8, 1)
+
+    occupancy = pricing_model.calculate_occupancy_range(start, end, 'h1')
+
+    assert [date for date, _ in occupancy] == [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    assert {data['source'] for _, data in occupancy} == {'actual', 'predicted'}
+    for date, data in occupancy:
+        assert data == pricing_model.calculate_occupancy_percentage(date, 'h1')
+
+
+def test_occupancy_range_of_one_day(pricing_model):
+    record_occupancy(pricing_model)
+    day = START + timedelta(days=5)
+
+    assert pricing_model.calculate_occupancy_range(day, day, 'h1') == [
+        (day, pricing_model.calculate_occupancy_percentage(day, 'h1'))]
+
+
+def occupancy_range(client, start, end, hotel_id='h1'):
+    response = client.get(f'/occupancy-data?start={start}&end={end}&hotel_id={hotel_id}')
+    assert response.status_code == 200
+    return {day['date']: day['occupancy_data'] for day in response.json['occupancy_data']}
+
+
+def test_bulk_ingest_writes_every_record(pricing_model, client):
+    records = [
+        {'date': '2026-01-02', 'actual_occupancy': 81.5, 'total_rooms': 120, 'occupied_rooms': 98},
+        {'date': '2026-01-03', 'total_rooms': 50, 'occupied_rooms': 40},
+        {'date': '2026-01-05', 'actual_occupancy': 33.0},
+    ]
+
+    response = client.post('/occupancy-data/bulk', json={'hotel_id': 'h1', 'records': records})
+
+    assert response.status_code == 200
+    assert response.json['records_updated'] == 3
+    days = occupancy_range(client, '2026-01-02', '2026-01-05')
+    assert {date: data['source'] for date, data in days.items()} == {
+        '2026-01-02': 'actual', '2026-01-03': 'actual', '2026-01-04': 'predicted', '2026-01-05': 'actual'}
+    assert days['2026-01-02'] == {'occupancy_percentage': 81.5, 'occupied_rooms': 98, 'total_rooms': 120, 'source': 'actual'}
+    assert days['2026-01-03']['occupancy_percentage'] == 80.0
+    assert days['2026-01-05']['total_rooms'] == 100
+    # Only the hotel the records were sent for
+    assert {data['source'] for data in occupancy_range(client, '2026-01-02', '2026-01-05', 'h2').values()} == {'predicted'}
+
+
+def test_bulk_ingest_replaces_earlier_records(pricing_model, client):
+    record_occupancy(pricing_model)
+    day = (START + timedelta(days=5)).strftime('%Y-%m-%d')
+
+    # A bare list, with the hotel in the query string
+    response = client.post('/occupancy-data/bulk?hotel_id=h1', json=[{'date': day, 'actual_occupancy': 60.0}])
+
+    assert response.status_code == 200
+    assert occupancy_range(client, day, day)[day]['occupancy_percentage'] == 60.0
+
+
+@pytest.mark.parametrize('records, error', [
+    ([{'date': '2026-01-02', 'actual_occupancy': 70.0}, {'actual_occupancy': 75.0}],
+     'Missing required field: date (record 1)'),
+    ([{'date': '2026-01-02', 'actual_occupancy': 70.0}, '2026-01-03'], 'Each record must be an object (record 1)'),
+    ({'date': '2026-01-02'}, 'Missing required field: records'),
+])
+def test_invalid_bulk_ingest_writes_nothing(pricing_model, client, records, error):
+    response = client.post('/occupancy-data/bulk', json={'hotel_id': 'h1', 'records': records})
+
+    assert response.status_code == 400
+    assert response.json['error'] == error
+    assert occupancy_range(client, '2026-01-02', '2026-01-02')['2026-01-02']['source'] == 'predicted'
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from test_prediction_cache import preview_args
+
+
+def request_body(**changes):
+    body = preview_args()
+    del body['persist']
+    return dict(body, **changes)
+
+
+def history_count(model, hotel_id='h1'):
+    model.multiplier_writer.flush()
+    conn = model.databases.get(hotel_id).connection()
+    return conn.execute('SELECT COUNT(*) FROM multiplier_history').fetchone()[0]
+
+
+@pytest.mark.parametrize('persist, written', [(False, 0), (True, 14)])
+def test_persist_flag_decides_what_is_written(pricing_model, client, persist, written):
+    response = client.post('/predict-daily-rates', json=request_body(persist=persist))
+
+    assert response.status_code == 200
+    assert response.json['persisted'] is persist
+    assert history_count(pricing_model) == written
+
+
+@pytest.mark.parametrize('persist', ['false', 0, None, 'no'])
+def test_non_boolean_persist_is_a_bad_request(pricing_model, client, persist):
+    response = client.post('/predict-daily-rates', json=request_body(persist=persist))
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'persist must be true or false'
+    assert history_count(pricing_model) == 0
+
+
+@pytest.mark.parametrize('body', [
+    {'persist': 'false', 'jobs': [request_body()]},
+    {'persist': False, 'jobs': [request_body(), request_body(persist='false')]},
+])
+def test_non_boolean_batch_persist_is_a_bad_request(pricing_model, client, body):
+    response = client.post('/predict-daily-rates/batch', json=dict(body, hotel_id='h1'))
+
+    assert response.status_code == 400
+    assert history_count(pricing_model) == 0
+
+
+def ndjson_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def batch_jobs():
+    return [request_body(room_type='Deluxe'), request_body(room_type='Suite', rate_type='CP'),
+            request_body(room_type='Standard', base_rates=[2500.0] * 5)]
+
+
+def test_batch_prices_each_job_like_a_single_request(pricing_model, client):
+    response = client.post('/predict-daily-rates/batch', json={'hotel_id': 'h1', 'persist': False, 'jobs': batch_jobs()})
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [(r['room_type'], r['rate_type'], r['total_days']) for r in results] == [
+        ('Deluxe', 'EP', 14), ('Suite', 'CP', 14), ('Standard', 'EP', 5)]
+    for job, result in zip(batch_jobs(), results):
+        single = client.post('/predict-daily-rates', json=dict(job, hotel_id='h1', persist=False)).json
+        assert result['predictions'] == single['predictions']
+        assert result['summary'] == single['summary']
+        assert result['persisted'] is False
+    assert response.json['summary']['total_jobs'] == 3
+    assert response.json['summary']['failed_jobs'] == 0
+
+
+def test_batch_reports_failed_jobs_on_their_own(pricing_model, client):
+    jobs = batch_jobs()
+    del jobs[1]['year_start']
+
+    response = client.post('/predict-daily-rates/batch', json={'hotel_id': 'h1', 'jobs': jobs})
+
+    results = response.json['results']
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[1]['error'] == 'Missing required field: year_start'
+    assert response.json['summary']['failed_jobs'] == 1
+    # Jobs without their own persist follow the default and are written
+    assert history_count(pricing_model) == 14 + 5
+
+
+def test_batch_job_persist_overrides_the_top_level(pricing_model, client):
+    jobs = batch_jobs()
+    jobs[2]['persist'] = True
+
+    response = client.post('/predict-daily-rates/batch', json={'hotel_id': 'h1', 'persist': False, 'jobs': jobs})
+
+    assert [r['persisted'] for r in response.json['results']] == [False, False, True]
+    assert history_count(pricing_model) == 5
+
+
+@pytest.mark.parametrize('response_format', ['rows', 'ndjson'])
+@pytest.mark.parametrize('job', ['abc', 5, None, ['Deluxe']])
+def test_batch_job_that_is_not_an_object_is_a_bad_request(client, response_format, job):
+    response = client.post('/predict-daily-rates/batch',
+                           json={'format': response_format, 'jobs': [request_body(), job]})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'Each job must be an object'
+
+
+def test_ndjson_streams_each_day_then_a_summary(pricing_model, client):
+    body = request_body(format='ndjson', persist=False)
+    expected = client.post('/predict-daily-rates', json=dict(body, format='rows')).json
+
+    response = client.post('/predict-daily-rates', json=body)
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = ndjson_lines(response)
+    assert lines[:-1] == expected['predictions']
+    assert lines[-1] == {'record': 'summary', 'success': True, 'room_type': 'Deluxe', 'rate_type': 'EP',
+                         'total_days': 14, 'summary': expected['summary']}
+
+
+def test_ndjson_batch_streams_jobs_in_order(pricing_model, client):
+    jobs = batch_jobs()
+    del jobs[1]['base_rates']
+
+    response = client.post('/predict-daily-rates/batch',
+                           json={'hotel_id': 'h1', 'persist': False, 'format': 'ndjson', 'jobs': jobs})
+
+    lines = ndjson_lines(response)
+    records = [line.get('record') for line in lines]
+    assert records == [None] * 14 + ['summary', 'error'] + [None] * 5 + ['summary', 'batch_summary']
+    assert lines[15]['error'] == 'Missing required field: base_rates'
+    assert lines[-1]['summary']['total_jobs'] == 3
+    assert lines[-1]['summary']['failed_jobs'] == 1
+    assert history_count(pricing_model) == 0
@@ -0,0 +1,57 @@
+import io
+import json
+import sys
+
+import pytest
+
+import predict
+from test_model_state import STANDARD_ROOMS, publish_artifact
+
+QUOTE = {'checkin_date': '2026-04-01', 'checkout_date': '2026-04-04', 'room_type': 'Deluxe', 'hotel_id': 'h1'}
+
+
+def run_worker(monkeypatch, *requests):
+    """Responses of a worker fed one line per request, "ready" line included"""
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''.join(line + '\n' for line in requests)))
+    out = io.StringIO()
+    predict.run_worker(out)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.fixture
+def model_dir(pricing_model, tmp_path, monkeypatch):
+    """predict.py's model directory, empty; pricing_model keeps the worker's data under tmp_path"""
+    monkeypatch.setattr(predict, 'BASE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_worker_answers_each_line_in_order(pricing_model, model_dir, monkeypatch):
+    publish_artifact(pricing_model, model_dir / 'hotel_pricing_model.hpm', STANDARD_ROOMS, 'v1')
+
+    responses = run_worker(monkeypatch, json.dumps(dict(QUOTE, id=1)), '', 'not json',
+                           json.dumps({'id': 'b', 'room_type': 'Deluxe'}), json.dumps(dict(QUOTE, num_rooms=2)))
+
+    assert responses[0] == {'ready': True}
+    assert len(responses) == 5
+    assert responses[1]['id'] == 1
+    assert responses[1]['nights'] == 3
+    assert {night['multiplier_source'] for night in responses[1]['nightly_rates']} == {'ml_prediction'}
+    assert set(responses[2]) == {'error'}
+    assert responses[3] == {'error': "'checkin_date'", 'id': 'b'}
+    assert 'id' not in responses[4]
+    assert responses[4]['num_rooms'] == 2
+
+
+def test_worker_without_a_loadable_model_is_ready_and_quotes(model_dir, monkeypatch):
+    (model_dir / 'hotel_pricing_model.pkl').write_bytes(b'not a model')
+
+    responses = run_worker(monkeypatch, json.dumps(dict(QUOTE, id=1)))
+
+    assert responses[0] == {'ready': True}
+    assert responses[1]['id'] == 1
+    assert {night['multiplier_source'] for night in responses[1]['nightly_rates']} == {'factor_calculation'}
+
+
+def test_one_shot_load_failure_raises(model_dir):
+    with pytest.raises(FileNotFoundError):
+        predict.load_pricing_model()
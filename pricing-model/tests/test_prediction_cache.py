@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+
+from pricing_engine import MultiplierWriter, PredictionCache
+
+YEAR_START = '2026-04-01'
+DAYS = 14
+
+
+def multiplier_rows(multiplier, room_type='Deluxe', rate_type='EP', days=DAYS):
+    start = datetime.strptime(YEAR_START, '%Y-%m-%d')
+    return [
+        ((start + timedelta(days=i)).strftime('%Y-%m-%d'), room_type, rate_type, multiplier,
+         3000.0, 3000.0 * multiplier, 1.0, 1.0)
+        for i in range(days)
+    ]
+
+
+def preview_args(hotel_id='h1', room_type='Deluxe'):
+    return dict(base_rates=[3000.0] * DAYS, room_type=room_type, rate_type='EP', year_start=YEAR_START,
+                hotel_id=hotel_id, persist=False)
+
+
+def test_prediction_between_submit_and_commit_is_not_served_stale(pricing_model):
+    pricing_model.save_multipliers(multiplier_rows(1.5), hotel_id='h1')
+
+    # Runs while the rows are still queued, so it reads the old history
+    before = pricing_model.predict_daily_rates(**preview_args())
+    assert 'historical' not in {p['multiplier_source'] for p in before}
+
+    pricing_model.multiplier_writer.flush()
+
+    fresh = pricing_model.predict_daily_rates(**preview_args(), use_cache=False)
+    assert {p['multiplier_source'] for p in fresh} == {'historical'}
+    assert pricing_model.predict_daily_rates(**preview_args()) == fresh
+
+
+def test_synchronous_multiplier_write_invalidates(pricing_model):
+    before = pricing_model.predict_daily_rates(**preview_args())
+    assert pricing_model.predict_daily_rates(**preview_args()) is before
+
+    pricing_model.save_multipliers(multiplier_rows(1.2), wait=True, hotel_id='h1')
+
+    after = pricing_model.predict_daily_rates(**preview_args())
+    assert after is not before
+    assert {p['multiplier'] for p in after} == {1.2}
+
+
+def test_writes_only_invalidate_their_hotel_and_room(pricing_model):
+    other_hotel = pricing_model.predict_daily_rates(**preview_args(hotel_id='h2'))
+    other_room = pricing_model.predict_daily_rates(**preview_args(room_type='Suite'))
+
+    pricing_model.save_multipliers(multiplier_rows(1.5), wait=True, hotel_id='h1')
+
+    assert pricing_model.predict_daily_rates(**preview_args(hotel_id='h2')) is other_hotel
+    assert pricing_model.predict_daily_rates(**preview_args(room_type='Suite')) is other_room
+
+
+def test_write_four_weeks_earlier_invalidates_weekday_fallback(pricing_model):
+    # A day without history falls back to the same weekday up to four weeks back
+    cached = pricing_model.predict_daily_rates(**dict(preview_args(), year_start='2026-04-29'))
+    rows = [row for row in multiplier_rows(1.5) if row[0] == YEAR_START]
+
+    pricing_model.save_multipliers(rows, wait=True, hotel_id='h1')
+
+    after = pricing_model.predict_daily_rates(**dict(preview_args(), year_start='2026-04-29'))
+    assert after is not cached
+    assert after[0]['multiplier_source'] == 'historical'
+
+
+def test_occupancy_write_invalidates(pricing_model):
+    cached = pricing_model.predict_daily_rates(**preview_args())
+
+    pricing_model.update_occupancy_data(datetime(2026, 4, 3), 95.0, 40, 38, hotel_id='h1')
+
+    assert pricing_model.predict_daily_rates(**preview_args()) is not cached
+
+
+def test_single_multiplier_write_invalidates(pricing_model):
+    cached = pricing_model.predict_daily_rates(**preview_args())
+
+    pricing_model.save_multiplier(datetime(2026, 4, 5), 'Deluxe', 'EP', 1.8, 3000.0, 5400.0, 1.0, 1.0, hotel_id='h1')
+
+    after = pricing_model.predict_daily_rates(**preview_args())
+    assert after is not cached
+    assert after[4]['multiplier'] == 1.8
+
+
+def test_committed_preview_invalidates(pricing_model):
+    preview = pricing_model.predict_daily_rates(**preview_args())
+    published = [dict(p, dynamic_rate=p['base_rate'] * 1.25) for p in preview]
+
+    pricing_model.commit_daily_rates(published, hotel_id='h1')
+
+    after = pricing_model.predict_daily_rates(**preview_args())
+    assert after is not preview
+    assert {p['multiplier'] for p in after} == {1.25}
+
+
+def test_bulk_occupancy_write_invalidates(pricing_model):
+    cached = pricing_model.predict_daily_rates(**preview_args())
+
+    pricing_model.update_occupancy_data_bulk([{'date': datetime(2026, 4, 10), 'actual_occupancy': 97.0}], hotel_id='h1')
+
+    assert pricing_model.predict_daily_rates(**preview_args()) is not cached
+
+
+def test_writer_reports_rows_after_commit(pricing_model):
+    written = []
+    writer = MultiplierWriter(flush_interval=3600, on_write=lambda hotel_id, rows: written.append((hotel_id, rows)))
+    db = pricing_model.databases.get('h1')
+    rows = multiplier_rows(1.4)
+
+    writer.submit(db, rows, 'h1')
+    assert written == []
+
+    writer.flush()
+    committed = db.connection().execute('SELECT COUNT(*) FROM multiplier_history').fetchone()[0]
+    writer.stop()
+    assert written == [('h1', rows)]
+    assert committed == len(rows)
+
+
+def test_only_previews_are_cached(pricing_model):
+    persisted_args = dict(preview_args(), persist=True)
+
+    persisted = pricing_model.predict_daily_rates(**persisted_args)
+    pricing_model.multiplier_writer.flush()
+    assert pricing_model.prediction_cache.stats()['entries'] == 0
+
+    # Run again, a persisting request is computed (and written) anew
+    again = pricing_model.predict_daily_rates(**persisted_args)
+    assert again is not persisted
+    assert {p['multiplier_source'] for p in again} == {'historical'}
+
+    preview = pricing_model.predict_daily_rates(**preview_args())
+    assert pricing_model.predict_daily_rates(**preview_args()) is preview
+    assert pricing_model.prediction_cache.stats()['entries'] == 1
+
+
+def test_put_is_dropped_after_concurrent_invalidation():
+    cache = PredictionCache()
+    key = cache.key([3000.0], 'Deluxe', 'EP', YEAR_START, hotel_id='h1')
+    predictions = [{'date': YEAR_START}]
+
+    generation = cache.generation('h1')
+    cache.invalidate('h2', ['2030-01-01'])
+    cache.put(key, predictions, generation)
+    assert cache.get(key) is predictions
+
+    generation = cache.generation('h1')
+    cache.invalidate('h1', ['2030-01-01'])
+    cache.put(key + ('other',), predictions, generation)
+    assert cache.get(key + ('other',)) is None
+
+
+def test_put_is_dropped_after_clear():
+    cache = PredictionCache()
+    key = cache.key([3000.0], 'Deluxe', 'EP', YEAR_START, hotel_id='h1')
+
+    generation = cache.generation('h1')
+    cache.clear()
+    cache.put(key, [{'date': YEAR_START}], generation)
+    assert cache.get(key) is None
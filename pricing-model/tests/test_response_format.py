@@ -0,0 +1,146 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from response_format import BINARY_MAGIC, decode_binary, encode_binary, from_columnar, to_columnar
+from test_occupancy import START, record_occupancy
+from test_prediction_cache import preview_args
+
+
+def flat(record, prefix=''):
+    """A prediction with nested dicts as dotted keys"""
+    items = {}
+    for name, value in record.items():
+        if isinstance(value, dict):
+            items.update(flat(value, f'{prefix}{name}.'))
+        else:
+            items[f'{prefix}{name}'] = value
+    return items
+
+
+def mixed_predictions(pricing_model):
+    """A month with actual occupancy on some days, so days have different nested fields"""
+    record_occupancy(pricing_model)
+    return pricing_model.predict_daily_rates([3000.0 + 10 * (i % 4) for i in range(30)], 'Deluxe', 'EP',
+                                             START.strftime('%Y-%m-%d'), hotel_id='h1', persist=False)
+
+
+def test_columnar_round_trip_of_predictions(pricing_model):
+    predictions = mixed_predictions(pricing_model)
+
+    table = to_columnar(predictions)
+
+    assert table['length'] == 30
+    assert table['dimensions']['room_type'] == 'Deluxe'
+    assert table['dimensions']['dependencies_applied'] is True
+    assert 'base_rate' in table['columns']
+    # Forecast-only fields are None on the days with actual occupancy
+    assert table['columns']['occupancy_data.factors.base'][5] is None
+    fields = set().union(*(flat(p) for p in predictions))
+    assert set(table['dimensions']) | set(table['columns']) | set(table['aliases']) == fields
+    assert from_columnar(table) == [dict(dict.fromkeys(fields), **flat(p)) for p in predictions]
+
+
+def test_repeated_values_and_columns_are_stated_once():
+    rows = [{'a': 1, 'b': [2, 3][i % 2], 'c': [2, 3][i % 2], 'd': {'e': 'x', 'f': i}} for i in range(4)]
+
+    table = to_columnar(rows)
+
+    assert table == {
+        'length': 4,
+        'dimensions': {'a': 1, 'd.e': 'x'},
+        'columns': {'b': [2, 3, 2, 3], 'd.f': [0, 1, 2, 3]},
+        'aliases': {'c': 'b'}
+    }
+    assert from_columnar(table) == [flat(row) for row in rows]
+
+
+def test_empty_predictions():
+    table = to_columnar([])
+
+    assert table == {'length': 0, 'dimensions': {}, 'columns': {}, 'aliases': {}}
+    assert from_columnar(table) == []
+
+
+def test_binary_packs_numeric_lists_in_the_smallest_dtype():
+    document = {
+        'small': [1, -2, 3],
+        'medium': [1, 40000],
+        'large': [1, 2 ** 40],
+        'floats': [1, 2.5],
+        'huge': [2 ** 70],
+        'flags': [True, False],
+        'gaps': [1.0, None],
+        'names': ['a', 'b'],
+        'nested': {'values': [0.25] * 3, 'rows': [{'x': [1, 2]}]},
+        'scalar': 7,
+    }
+
+    data = encode_binary(document)
+    decoded = decode_binary(data)
+
+    assert data.startswith(BINARY_MAGIC)
+    assert [(decoded[name].dtype.str, decoded[name].tolist()) for name in ('small', 'medium', 'large', 'floats')] == [
+        ('|i1', [1, -2, 3]), ('<i4', [1, 40000]), ('<i8', [1, 2 ** 40]), ('<f8', [1.0, 2.5])]
+    assert decoded['nested']['values'].tolist() == [0.25] * 3
+    assert decoded['nested']['rows'][0]['x'].tolist() == [1, 2]
+    # Lists that are not all numbers stay JSON
+    for name in ('huge', 'flags', 'gaps', 'names', 'scalar'):
+        assert decoded[name] == document[name]
+
+
+def test_binary_arrays_start_on_8_byte_boundaries():
+    arrays = {'a': [1, 2, 3], 'b': [0.5] * 5, 'c': [70000] * 3}
+    data = encode_binary(arrays)
+
+    header_start = len(BINARY_MAGIC) + 4
+    header_end = header_start + int.from_bytes(data[len(BINARY_MAGIC):header_start], 'little')
+    header = json.loads(data[header_start:header_end])
+    data_start = header_end + (-header_end % 8)
+
+    assert data_start % 8 == 0 and len(data) % 8 == 0
+    for name, values in arrays.items():
+        spec = header['arrays'][header['document'][name]['$array']]
+        assert spec['offset'] % 8 == 0
+        packed = np.asarray(values, dtype=spec['dtype']).tobytes()
+        start = data_start + spec['offset']
+        assert data[start:start + len(packed)] == packed
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_binary(b'{"predictions": []}')
+
+
+@pytest.mark.parametrize('response_format', ['columnar', 'binary'])
+def test_route_formats_carry_the_same_predictions(pricing_model, client, response_format):
+    body = dict(preview_args(), base_rates=[3000.0 + i for i in range(60)])
+    rows = client.post('/predict-daily-rates', json=body).json
+
+    response = client.post('/predict-daily-rates', json=dict(body, format=response_format))
+
+    assert response.status_code == 200
+    if response_format == 'binary':
+        assert response.mimetype == 'application/vnd.hotel-pricing.columnar'
+        document = decode_binary(response.data)
+        table = document['predictions']
+        table['columns'] = {name: values.tolist() if isinstance(values, np.ndarray) else values
+                            for name, values in table['columns'].items()}
+    else:
+        document = response.json
+        table = document['predictions']
+    assert from_columnar(table) == [flat(p) for p in rows['predictions']]
+    assert document['summary'] == rows['summary']
+
+
+def test_large_responses_are_gzipped_when_accepted(pricing_model, client):
+    body = dict(preview_args(), base_rates=[3000.0] * 90, format='binary')
+
+    plain = client.post('/predict-daily-rates', json=body)
+    compressed = client.post('/predict-daily-rates', json=body, headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
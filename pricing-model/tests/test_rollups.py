@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+HOTEL = 'h1'
+
+
+def history_rows(start, days, room_type, rate_type, multiplier):
+    return [
+        ((start + timedelta(days=i)).isoformat(), room_type, rate_type, multiplier + 0.01 * (i % 7),
+         3000.0, 3000.0 * (multiplier + 0.01 * (i % 7)), 1.0 + 0.1 * (i % 3), 1.2)
+        for i in range(days)
+    ]
+
+
+def rows_approx(rows):
+    return [tuple(pytest.approx(value) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+def recomputed_daily(conn):
+    return conn.execute('''
+        SELECT date, SUM(multiplier), SUM(occupancy_factor), SUM(demand_factor), COUNT(*)
+        FROM multiplier_history GROUP BY date ORDER BY date
+    ''').fetchall()
+
+
+def recomputed_rooms(conn):
+    return conn.execute('''
+        SELECT room_type, rate_type, substr(date, 1, 7), SUM(multiplier), SUM(dynamic_rate - base_rate), COUNT(*)
+        FROM multiplier_history GROUP BY room_type, rate_type, substr(date, 1, 7) ORDER BY 1, 2, 3
+    ''').fetchall()
+
+
+def assert_rollups_match_history(conn):
+    daily = conn.execute('''
+        SELECT date, multiplier_sum, occupancy_factor_sum, demand_factor_sum, row_count
+        FROM multiplier_daily_rollup WHERE row_count > 0 ORDER BY date
+    ''').fetchall()
+    rooms = conn.execute('''
+        SELECT room_type, rate_type, month, multiplier_sum, revenue_gain_sum, row_count
+        FROM multiplier_room_rollup WHERE row_count > 0 ORDER BY 1, 2, 3
+    ''').fetchall()
+
+    assert daily == rows_approx(recomputed_daily(conn))
+    assert rooms == rows_approx(recomputed_rooms(conn))
+
+
+@pytest.fixture
+def history(pricing_model):
+    start = date(2026, 1, 20)
+    rows = (history_rows(start, 90, 'Deluxe', 'EP', 1.1) + history_rows(start, 60, 'Suite', 'CP', 1.3)
+            + history_rows(start + timedelta(days=30), 45, 'Deluxe', 'MAP', 0.9))
+    pricing_model.save_multipliers(rows, wait=True, hotel_id=HOTEL)
+    return pricing_model.databases.get(HOTEL).connection()
+
+
+def test_rollups_follow_inserts(history):
+    assert recomputed_daily(history)
+    assert_rollups_match_history(history)
+
+
+def test_rollups_follow_upserts(pricing_model, history):
+    # Same (date, room, rate) keys with new values take the update trigger
+    pricing_model.save_multipliers(history_rows(date(2026, 2, 10), 40, 'Deluxe', 'EP', 1.7), wait=True, hotel_id=HOTEL)
+    pricing_model.save_multiplier(datetime(2026, 3, 1), 'Suite', 'CP', 2.0, 3000.0, 6000.0, 1.3, 1.1, hotel_id=HOTEL)
+
+    assert_rollups_match_history(history)
+
+
+def test_rollups_follow_deletes(history):
+    with history:
+        history.execute("DELETE FROM multiplier_history WHERE date >= '2026-02-15' AND date < '2026-03-10'")
+        history.execute("DELETE FROM multiplier_history WHERE rate_type = 'MAP'")
+
+    assert_rollups_match_history(history)
+
+
+def test_rebuild_matches_triggers(pricing_model, history):
+    maintained = (recomputed_daily(history), recomputed_rooms(history))
+
+    with history:
+        pricing_model.rebuild_rollups(history.cursor())
+
+    assert_rollups_match_history(history)
+    assert (recomputed_daily(history), recomputed_rooms(history)) == maintained
+
+
+@pytest.mark.parametrize('start_date, end_date', [
+    ('2026-01-25', '2026-04-10'),  # partial months at both edges
+    ('2026-02-01', '2026-03-31'),  # whole months only
+    ('2026-02-05', '2026-02-20'),  # inside one month
+])
+def test_room_performance_matches_history(pricing_model, history, start_date, end_date):
+    expected = history.execute('''
+        SELECT room_type, rate_type, AVG(multiplier), AVG(dynamic_rate - base_rate), COUNT(*)
+        FROM multiplier_history WHERE date >= ? AND date <= ?
+        GROUP BY room_type, rate_type ORDER BY 4 DESC
+    ''', (start_date, end_date)).fetchall()
+
+    assert pricing_model.get_room_performance(start_date, end_date, HOTEL) == rows_approx(expected)
+
+
+def test_daily_trends_match_history(pricing_model, history):
+    expected = history.execute('''
+        SELECT date, AVG(multiplier), AVG(occupancy_factor), AVG(demand_factor), COUNT(*)
+        FROM multiplier_history WHERE date >= '2026-02-01' AND date <= '2026-02-28'
+        GROUP BY date ORDER BY date
+    ''').fetchall()
+
+    assert pricing_model.get_daily_trends('2026-02-01', '2026-02-28', HOTEL) == rows_approx(expected)
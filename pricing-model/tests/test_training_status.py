@@ -0,0 +1,39 @@
+import pytest
+
+import app
+from pricing_engine import read_training_status, write_training_status
+
+
+@pytest.fixture
+def published(tmp_path, monkeypatch):
+    artifact_path = tmp_path / 'hotel_pricing_model.hpm'
+    status_path = tmp_path / 'hotel_pricing_model.training.json'
+    monkeypatch.setattr(app, 'ARTIFACT_PATH', str(artifact_path))
+    monkeypatch.setattr(app, 'TRAINING_STATUS_PATH', str(status_path))
+    write_training_status(str(status_path), {'state': 'succeeded', 'model_version': 'v2'})
+    return artifact_path, status_path
+
+
+def test_refused_artifact_fails_the_training_status(pricing_model, published):
+    artifact_path, status_path = published
+    artifact_path.write_bytes(b'not a model')
+
+    with pytest.raises(Exception):
+        app.load_artifact(pricing_model)
+
+    status = read_training_status(str(status_path))
+    assert status['state'] == 'failed'
+    assert status['error'].startswith('Published model could not be loaded')
+    assert status['model_version'] == 'v2'
+
+
+def test_loaded_artifact_keeps_the_training_status(pricing_model, published):
+    from test_model_state import STANDARD_ROOMS, publish_artifact
+
+    artifact_path, status_path = published
+    publish_artifact(pricing_model, artifact_path, STANDARD_ROOMS + ['Penthouse'], 'v2')
+
+    app.load_artifact(pricing_model)
+
+    assert pricing_model.model_version == 'v2'
+    assert read_training_status(str(status_path))['state'] == 'succeeded'
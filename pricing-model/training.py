@@ -0,0 +1,400 @@
+# training.py
+#
+# Training side of the dynamic pricing model. Kept out of the serving import
+# path because pandas and the scikit-learn training modules dominate startup.
+#
+#   python3 training.py [--source history] [--max-rows N] [--max-mae 100]
+#
+# trains a new model version, validates it on a holdout and atomically
+# replaces the serving artifact; the service runs this in the background.
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from pricing_engine import (
+    FEATURE_COLUMNS,
+    CompiledTreeEnsemble,
+    HotelDynamicPricingModel,
+    model_artifact_path,
+    read_model_artifact,
+    training_status_path,
+    write_training_status,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fewer history rows than this cannot support a holdout and early stopping
+MIN_HISTORY_ROWS = 1000
+
+
+def generate_training_data(model, num_samples=10000):
+    """Generate synthetic training data focusing on daily rates
+
+    Every sample falls on one of the next 364 days, so occupancy and demand
+    factors are computed once per day (one occupancy range scan, one calendar
+    pass) and the samples are drawn and priced as whole arrays.
+    """
+    np.random.seed(42)
+
+    start_date = datetime.now()
+
+    room_types = ['Standard', 'Deluxe', 'Suite', 'Premium', 'Executive']
+    rate_types = ['EP', 'CP', 'MAP', 'AP', 'AI']
+
+    # Per-day features and factors for the sampling window
+    days = [start_date + timedelta(days=offset) for offset in range(1, 365)]
+    weekday = np.array([day.weekday() for day in days])
+    day_features = model.calendar.features(days)
+    num_occasions = day_features['num_occasions']
+
+    occupancy = np.array([data['occupancy_percentage'] for _, data in model.calculate_occupancy_range(days[0], days[-1])]) / 100.0
+    occupancy_factor = np.select(
+        [occupancy >= 0.9, occupancy >= 0.85, occupancy >= 0.8, occupancy >= 0.75, occupancy >= 0.7, occupancy >= 0.6, occupancy >= 0.5],
+        [1.6, 1.4, 1.3, 1.2, 1.1, 1.0, 0.95],
+        0.9
+    )
+
+    # Same steps as calculate_demand_factor
+    demand_factor = np.where(num_occasions > 0, day_features['max_multiplier'], 1.0)
+    demand_factor = np.where(weekday >= 5, demand_factor * 1.2, demand_factor)
+    demand_factor = np.clip(demand_factor, 0.5, 3.0)
+
+    # Draw the samples
+    day = np.random.randint(0, len(days), num_samples)
+    room = np.random.randint(0, len(room_types), num_samples)
+    rate = np.random.randint(0, len(rate_types), num_samples)
+
+    # Base price based on room type and rate type
+    base_price = (np.array([model.base_room_prices[r] for r in room_types], dtype=np.float64)[room]
+                  * np.array([model.rate_type_multipliers[r] for r in rate_types])[rate])
+
+    # Market variability
+    market_factor = np.clip(np.random.normal(1.0, 0.1, num_samples), 0.8, 1.3)
+
+    # Calculate final price
+    final_price = base_price * occupancy_factor[day] * demand_factor[day] * market_factor
+    final_price *= np.random.normal(1.0, 0.05, num_samples)  # Small random variation
+
+    first_day = np.datetime64(days[0], 'us')
+    return pd.DataFrame({
+        'date': first_day + day * np.timedelta64(1, 'D'),
+        'room_type': np.array(room_types, dtype=object)[room],
+        'rate_type': np.array(rate_types, dtype=object)[rate],
+        'weekday': weekday[day],
+        'month': np.array([d.month for d in days])[day],
+        'day_of_month': np.array([d.day for d in days])[day],
+        'is_weekend': (weekday[day] >= 5).astype(int),
+        'is_holiday': (num_occasions[day] > 0).astype(int),
+        'num_occasions': num_occasions[day],
+        'base_price': base_price,
+        'final_price': final_price,
+        'occupancy_factor': occupancy_factor[day],
+        'demand_factor': demand_factor[day]
+    })
+
+
+def prepare_features(model, df):
+    """Prepare features for training"""
+    # Encode room type and rate type
+    model.room_type_encoder = LabelEncoder()
+    model.rate_type_encoder = LabelEncoder()
+    df['room_type_encoded'] = model.room_type_encoder.fit_transform(df['room_type'])
+    df['rate_type_encoded'] = model.rate_type_encoder.fit_transform(df['rate_type'])
+
+    return df[FEATURE_COLUMNS]
+
+
+def fit_model(model):
+    """Fit encoders, scaler and model on fresh training data; returns the raw holdout split"""
+    print("Generating training data...")
+    df = generate_training_data(model)
+
+    print("Preparing features...")
+    X = prepare_features(model, df)
+    y = df['final_price']
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Scale features
+    model.scaler = StandardScaler()
+    X_train_scaled = model.scaler.fit_transform(X_train)
+
+    print("Training model...")
+
+    model.model = GradientBoostingRegressor(
+        n_estimators=200,
+        learning_rate=0.1,
+        max_depth=6,
+        random_state=42
+    )
+
+    fit_started = time.perf_counter()
+    model.model.fit(X_train_scaled, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+    model.model_version = datetime.now().strftime('%Y%m%d%H%M%S')
+    model.compile_model()
+
+    return (X_test.to_numpy(dtype=np.float64), y_test.to_numpy(dtype=np.float64),
+            y_train.to_numpy(dtype=np.float64), fit_seconds)
+
+
+def history_chunks(model, chunk_size=50000, max_rows=None):
+    """multiplier_history rows from every hotel database, newest first, chunk_size rows at a time"""
+    for hotel_id in model.databases.all_hotel_ids():
+        cursor = model.databases.get(hotel_id).connection().execute('''
+            SELECT date, room_type, rate_type, base_rate, dynamic_rate
+            FROM multiplier_history
+            WHERE base_rate > 0 AND dynamic_rate > 0
+            ORDER BY date DESC
+            LIMIT ?
+        ''', (-1 if max_rows is None else max_rows,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def load_history(model, chunk_size=50000, max_rows=None):
+    """Feature matrix, targets and days for the recorded pricing history
+
+    Rows are featurized a chunk at a time, so only the numeric arrays of the
+    whole history are held in memory. Room and rate types get provisional
+    codes while reading and are re-coded with the model's encoders at the end.
+    """
+    room_codes, rate_codes = {}, {}
+    parts = []
+    for rows in history_chunks(model, chunk_size, max_rows):
+        unique_dates, date_index = np.unique(np.array([row[0] for row in rows]), return_inverse=True)
+        days = [datetime.strptime(date, '%Y-%m-%d') for date in unique_dates]
+        day_features = model.calendar.features(days)
+        weekday = np.array([day.weekday() for day in days])
+
+        X = np.empty((len(rows), len(FEATURE_COLUMNS)), dtype=np.float64)
+        X[:, 0] = weekday[date_index]
+        X[:, 1] = np.array([day.month for day in days])[date_index]
+        X[:, 2] = np.array([day.day for day in days])[date_index]
+        X[:, 3] = weekday[date_index] >= 5
+        X[:, 4] = day_features['num_occasions'][date_index] > 0
+        X[:, 5] = day_features['num_occasions'][date_index]
+        X[:, 6] = [row[3] for row in rows]
+        X[:, 7] = [room_codes.setdefault(row[1], len(room_codes)) for row in rows]
+        X[:, 8] = [rate_codes.setdefault(row[2], len(rate_codes)) for row in rows]
+        y = np.array([row[4] for row in rows], dtype=np.float64)
+        parts.append((X, y, unique_dates.astype('datetime64[D]')[date_index]))
+
+    if not parts:
+        return np.empty((0, len(FEATURE_COLUMNS))), np.empty(0), np.empty(0, dtype='datetime64[D]')
+
+    X = np.concatenate([part[0] for part in parts])
+    y = np.concatenate([part[1] for part in parts])
+    days = np.concatenate([part[2] for part in parts])
+
+    # Serving encodes the standard room and rate types too, even if unpriced so far
+    model.room_type_encoder = LabelEncoder().fit(list(room_codes) + list(model.base_room_prices))
+    model.rate_type_encoder = LabelEncoder().fit(list(rate_codes) + list(model.rate_type_multipliers))
+    X[:, 7] = model.room_type_encoder.transform(list(room_codes))[X[:, 7].astype(np.intp)]
+    X[:, 8] = model.rate_type_encoder.transform(list(rate_codes))[X[:, 8].astype(np.intp)]
+
+    return X, y, days
+
+
+def fit_history_model(model, chunk_size=50000, max_rows=None, max_iter=500):
+    """Fit a histogram-based booster on recorded pricing history; returns the holdout split
+
+    The most recent 20% of rows are held out. HistGradientBoostingRegressor
+    bins features once and grows trees on all cores, and early stopping on an
+    internal validation split ends training once it stops improving.
+    """
+    print("Reading pricing history...")
+    X, y, days = load_history(model, chunk_size, max_rows)
+    if len(y) < MIN_HISTORY_ROWS:
+        raise ValueError(f'Only {len(y)} history rows; at least {MIN_HISTORY_ROWS} are needed to train on history')
+
+    order = np.argsort(days, kind='stable')
+    split = int(len(order) * 0.8)
+    train_rows, test_rows = order[:split], order[split:]
+
+    print(f"Training histogram model on {len(train_rows)} history rows...")
+
+    # Trees are split on raw features, so no scaler
+    model.scaler = None
+    model.model = HistGradientBoostingRegressor(
+        max_iter=max_iter,
+        learning_rate=0.1,
+        max_leaf_nodes=31,
+        early_stopping=True,
+        validation_fraction=0.1,
+        n_iter_no_change=20,
+        random_state=42
+    )
+
+    fit_started = time.perf_counter()
+    model.model.fit(X[train_rows], y[train_rows])
+    fit_seconds = time.perf_counter() - fit_started
+    print(f"Stopped after {model.model.n_iter_} of {max_iter} iterations in {fit_seconds:.1f}s")
+
+    model.model_version = datetime.now().strftime('%Y%m%d%H%M%S')
+    model.compile_model()
+
+    return X[test_rows], y[test_rows], y[train_rows], fit_seconds
+
+
+def estimator_predict(model, X):
+    """Predictions of the fitted sklearn estimator itself, for validating the compiled form"""
+    return model.model.predict(X if model.scaler is None else model.scaler.transform(X))
+
+
+def current_model_metrics(model, artifact_path, X_test, y_test):
+    """Holdout MAE/RMSE of the artifact currently published at artifact_path
+
+    The holdout is re-encoded into the current model's room and rate codes;
+    rows with types the current model does not know are left out of both
+    models' comparison metrics.
+    """
+    if not os.path.exists(artifact_path):
+        return None
+    metadata, arrays = read_model_artifact(artifact_path)
+    current = CompiledTreeEnsemble.from_arrays(arrays, metadata['baseline'])
+
+    X = X_test.copy()
+    comparable = np.ones(len(X), dtype=bool)
+    for column, encoder, known in ((7, model.room_type_encoder, metadata['room_types']),
+                                   (8, model.rate_type_encoder, metadata['rate_types'])):
+        labels = encoder.classes_[X[:, column].astype(np.intp)]
+        codes = {label: code for code, label in enumerate(known)}
+        comparable &= np.array([label in codes for label in labels], dtype=bool)
+        X[:, column] = [codes.get(label, -1) for label in labels]
+
+    if not comparable.any():
+        return None
+    y_pred = current.predict(X[comparable])
+    return {
+        'model_version': metadata.get('model_version'),
+        'rows': int(comparable.sum()),
+        'mae': float(mean_absolute_error(y_test[comparable], y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_test[comparable], y_pred))),
+        'comparable': comparable
+    }
+
+
+def train_model(model):
+    """Train the dynamic pricing model"""
+    X_test, y_test, _, _ = fit_model(model)
+
+    # Evaluate model
+    y_pred = model.model.predict(model.scaler.transform(X_test))
+    mae = mean_absolute_error(y_test, y_pred)
+    rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+
+    print("Model Performance:")
+    print(f"Mean Absolute Error: ${mae:.2f}")
+    print(f"Root Mean Square Error: ${rmse:.2f}")
+
+    return model.model
+
+
+def train_artifact(artifact_path, max_mae=None, source='synthetic', max_rows=None):
+    """Train a new model version and publish it as the serving artifact if it validates
+
+    source is 'synthetic' (generated data, GradientBoostingRegressor) or
+    'history' (recorded multiplier history, HistGradientBoostingRegressor).
+    The candidate must beat a constant (training mean) predictor on the
+    holdout, and max_mae when given, and the written file must score the
+    holdout exactly as the fitted estimator does. Only then does it replace
+    artifact_path, atomically, so running services can swap it in.
+    """
+    model = HotelDynamicPricingModel()
+    if source == 'history':
+        X_test, y_test, y_train, fit_seconds = fit_history_model(model, max_rows=max_rows)
+    else:
+        X_test, y_test, y_train, fit_seconds = fit_model(model)
+
+    y_pred = estimator_predict(model, X_test)
+    mae = float(mean_absolute_error(y_test, y_pred))
+    rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+    baseline_mae = float(mean_absolute_error(y_test, np.full(len(y_test), y_train.mean())))
+    current = current_model_metrics(model, artifact_path, X_test, y_test)
+
+    print(f"Model {model.model_version} ({source}, fit {fit_seconds:.1f}s) on {len(y_test)} holdout rows:")
+    print(f"  new model       MAE ${mae:.2f}  RMSE ${rmse:.2f}")
+    print(f"  mean predictor  MAE ${baseline_mae:.2f}")
+    if current is not None:
+        comparable = current.pop('comparable')
+        print(f"  current model   MAE ${current['mae']:.2f}  RMSE ${current['rmse']:.2f}  ({current['model_version']}, {current['rows']} rows)")
+        print(f"  new model       MAE ${mean_absolute_error(y_test[comparable], y_pred[comparable]):.2f}  (same {current['rows']} rows)")
+    if mae >= baseline_mae:
+        raise ValueError(f'Holdout MAE {mae:.2f} does not beat the mean predictor ({baseline_mae:.2f})')
+    if max_mae is not None and mae > max_mae:
+        raise ValueError(f'Holdout MAE {mae:.2f} exceeds the limit of {max_mae:.2f}')
+
+    model.validation = {
+        'source': source,
+        'holdout_rows': len(y_test),
+        'fit_seconds': fit_seconds,
+        'mae': mae,
+        'rmse': rmse,
+        'baseline_mae': baseline_mae,
+        'current_model': current
+    }
+    candidate_path = f'{artifact_path}.candidate'
+    model.save_artifact(candidate_path)
+
+    # Load the written file and score the holdout through it, the way serving will
+    try:
+        model.load_artifact(candidate_path)
+    except Exception:
+        os.remove(candidate_path)
+        raise
+    served = model.score_features(X_test)
+    if not np.allclose(served, y_pred, rtol=1e-9, atol=1e-6):
+        os.remove(candidate_path)
+        raise ValueError('Written artifact does not reproduce the fitted model on the holdout')
+    metadata, _ = read_model_artifact(candidate_path)
+
+    os.replace(candidate_path, artifact_path)
+    model.multiplier_writer.stop()
+    print(f"Model {model.model_version} published to {artifact_path}")
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train a new pricing model version and publish its serving artifact')
+    parser.add_argument('--output', default=model_artifact_path(os.path.join(BASE_DIR, 'hotel_pricing_model.pkl')),
+                        help='serving artifact to replace (default hotel_pricing_model.hpm)')
+    parser.add_argument('--max-mae', type=float, default=None, help='reject the model if its holdout MAE is higher')
+    parser.add_argument('--source', choices=['synthetic', 'history'], default='synthetic',
+                        help='train on generated data or on the recorded multiplier history')
+    parser.add_argument('--max-rows', type=int, default=None,
+                        help='with --source history, read at most this many of the newest rows per hotel database')
+    parser.add_argument('--status-file', default=None,
+                        help='JSON file to record the outcome in (default next to --output)')
+    args = parser.parse_args()
+
+    status_file = args.status_file or training_status_path(args.output)
+    status = {'state': 'running', 'pid': os.getpid(), 'started_at': datetime.now().isoformat()}
+    write_training_status(status_file, status)
+
+    try:
+        metadata = train_artifact(args.output, max_mae=args.max_mae, source=args.source, max_rows=args.max_rows)
+        status.update(state='succeeded', model_version=metadata['model_version'], validation=metadata['validation'])
+    except Exception as e:
+        print(f"Error training model: {e}", file=sys.stderr)
+        status.update(state='failed', error=str(e))
+        sys.exit(1)
+    finally:
+        status['finished_at'] = datetime.now().isoformat()
+        write_training_status(status_file, status)
+
+
+if __name__ == "__main__":
+    main()